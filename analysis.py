@@ -3,59 +3,454 @@ Sales Data Analysis Functions
 Contains all data processing and analysis functions
 """
 
+import copy
+import functools
+import os
+
 import pandas as pd
 import numpy as np
 
+import batch
+import engine
+import loader
+import parallel
+import partition_store
+import streaming
+from cube import CUBE_MEASURES, SalesCube
+from dataset import find_dataset
+from dimension_index import DateRange, timestamps
+from timeseries import DailyTotals, ROLLING_WINDOWS
+from topn import top_n
+
+
+DATA_PATH = loader.DATA_PATH
+
+# 'exact' counts distinct Order/Customer IDs from the rows. 'approx' merges
+# HyperLogLog sketches (about 1.6% standard error, see sketches.py).
+DISTINCT_MODES = ('exact', 'approx')
+DISTINCT_MODE = os.environ.get('SUPERSTORE_DISTINCT_MODE', 'exact')
+
+# Ranked results are cached up to this many rows, so any n up to it is a slice
+TOP_N_MAX = int(os.environ.get('SUPERSTORE_TOP_N_MAX', '50'))
+
+
+def set_distinct_mode(mode):
+    """
+    Choose how distinct counts (Orders, Customers) are computed
+
+    Approximate counts are only used for shared Dataset frames grouped
+    and filtered on cube dimensions. Everything else stays exact.
+
+    Parameters:
+        mode: 'exact' or 'approx'
+    """
+    global DISTINCT_MODE
+    if mode not in DISTINCT_MODES:
+        raise ValueError(f"distinct mode must be one of {DISTINCT_MODES}")
+    DISTINCT_MODE = mode
+
 
 # ==================== DATA LOADING ====================
 
-def load_data():
+def load_data(path=DATA_PATH, use_cache=True, schema=None, filters=None):
     """
     Load sales data from CSV file
-    
+
+    The parsed frame is cached as Parquet next to the CSV and reused
+    until the CSV's size, mtime or content changes. A version token
+    for the data is stored in df.attrs['source']['version'].
+
+    path may also be a partitioned store (see partition_store.py). With
+    filters, only the partitions that can match them are read.
+
+    Parameters:
+        path: Path of the CSV file or partitioned store directory
+        use_cache: Read and write the on-disk cache
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+        filters: Dictionary of column -> value(s) or DateRange to load only matching rows
+
     Returns:
         DataFrame or None
     """
-    try:
-        # UTF-8 encoding
-        df = pd.read_csv('data/superstore.csv', encoding='utf-8')
-    except UnicodeDecodeError:
-        try:
-            # latin-1 encoding
-            df = pd.read_csv('data/superstore.csv', encoding='latin-1')
-        except UnicodeDecodeError:
-            try:
-                # Windows-1252 encoding
-                df = pd.read_csv('data/superstore.csv', encoding='cp1252')
-            except:
-                # Last resort - ignore errors
-                df = pd.read_csv('data/superstore.csv', encoding='utf-8', errors='ignore')
-    except FileNotFoundError:
+    if partition_store.is_store(path):
+        return partition_store.read_store(path, filters)
+
+    df = loader.load_sales_data(path, use_cache, schema)
+    if df is None or not filters:
+        return df
+    rows = df.take(np.flatnonzero(_filter_mask(df, filters)))
+    rows.attrs = dict(df.attrs)
+    return rows
+
+
+# ==================== AGGREGATION HELPERS ====================
+
+def _time_bucket(df, column):
+    """
+    Get a time key column without modifying df
+
+    Frames from load_data() already carry the key. Other frames get it
+    computed on the fly from Order Date.
+    """
+    if column in df.columns:
+        return df[column]
+    return loader.time_buckets(df['Order Date'])[column]
+
+
+def _group_key(df, column):
+    """Get a grouping/filter column, computing time keys if needed"""
+    if column in loader.TIME_BUCKET_COLUMNS:
+        return _time_bucket(df, column)
+    return df[column]
+
+
+def _as_list(value):
+    """Wrap a single filter value in a list"""
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _filter_values(value):
+    """Normalize a filter value: a DateRange or a list of values"""
+    return value if isinstance(value, DateRange) else _as_list(value)
+
+
+def _filter_key(filters):
+    """Get a hashable key for a filters dictionary"""
+    return tuple(sorted((column, tuple(_filter_values(value))) for column, value in (filters or {}).items()))
+
+
+def _has_date_range(filters):
+    """
+    Check whether any filter is a DateRange
+
+    Date ranges can take any values, so results filtered by them are
+    not memoized on the Dataset.
+    """
+    return any(isinstance(value, DateRange) for value in (filters or {}).values())
+
+
+def _filter_rows(df, filters, columns=None):
+    """
+    Get the rows of df matching every filter
+
+    Only the given columns are gathered, so filtering a shared Dataset
+    frame does not copy the whole frame.
+
+    Parameters:
+        df: Sales DataFrame
+        filters: Dictionary of column -> value, list of values or DateRange
+        columns: Columns the caller needs (None for all)
+
+    Returns:
+        DataFrame
+    """
+    rows = _filter_selection(df, filters)
+    if columns is not None and all(column in df.columns for column in columns):
+        df = df[list(dict.fromkeys(columns))]
+    return df if rows is None else df.take(rows)
+
+
+def _filter_selection(df, filters):
+    """
+    Get the positions of the rows of df matching every filter
+
+    A shared Dataset frame is resolved through its dimension index
+    without scanning the frame. Other frames are compared row by row.
+
+    Parameters:
+        df: Sales DataFrame
+        filters: Dictionary of column -> value, list of values or DateRange
+
+    Returns:
+        Ascending array of row positions, or None when there are no filters
+    """
+    if not filters:
         return None
-    
-    # Convert date columns to datetime
-    df['Order Date'] = pd.to_datetime(df['Order Date'])
-    df['Ship Date'] = pd.to_datetime(df['Ship Date'])
-    
-    return df
+    dataset = find_dataset(df)
+    if dataset is not None:
+        return dataset.index.select({column: _filter_values(value) for column, value in filters.items()})
+    return np.flatnonzero(_filter_mask(df, filters))
+
+
+def _filter_mask(df, filters):
+    """
+    Get a boolean mask of the rows matching every filter
+
+    Parameters:
+        df: Sales DataFrame
+        filters: Dictionary of column -> value, list of values or DateRange
+
+    Returns:
+        Boolean array, or None when there are no filters
+    """
+    if not filters:
+        return None
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in filters.items():
+        if isinstance(value, DateRange):
+            mask &= value.contains(timestamps(df[column]))
+        else:
+            mask &= _group_key(df, column).isin(_as_list(value)).to_numpy()
+    return mask
+
+
+def _distinct_counts(dataset, cube, by, columns, filters, mode):
+    """
+    Count distinct values per group for the rows behind a (filtered) cube
+
+    Distinct counts are not additive, so exact mode scans the matching
+    rows. Approx mode merges the cells' HyperLogLog sketches instead.
+
+    Returns:
+        DataFrame indexed by group (a single row for by=None)
+    """
+    if mode == 'approx':
+        return pd.DataFrame({
+            column: cube.distinct_rollup(by, dataset.cell_sketches(column))
+            for column in columns
+        })
+
+    rows = _filter_rows(dataset.df, filters, [by, *columns] if by is not None else columns)
+    if by is None:
+        return rows[columns].nunique().to_frame().T
+    return rows.groupby(_group_key(rows, by), observed=True)[columns].nunique()
+
+
+def _cube_aggregate(dataset, by, agg, filters, mode):
+    """Answer _aggregate() from the dataset's cube"""
+    cube = dataset.cube.filter(filters)
+    sums = [column for column, how in agg.items() if how == 'sum']
+    result = cube.rollup(by, sums)
+
+    distinct = [column for column, how in agg.items() if how == 'nunique']
+    if distinct:
+        counts = _distinct_counts(dataset, cube, by, distinct, filters, mode)
+        result = result.join(counts, on=by)
+
+    return result[[by] + list(agg)]
+
+
+def _aggregate(df, by, agg, filters=None):
+    """
+    Group rows by one column, like df.groupby(by).agg(agg).reset_index()
+
+    For a shared Dataset frame grouped and filtered on cube dimensions,
+    the sums are rolled up from the cube and the result is memoized per
+    dataset version, so reruns do not touch the rows. Distinct counts
+    follow DISTINCT_MODE. Anything else (filtered copies,
+    product/customer/city keys) scans the rows and counts exactly.
+
+    Parameters:
+        df: Sales DataFrame
+        by: Column to group by
+        agg: Dictionary of column -> 'sum' or 'nunique'
+        filters: Dictionary of column -> value(s) to restrict the rows to
+
+    Returns:
+        DataFrame with the group column followed by the aggregated columns
+    """
+    dataset = find_dataset(df)
+    if dataset is None or not SalesCube.supports([by, *(filters or {})]):
+        rows = _filter_rows(df, filters, [by, *agg])
+        return rows.groupby(_group_key(rows, by), observed=True).agg(agg).reset_index()
+
+    mode = DISTINCT_MODE
+    key = ('aggregate', by, tuple(agg.items()), _filter_key(filters), mode)
+    result = dataset.derived(key, lambda: _cube_aggregate(dataset, by, agg, filters, mode))
+    # Callers rename and add columns, so hand out a copy of the memoized frame
+    return result.copy()
+
+
+def _aggregate_total(df, agg, filters=None):
+    """
+    Aggregate all rows into a single Series, like df.agg(agg)
+
+    Uses the cube and memoization like _aggregate().
+
+    Parameters:
+        df: Sales DataFrame
+        agg: Dictionary of column -> 'sum' or 'nunique'
+        filters: Dictionary of column -> value(s) to restrict the rows to
+
+    Returns:
+        Series indexed by column
+    """
+    dataset = find_dataset(df)
+    if dataset is None or not SalesCube.supports(filters or {}):
+        return _filter_rows(df, filters, list(agg)).agg(agg)
+
+    mode = DISTINCT_MODE
+
+    def build():
+        cube = dataset.cube.filter(filters)
+        sums = [column for column, how in agg.items() if how == 'sum']
+        result = cube.totals(sums)
+        distinct = [column for column, how in agg.items() if how == 'nunique']
+        if distinct:
+            counts = _distinct_counts(dataset, cube, None, distinct, filters, mode)
+            result = pd.concat([result, counts.iloc[0]])
+        return result[list(agg)]
+
+    key = ('total', tuple(agg.items()), _filter_key(filters), mode)
+    return dataset.derived(key, build).copy()
+
+
+def _entity_aggregate(df, key, filters=None):
+    """
+    Get the per-entity summary shared by every view of that entity
+
+    One row per value of key (product, customer, state, ...) with Sales,
+    Profit, Quantity, Orders and Profit_Margin. For a shared Dataset
+    frame it is built once per dataset version and filter, and the
+    top-N, most-profitable and loss-making views all read it.
+
+    The returned frame may be shared: select or copy before modifying.
+
+    Parameters:
+        df: Sales DataFrame
+        key: Entity column
+        filters: Dictionary of column -> value(s) to restrict the rows to
+
+    Returns:
+        DataFrame
+    """
+    dataset = find_dataset(df)
+
+    def build():
+        if dataset is not None and not SalesCube.supports([key, *(filters or {})]):
+            # Product, customer and city tables scan every row, so they use the
+            # configured engine, or the process pool when enabled
+            measures = list(ENTITY_MEASURES.values())
+            if engine.ENGINE != 'pandas':
+                grouped = _engine_aggregate(dataset, df, key, measures, filters)
+            else:
+                grouped = parallel.aggregate_key(df, key, measures, _filter_selection(df, filters),
+                                                 lambda frame, column: dataset.codes(column))
+            return _entity_table(df, key, grouped)
+        table = _aggregate(df, key, {
+            'Sales': 'sum',
+            'Profit': 'sum',
+            'Quantity': 'sum',
+            'Order ID': 'nunique'
+        }, filters)
+        table.columns = [key, 'Sales', 'Profit', 'Quantity', 'Orders']
+        table['Profit_Margin'] = (table['Profit'] / table['Sales'] * 100).fillna(0).round(2)
+        return table
+
+    if dataset is None or _has_date_range(filters):
+        return build()
+    mode = DISTINCT_MODE
+    update = _entity_update(key, filters) if mode == 'exact' else None
+    return dataset.derived(('entity', key, _filter_key(filters), mode), build, update)
+
+
+# Entity tables in the grouped layout of batch.aggregate_key()
+ENTITY_MEASURES = {
+    'Sales': ('Sales', 'sum'),
+    'Profit': ('Profit', 'sum'),
+    'Quantity': ('Quantity', 'sum'),
+    'Orders': ('Order ID', 'nunique')
+}
+
+
+def _entity_table(df, key, grouped):
+    """Shape a grouped frame of ENTITY_MEASURES like _entity_aggregate()'s table"""
+    values = grouped.index.to_numpy()
+    if isinstance(df[key].dtype, pd.CategoricalDtype):
+        values = pd.Categorical(values, categories=df[key].cat.categories)
+    table = pd.DataFrame({key: values, **{
+        name: grouped[measure].to_numpy() for name, measure in ENTITY_MEASURES.items()
+    }})
+    table['Profit_Margin'] = (table['Profit'] / table['Sales'] * 100).fillna(0).round(2)
+    return table
+
+
+def _entity_layout(table, key):
+    """Turn an _entity_aggregate() table back into the grouped layout of ENTITY_MEASURES"""
+    grouped = table.set_index(pd.Index(np.asarray(table[key]), name=key))[list(ENTITY_MEASURES)]
+    grouped.columns = list(ENTITY_MEASURES.values())
+    return grouped
+
+
+def _appended_selection(old, new, filters):
+    """Get the positions of the rows appended in new that match the filters"""
+    start = len(old)
+    if not filters:
+        return np.arange(start, len(new))
+    return start + np.flatnonzero(_filter_mask(new.df.iloc[start:], filters))
+
+
+def _batch_update(by, measures, filters):
+    """Update function carrying a memoized batch aggregate over appended rows"""
+    def update(grouped, old, new):
+        return batch.update_key(
+            grouped, new.df, len(old), by, measures,
+            rows=_appended_selection(old, new, filters),
+            old_rows=_filter_selection(old.df, filters),
+            factorize=lambda frame, column: new.codes(column)
+        )
+    return update
+
+
+def _entity_update(key, filters):
+    """Update function carrying a memoized entity table over appended rows"""
+    def update(table, old, new):
+        grouped = _batch_update(key, list(ENTITY_MEASURES.values()), filters)(_entity_layout(table, key), old, new)
+        return _entity_table(new.df, key, grouped)
+    return update
+
+
+def _top(df, name, table, column, n, ascending=False, filters=None):
+    """
+    Get the first n rows of a table ranked by one column
+
+    For a shared Dataset frame the ranked prefix is computed once per
+    dataset version and filter, up to TOP_N_MAX rows, with a partial
+    selection. Every n up to TOP_N_MAX is then a slice of it.
+
+    Parameters:
+        df: Sales DataFrame
+        name: Name of the ranking (cache key)
+        table: Function with no arguments returning the full table
+        column: Column to rank by
+        n: Number of rows
+        ascending: Rank smallest first
+        filters: Filters the table was built with (cache key)
+
+    Returns:
+        DataFrame with at most n rows
+    """
+    dataset = find_dataset(df)
+    if dataset is None or n > TOP_N_MAX or _has_date_range(filters):
+        return top_n(table(), column, n, ascending)
+
+    key = ('top', name, _filter_key(filters), DISTINCT_MODE)
+    ranked = dataset.derived(key, lambda: top_n(table(), column, TOP_N_MAX, ascending))
+    return ranked.iloc[:n].copy()
 
 
 # ==================== OVERVIEW METRICS ====================
 
-def get_overview_metrics(df):
+def get_overview_metrics(df, filters=None):
     """
     Calculate key overview metrics
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         Dictionary with metrics
     """
-    total_sales = df['Sales'].sum()
-    total_profit = df['Profit'].sum()
-    total_orders = df['Order ID'].nunique()
-    total_customers = df['Customer ID'].nunique()
+    return _spec_result(df, OVERVIEW_SPEC, filters)
+
+
+def _overview_from_totals(totals):
+    """Build the overview metrics dictionary from summed/counted totals"""
+    total_sales = totals['Sales']
+    total_profit = totals['Profit']
+    total_orders = int(totals['Order ID'])
+    total_customers = int(totals['Customer ID'])
     avg_order_value = total_sales / total_orders if total_orders > 0 else 0
     profit_margin = (total_profit / total_sales * 100) if total_sales > 0 else 0
     
@@ -64,6 +459,7 @@ def get_overview_metrics(df):
         'total_profit': round(total_profit, 2),
         'total_orders': total_orders,
         'total_customers': total_customers,
+        'total_quantity': int(totals['Quantity']),
         'avg_order_value': round(avg_order_value, 2),
         'profit_margin': round(profit_margin, 2)
     }
@@ -71,371 +467,877 @@ def get_overview_metrics(df):
 
 # ==================== PRODUCT ANALYSIS ====================
 
-def get_sales_by_category(df):
+def get_sales_by_category(df, filters=None):
     """
     Get sales by category
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with category sales
     """
-    category_sales = df.groupby('Category').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Quantity': 'sum',
-        'Order ID': 'nunique'
-    }).reset_index()
-    
-    category_sales.columns = ['Category', 'Sales', 'Profit', 'Quantity', 'Orders']
-    category_sales = category_sales.sort_values('Sales', ascending=False)
-    
-    return category_sales
+    return _spec_result(df, SALES_BY_CATEGORY_SPEC, filters)
 
 
-def get_sales_by_subcategory(df, n=10):
+def get_sales_by_subcategory(df, n=10, filters=None):
     """
     Get top N sub-categories by sales
     
     Parameters:
         df: Sales DataFrame
         n: Number of top sub-categories
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with sub-category sales
     """
-    subcategory_sales = df.groupby('Sub-Category').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Quantity': 'sum'
-    }).reset_index()
-    
-    subcategory_sales.columns = ['Sub-Category', 'Sales', 'Profit', 'Quantity']
-    subcategory_sales = subcategory_sales.sort_values('Sales', ascending=False).head(n)
-    
-    return subcategory_sales
+    return _spec_result(df, SALES_BY_SUBCATEGORY_SPEC, filters, n)
 
 
-def get_top_products(df, n=10):
+def get_top_products(df, n=10, filters=None):
     """
     Get top N products by sales
     
     Parameters:
         df: Sales DataFrame
         n: Number of top products
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with top products
     """
-    product_sales = df.groupby('Product Name').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Quantity': 'sum'
-    }).reset_index()
-    
-    product_sales.columns = ['Product', 'Sales', 'Profit', 'Quantity']
-    product_sales = product_sales.sort_values('Sales', ascending=False).head(n)
-    
-    return product_sales
+    return _spec_result(df, TOP_PRODUCTS_SPEC, filters, n)
 
 
 # ==================== CUSTOMER ANALYSIS ====================
 
-def get_sales_by_segment(df):
+def get_sales_by_segment(df, filters=None):
     """
     Get sales by customer segment
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with segment sales
     """
-    segment_sales = df.groupby('Segment').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Order ID': 'nunique',
-        'Customer ID': 'nunique'
-    }).reset_index()
-    
-    segment_sales.columns = ['Segment', 'Sales', 'Profit', 'Orders', 'Customers']
-    segment_sales = segment_sales.sort_values('Sales', ascending=False)
-    
-    return segment_sales
+    return _spec_result(df, SALES_BY_SEGMENT_SPEC, filters)
 
 
-def get_top_customers(df, n=10):
+def get_top_customers(df, n=10, filters=None):
     """
     Get top N customers by sales
     
     Parameters:
         df: Sales DataFrame
         n: Number of top customers
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with top customers
     """
-    customer_sales = df.groupby('Customer Name').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Order ID': 'nunique'
-    }).reset_index()
-    
-    customer_sales.columns = ['Customer', 'Sales', 'Profit', 'Orders']
-    customer_sales = customer_sales.sort_values('Sales', ascending=False).head(n)
-    
-    return customer_sales
+    return _spec_result(df, TOP_CUSTOMERS_SPEC, filters, n)
 
 
 # ==================== REGIONAL ANALYSIS ====================
 
-def get_sales_by_region(df):
+def get_sales_by_region(df, filters=None):
     """
     Get sales by region
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with regional sales
     """
-    region_sales = df.groupby('Region').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Order ID': 'nunique',
-        'Customer ID': 'nunique'
-    }).reset_index()
-    
-    region_sales.columns = ['Region', 'Sales', 'Profit', 'Orders', 'Customers']
-    region_sales = region_sales.sort_values('Sales', ascending=False)
-    
-    return region_sales
+    return _spec_result(df, SALES_BY_REGION_SPEC, filters)
 
 
-def get_sales_by_state(df, n=10):
+def get_sales_by_state(df, n=10, filters=None):
     """
     Get top N states by sales
     
     Parameters:
         df: Sales DataFrame
         n: Number of top states
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with state sales
     """
-    state_sales = df.groupby('State').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Order ID': 'nunique'
-    }).reset_index()
-    
-    state_sales.columns = ['State', 'Sales', 'Profit', 'Orders']
-    state_sales = state_sales.sort_values('Sales', ascending=False).head(n)
-    
-    return state_sales
+    return _spec_result(df, SALES_BY_STATE_SPEC, filters, n)
 
 
-def get_sales_by_city(df, n=10):
+def get_sales_by_city(df, n=10, filters=None):
     """
     Get top N cities by sales
     
     Parameters:
         df: Sales DataFrame
         n: Number of top cities
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with city sales
     """
-    city_sales = df.groupby('City').agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    
-    city_sales.columns = ['City', 'Sales', 'Profit']
-    city_sales = city_sales.sort_values('Sales', ascending=False).head(n)
-    
-    return city_sales
+    return _spec_result(df, SALES_BY_CITY_SPEC, filters, n)
 
 
 # ==================== TIME-BASED ANALYSIS ====================
 
-def get_monthly_sales(df):
+def _month_labels(months):
+    """Format Order Month ordinals as 'YYYY-MM'"""
+    years, months = np.divmod(pd.Series(months), 12)
+    return years.astype(str) + '-' + (months + 1).astype(str).str.zfill(2)
+
+
+def _quarter_labels(quarters):
+    """Format Order Quarter ordinals as 'YYYYQn'"""
+    years, quarters = np.divmod(pd.Series(quarters), 4)
+    return years.astype(str) + 'Q' + (quarters + 1).astype(str)
+
+
+def get_monthly_sales(df, filters=None):
     """
     Get sales by month
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with monthly sales
     """
-    df['Year-Month'] = df['Order Date'].dt.to_period('M')
-    monthly_sales = df.groupby('Year-Month').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Order ID': 'nunique'
-    }).reset_index()
-    
-    monthly_sales.columns = ['Month', 'Sales', 'Profit', 'Orders']
-    monthly_sales['Month'] = monthly_sales['Month'].astype(str)
-    
-    return monthly_sales
+    return _served(df, ('monthly_sales', _served_filter_key(filters)),
+                   lambda: _spec_result(df, MONTHLY_SALES_SPEC, filters))
 
 
-def get_yearly_sales(df):
+def get_yearly_sales(df, filters=None):
     """
     Get sales by year
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with yearly sales
     """
-    df['Year'] = df['Order Date'].dt.year
-    yearly_sales = df.groupby('Year').agg({
-        'Sales': 'sum',
-        'Profit': 'sum',
-        'Order ID': 'nunique'
-    }).reset_index()
-    
-    yearly_sales.columns = ['Year', 'Sales', 'Profit', 'Orders']
-    
-    return yearly_sales
+    return _spec_result(df, YEARLY_SALES_SPEC, filters)
 
 
-def get_quarterly_sales(df):
+def get_quarterly_sales(df, filters=None):
     """
     Get sales by quarter
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with quarterly sales
     """
-    df['Quarter'] = df['Order Date'].dt.to_period('Q')
-    quarterly_sales = df.groupby('Quarter').agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    
-    quarterly_sales.columns = ['Quarter', 'Sales', 'Profit']
-    quarterly_sales['Quarter'] = quarterly_sales['Quarter'].astype(str)
-    
-    return quarterly_sales
+    return _spec_result(df, QUARTERLY_SALES_SPEC, filters)
+
+
+# ==================== DATE RANGE ANALYSIS ====================
+
+def _daily_totals(df, filters):
+    """
+    Get the DailyTotals answering filters, and the group to read from them
+
+    A shared Dataset frame uses its prefix sums, overall or per value of
+    the one filtered column. Other frames and filters build them from
+    the matching rows.
+    """
+    dataset = find_dataset(df)
+    if dataset is not None and not filters:
+        return dataset.daily_totals(), None
+    if dataset is not None and len(filters) == 1:
+        (column, value), = filters.items()
+        if not isinstance(value, (list, tuple, set, DateRange)):
+            daily = dataset.daily_totals(column)
+            if value in daily.groups:
+                return daily, value
+    return DailyTotals.build(_filter_rows(df, filters)), None
+
+
+def get_period_metrics(df, start=None, end=None, filters=None):
+    """
+    Get sales, profit, quantity, orders and margin for a run of days
+
+    Answered from daily prefix sums with two lookups per measure, so
+    moving the range costs the same at any data size. Orders are
+    counted from the rows if an order spans several dates.
+
+    Parameters:
+        df: Sales DataFrame
+        start: First day, included (None for the first day)
+        end: Last day, included (None for the last day)
+        filters: Dictionary of column -> value(s) to restrict the rows to
+
+    Returns:
+        Dictionary with total_sales, total_profit, total_quantity, total_orders and profit_margin
+    """
+    key = ('period_metrics', DateRange(start, end).bounds(), _served_filter_key(filters))
+    return _served(df, key, lambda: _period_metrics(df, start, end, filters))
+
+
+def _period_metrics(df, start, end, filters):
+    """Compute get_period_metrics() from the daily prefix sums"""
+    daily, group = _daily_totals(df, filters)
+    totals = daily.totals(start, end)
+    if group is not None:
+        position = daily.groups.get_loc(group)
+        totals = {measure: values[position] for measure, values in totals.items()}
+
+    if 'Orders' in totals:
+        total_orders = int(totals['Orders'])
+    else:
+        date_filters = {**(filters or {}), 'Order Date': DateRange(start, end)}
+        total_orders = _filter_rows(df, date_filters, ['Order ID'])['Order ID'].nunique()
+
+    total_sales = totals['Sales']
+    total_profit = totals['Profit']
+    profit_margin = (total_profit / total_sales * 100) if total_sales > 0 else 0
+
+    return {
+        'total_sales': round(total_sales, 2),
+        'total_profit': round(total_profit, 2),
+        'total_quantity': int(totals['Quantity']),
+        'total_orders': total_orders,
+        'profit_margin': round(profit_margin, 2)
+    }
+
+
+def get_rolling_totals(df, window=30, filters=None):
+    """
+    Get trailing Sales, Profit and Quantity totals for every day
+
+    Parameters:
+        df: Sales DataFrame
+        window: Window length in days (see ROLLING_WINDOWS)
+        filters: Dictionary of column -> value(s) to restrict the rows to
+
+    Returns:
+        DataFrame with Date, Sales, Profit and Quantity (and Orders when
+        orders add up over days)
+    """
+    def compute():
+        daily, group = _daily_totals(df, filters)
+        return daily.rolling(window, group)
+
+    return _served(df, ('rolling_totals', window, _served_filter_key(filters)), compute)
 
 
 # ==================== PROFITABILITY ANALYSIS ====================
 
-def get_profit_by_category(df):
+def get_profit_by_category(df, filters=None):
     """
     Get profitability metrics by category
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with profit analysis
     """
-    profit_analysis = df.groupby('Category').agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    
-    profit_analysis['Profit_Margin'] = (profit_analysis['Profit'] / profit_analysis['Sales'] * 100).fillna(0).round(2)
-    profit_analysis = profit_analysis.sort_values('Profit', ascending=False)
-    
-    return profit_analysis
+    return _spec_result(df, PROFIT_BY_CATEGORY_SPEC, filters)
 
 
-def get_most_profitable_products(df, n=10):
+def get_most_profitable_products(df, n=10, filters=None):
     """
     Get top N most profitable products
     
     Parameters:
         df: Sales DataFrame
         n: Number of products
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with profitable products
     """
-    product_profit = df.groupby('Product Name').agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    
-    product_profit.columns = ['Product', 'Sales', 'Profit']
-    product_profit['Profit_Margin'] = (product_profit['Profit'] / product_profit['Sales'] * 100).fillna(0).round(2)
-    product_profit = product_profit.sort_values('Profit', ascending=False).head(n)
-    
-    return product_profit
+    return _spec_result(df, MOST_PROFITABLE_PRODUCTS_SPEC, filters, n)
 
 
-def get_loss_making_products(df, n=10):
+def get_loss_making_products(df, n=10, filters=None):
     """
     Get top N loss-making products
     
     Parameters:
         df: Sales DataFrame
         n: Number of products
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with loss-making products
     """
-    product_profit = df.groupby('Product Name').agg({
-        'Sales': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    
-    product_profit.columns = ['Product', 'Sales', 'Profit']
-    loss_products = product_profit[product_profit['Profit'] < 0]
-    loss_products = loss_products.sort_values('Profit', ascending=True).head(n)
-    
-    return loss_products
+    return _spec_result(df, LOSS_MAKING_PRODUCTS_SPEC, filters, n)
 
 
 # ==================== SHIPPING ANALYSIS ====================
 
-def get_sales_by_ship_mode(df):
+def get_sales_by_ship_mode(df, filters=None):
     """
     Get sales by shipping mode
     
     Parameters:
         df: Sales DataFrame
+        filters: Dictionary of column -> value(s) to restrict the rows to
     
     Returns:
         DataFrame with shipping mode sales
     """
-    ship_sales = df.groupby('Ship Mode').agg({
-        'Sales': 'sum',
-        'Order ID': 'nunique'
-    }).reset_index()
-    
-    ship_sales.columns = ['Ship Mode', 'Sales', 'Orders']
-    ship_sales = ship_sales.sort_values('Sales', ascending=False)
-    
-    return ship_sales
+    return _spec_result(df, SALES_BY_SHIP_MODE_SPEC, filters)
 
 
 # ==================== UTILITY FUNCTIONS ====================
 
 def get_unique_categories(df):
     """Get list of unique categories"""
-    return sorted(df['Category'].unique().tolist())
+    return _served(df, ('unique', 'Category'), lambda: sorted(df['Category'].unique().tolist()))
 
 
 def get_unique_regions(df):
     """Get list of unique regions"""
-    return sorted(df['Region'].unique().tolist())
+    return _served(df, ('unique', 'Region'), lambda: sorted(df['Region'].unique().tolist()))
 
 
 def get_unique_segments(df):
     """Get list of unique customer segments"""
-    return sorted(df['Segment'].unique().tolist())
+    return _served(df, ('unique', 'Segment'), lambda: sorted(df['Segment'].unique().tolist()))
 
 
 def get_date_range(df):
     """Get min and max dates from dataset"""
-    return df['Order Date'].min(), df['Order Date'].max()
\ No newline at end of file
+    return _served(df, ('date_range',), lambda: (df['Order Date'].min(), df['Order Date'].max()))
+
+
+# ==================== BATCH AGGREGATION ====================
+
+def _with_profit_margin(table):
+    """Add a Profit_Margin column (percent of Sales)"""
+    table['Profit_Margin'] = (table['Profit'] / table['Sales'] * 100).fillna(0).round(2)
+    return table
+
+
+def _with_month_labels(table):
+    """Replace Order Month ordinals in the Month column with labels"""
+    table['Month'] = _month_labels(table['Month'])
+    return table
+
+
+def _with_quarter_labels(table):
+    """Replace Order Quarter ordinals in the Quarter column with labels"""
+    table['Quarter'] = _quarter_labels(table['Quarter'])
+    return table
+
+
+def _losses_only(table):
+    """Keep only the rows with negative Profit"""
+    return table[table['Profit'] < 0]
+
+
+# The metrics behind the get_* functions above, which compute them with
+# run_batch(). Ranked specs keep TOP_N_MAX rows; slice them with .head(n).
+OVERVIEW_SPEC = {
+    'by': None,
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Quantity': ('Quantity', 'sum'),
+        'Order ID': ('Order ID', 'nunique'),
+        'Customer ID': ('Customer ID', 'nunique')
+    },
+    'finish': _overview_from_totals
+}
+
+SALES_BY_CATEGORY_SPEC = {
+    'by': 'Category',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Quantity': ('Quantity', 'sum'),
+        'Orders': ('Order ID', 'nunique')
+    },
+    'sort': 'Sales'
+}
+
+SALES_BY_SUBCATEGORY_SPEC = {
+    'by': 'Sub-Category',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Quantity': ('Quantity', 'sum')
+    },
+    'sort': 'Sales',
+    'top': TOP_N_MAX
+}
+
+TOP_PRODUCTS_SPEC = {
+    'by': 'Product Name',
+    'label': 'Product',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Quantity': ('Quantity', 'sum')
+    },
+    'sort': 'Sales',
+    'top': TOP_N_MAX
+}
+
+SALES_BY_SEGMENT_SPEC = {
+    'by': 'Segment',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Orders': ('Order ID', 'nunique'),
+        'Customers': ('Customer ID', 'nunique')
+    },
+    'sort': 'Sales'
+}
+
+TOP_CUSTOMERS_SPEC = {
+    'by': 'Customer Name',
+    'label': 'Customer',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Orders': ('Order ID', 'nunique')
+    },
+    'sort': 'Sales',
+    'top': TOP_N_MAX
+}
+
+SALES_BY_REGION_SPEC = {
+    'by': 'Region',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Orders': ('Order ID', 'nunique'),
+        'Customers': ('Customer ID', 'nunique')
+    },
+    'sort': 'Sales'
+}
+
+SALES_BY_STATE_SPEC = {
+    'by': 'State',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Orders': ('Order ID', 'nunique')
+    },
+    'sort': 'Sales',
+    'top': TOP_N_MAX
+}
+
+SALES_BY_CITY_SPEC = {
+    'by': 'City',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum')
+    },
+    'sort': 'Sales',
+    'top': TOP_N_MAX
+}
+
+MONTHLY_SALES_SPEC = {
+    'by': 'Order Month',
+    'label': 'Month',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Orders': ('Order ID', 'nunique')
+    },
+    'finish': _with_month_labels
+}
+
+YEARLY_SALES_SPEC = {
+    'by': 'Order Year',
+    'label': 'Year',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Orders': ('Order ID', 'nunique')
+    }
+}
+
+QUARTERLY_SALES_SPEC = {
+    'by': 'Order Quarter',
+    'label': 'Quarter',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum')
+    },
+    'finish': _with_quarter_labels
+}
+
+PROFIT_BY_CATEGORY_SPEC = {
+    'by': 'Category',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum')
+    },
+    'finish': _with_profit_margin,
+    'sort': 'Profit'
+}
+
+MOST_PROFITABLE_PRODUCTS_SPEC = {
+    'by': 'Product Name',
+    'label': 'Product',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum')
+    },
+    'finish': _with_profit_margin,
+    'sort': 'Profit',
+    'top': TOP_N_MAX
+}
+
+LOSS_MAKING_PRODUCTS_SPEC = {
+    'by': 'Product Name',
+    'label': 'Product',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum')
+    },
+    'finish': _losses_only,
+    'sort': 'Profit',
+    'ascending': True,
+    'top': TOP_N_MAX
+}
+
+SALES_BY_SHIP_MODE_SPEC = {
+    'by': 'Ship Mode',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Orders': ('Order ID', 'nunique')
+    },
+    'sort': 'Sales'
+}
+
+PROFIT_BY_SHIP_MODE_SPEC = {
+    'by': 'Ship Mode',
+    'measures': {
+        'Sales': ('Sales', 'sum'),
+        'Profit': ('Profit', 'sum')
+    },
+    'finish': _with_profit_margin,
+    'sort': 'Profit'
+}
+
+
+def run_batch(df, specs, filters=None):
+    """
+    Compute several aggregations together (see batch.run_batch for the spec format)
+
+    Specs sharing a group key share one factorization and one pass per
+    measure, so a page can declare everything it shows and get it in one
+    call. For a shared Dataset frame, filters resolve to rows through
+    its dimension index, and the factorized codes and the per-key
+    aggregates are cached per dataset version and filter. *_SPEC
+    constants found in the dataset's precomputed snapshot are served
+    from it. Keys the cube covers are rolled up from it, with distinct
+    counts following DISTINCT_MODE; ranked specs on other keys read the
+    shared entity tables. The rest run on the configured engine (see
+    engine.py) and count exactly.
+
+    Parameters:
+        df: Sales DataFrame
+        specs: Dictionary of name -> spec (e.g. the *_SPEC constants)
+        filters: Dictionary of column -> value(s) to restrict the rows to
+
+    Returns:
+        Dictionary of name -> result
+    """
+    dataset = find_dataset(df)
+    if dataset is None:
+        if engine.ENGINE != 'pandas':
+            return engine.run_batch(df, specs, filters)
+        return batch.run_batch(df, specs, _filter_selection(df, filters))
+
+    snapshot = _snapshot(dataset)
+    spec_names = _spec_names()
+    filter_key = _served_filter_key(filters)
+    results = {}
+    for name, spec in specs.items():
+        key = ('batch', spec_names.get(id(spec)), filter_key)
+        if key in snapshot:
+            results[name] = copy.copy(snapshot[key])
+    if len(results) < len(specs):
+        remaining = {name: spec for name, spec in specs.items() if name not in results}
+        results.update(_run_dataset_batch(dataset, df, remaining, filters))
+    return {name: results[name] for name in specs}
+
+
+def _run_dataset_batch(dataset, df, specs, filters):
+    """
+    Compute run_batch() for a shared Dataset frame
+
+    Each group key is answered from the cube when it covers the key,
+    filters and measures, else from the entity table when it holds the
+    measures, else by aggregating the rows. Ranked *_SPEC constants keep
+    their ranked prefix like _top(), so the aggregate is only read again
+    when the data or filters change.
+    """
+    needed = batch.plan(specs)
+    limits = batch.limits(specs)
+
+    @functools.cache
+    def grouped(by):
+        measures = needed[by]
+        result = _cube_grouped(df, by, measures, filters)
+        if result is None and by is not None:
+            result = _entity_grouped(df, by, measures, filters)
+        if result is None:
+            result = _rows_grouped(dataset, df, by, measures, filters, limits.get(by))
+        return result
+
+    def shape(spec):
+        return batch.run_batch(df, {'result': spec}, aggregate=lambda by, measures: grouped(by))['result']
+
+    spec_names = _spec_names()
+    results = {}
+    for name, spec in specs.items():
+        if id(spec) in spec_names and spec.get('top') is not None and spec.get('sort') is not None:
+            table = functools.partial(shape, {**spec, 'sort': None, 'top': None})
+            results[name] = _top(df, spec_names[id(spec)], table, spec['sort'], spec['top'],
+                                 spec.get('ascending', False), filters)
+        else:
+            results[name] = shape(spec)
+    return results
+
+
+def _cube_grouped(df, by, measures, filters):
+    """
+    Get a batch.aggregate_key() frame rolled up from the cube by _aggregate()
+
+    Returns:
+        DataFrame, or None when the cube does not cover the key, filters or measures
+    """
+    agg = {}
+    for column, how in measures:
+        if column in agg or how not in ('sum', 'nunique') or (how == 'sum' and column not in CUBE_MEASURES):
+            return None
+        agg[column] = how
+    if not SalesCube.supports([*([by] if by is not None else []), *(filters or {})]):
+        return None
+
+    def values(column):
+        # Integer sums and counts are int64 in aggregate_key(), whatever the column's width
+        values = np.asarray(column)
+        return values.astype(np.int64) if values.dtype.kind in 'iu' else values
+
+    if by is None:
+        totals = _aggregate_total(df, agg, filters)
+        return pd.DataFrame({measure: values([totals[measure[0]]]) for measure in measures}, index=pd.Index([None]))
+    table = _aggregate(df, by, agg, filters)
+    return pd.DataFrame({measure: values(table[measure[0]]) for measure in measures},
+                        index=_group_index(df, by, table[by]))
+
+
+def _entity_grouped(df, key, measures, filters):
+    """
+    Get a batch.aggregate_key() frame from the shared entity table
+
+    Returns:
+        DataFrame, or None when the entity table does not hold every measure
+    """
+    if not set(measures) <= set(ENTITY_MEASURES.values()):
+        return None
+    grouped = _entity_layout(_entity_aggregate(df, key, filters), key)
+    grouped.index = _group_index(df, key, grouped.index)
+    return grouped
+
+
+def _group_index(df, by, values):
+    """Index of group values with the dtype batch.aggregate_key() gives them"""
+    index = pd.Index(np.asarray(values), name=by)
+    key = _group_key(df, by)
+    if isinstance(key.dtype, pd.CategoricalDtype):
+        return index
+    # Rolled-up tables widen integer keys such as the time buckets
+    return index.astype(key.dtype)
+
+
+def _rows_grouped(dataset, df, by, measures, filters, limit=None):
+    """Aggregate one key from the matching rows, on the configured engine"""
+    if engine.ENGINE != 'pandas':
+        return _engine_aggregate(dataset, df, by, measures, filters, limit)
+
+    def factorize(frame, column):
+        return dataset.codes(column)
+
+    def build():
+        rows = _filter_selection(df, filters)
+        return parallel.aggregate_key(df, by, measures, rows, factorize)
+
+    if _has_date_range(filters):
+        return build()
+    key = ('batch', by, tuple(measures), _filter_key(filters))
+    return dataset.derived(key, build, _batch_update(by, measures, filters))
+
+
+def _spec_result(df, spec, filters=None, n=None):
+    """
+    Compute one *_SPEC constant with run_batch()
+
+    Parameters:
+        df: Sales DataFrame
+        spec: The spec
+        filters: Dictionary of column -> value(s) to restrict the rows to
+        n: Rows to keep of a ranked spec (None for every row)
+
+    Returns:
+        The spec's result
+    """
+    if n is not None and n > spec['top']:
+        spec = {**spec, 'top': n}
+    result = run_batch(df, {'result': spec}, filters)['result']
+    return result if n is None else result.head(n)
+
+
+def _engine_aggregate(dataset, df, by, measures, filters, limit=None):
+    """
+    Aggregate a shared Dataset frame's rows for one key with the configured engine
+
+    The engine's copy of the frame is kept per dataset version, or
+    carried over appended rows by engines that can (the sqlite store).
+    Filters and any top-N cut run inside the engine. Results are
+    memoized per engine and filter; uncut ones absorb appended rows like
+    the pandas engine's.
+    """
+    backend = engine.get_engine()
+    table = dataset.derived(('engine_table', backend.name), lambda: backend.table(df), _engine_table_update(backend))
+
+    def build():
+        return backend.aggregate(table, by, measures, filters, limit)
+
+    if _has_date_range(filters):
+        return build()
+    key = ('engine_batch', backend.name, by, tuple(measures), _filter_key(filters), limit)
+    return dataset.derived(key, build, _batch_update(by, measures, filters) if limit is None else None)
+
+
+def _engine_table_update(backend):
+    """Update function carrying an engine's Table over appended rows, or None if the engine rebuilds it"""
+    append = getattr(backend, 'append', None)
+    if append is None:
+        return None
+
+    def update(table, old, new):
+        return append(table, new.df, len(old), new.version, old.version)
+    return update
+
+
+# ==================== STREAMING ====================
+
+def stream_batch(specs, path=DATA_PATH, filters=None, memory_budget=None, schema=None):
+    """
+    Compute aggregations over a CSV too large to load (see run_batch)
+
+    The CSV is read in chunks sized to the memory budget and folded into
+    mergeable partial aggregates, so the results match run_batch() on
+    the loaded frame without ever holding it. Distinct counts follow
+    DISTINCT_MODE: 'approx' keeps one fixed-size sketch per group
+    instead of every distinct value.
+
+    Parameters:
+        specs: Dictionary of name -> spec (e.g. the *_SPEC constants)
+        path: Path of the CSV file
+        filters: Dictionary of column -> value(s) or DateRange to restrict the rows to
+        memory_budget: Bytes to stay within (defaults to streaming.MEMORY_BUDGET)
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+
+    Returns:
+        Dictionary of name -> result
+    """
+    def rows(chunk):
+        return _filter_selection(chunk, filters)
+
+    return streaming.stream_batch(path, specs, rows, list(filters or {}), memory_budget, DISTINCT_MODE, schema)
+
+
+# ==================== PRECOMPUTED RESULTS ====================
+
+@functools.cache
+def _spec_names():
+    """Map id() of each *_SPEC constant to its name"""
+    return {id(value): name for name, value in globals().items() if name.endswith('_SPEC')}
+
+
+def _served_filter_key(filters):
+    """Get a filters key that matches however a DateRange's days were given"""
+    return tuple(sorted(
+        (column, value.bounds() if isinstance(value, DateRange) else tuple(_as_list(value)))
+        for column, value in (filters or {}).items()
+    ))
+
+
+def _snapshot(dataset):
+    """
+    Get the precomputed results attached to a Dataset for the current DISTINCT_MODE
+
+    Snapshots are attached under the mode they were computed in, so
+    switching modes stops serving them (see precompute.attach_snapshot).
+    """
+    return dataset.derived(('snapshot', DISTINCT_MODE), dict)
+
+
+def _served(df, key, compute):
+    """
+    Get a result from the dataset's precomputed snapshot, or compute it
+
+    Snapshot results are shared by every session, so callers get a copy.
+    """
+    dataset = find_dataset(df)
+    if dataset is not None:
+        snapshot = _snapshot(dataset)
+        if key in snapshot:
+            return copy.copy(snapshot[key])
+    return compute()
+
+
+def precompute_results(df):
+    """
+    Compute every result the pages render with their default inputs
+
+    That is every *_SPEC batch, unfiltered and for each value the
+    pages' selectboxes offer (Category, Region, Segment), the rolling totals for every window, the
+    full-range period metrics and monthly trend, and the selectbox
+    values. precompute.py saves them as a snapshot, and the functions
+    here serve them once it is attached to the Dataset.
+
+    Parameters:
+        df: Sales DataFrame of a shared Dataset with no snapshot attached
+
+    Returns:
+        Dictionary of result key -> result
+    """
+    specs = {name: value for name, value in globals().items() if name.endswith('_SPEC')}
+    uniques = {
+        'Category': get_unique_categories(df),
+        'Region': get_unique_regions(df),
+        'Segment': get_unique_segments(df)
+    }
+    results = {('unique', column): values for column, values in uniques.items()}
+
+    filter_sets = [None] + [{column: value} for column, values in uniques.items() for value in values]
+    for filters in filter_sets:
+        for name, result in run_batch(df, specs, filters).items():
+            results[('batch', name, _served_filter_key(filters))] = result
+
+    start, end = get_date_range(df)
+    full_range = {'Order Date': DateRange(start, end)}
+    results[('date_range',)] = (start, end)
+    results[('period_metrics', full_range['Order Date'].bounds(), ())] = get_period_metrics(df, start, end)
+    results[('monthly_sales', _served_filter_key(full_range))] = get_monthly_sales(df, filters=full_range)
+    for window in ROLLING_WINDOWS:
+        results[('rolling_totals', window, ())] = get_rolling_totals(df, window=window)
+    return results
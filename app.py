@@ -5,6 +5,8 @@ Main Application - Home Page
 
 import streamlit as st
 import analysis as an
+import instrumentation
+from data_provider import get_dataset
 
 # Page Configuration
 st.set_page_config(
@@ -13,17 +15,15 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load Data (cached)
-@st.cache_data
-def load_data():
-    """Load and cache sales data"""
-    return an.load_data()
+# Time this run section by section (a no-op unless instrumentation is on)
+perf = instrumentation.page_timer("Home")
 
-# Load the data
-df = load_data()
+perf.section("Load data")
+# Load the shared data (one copy per process)
+dataset = get_dataset()
 
 # Check if data is loaded
-if df is None:
+if dataset is None:
     st.error("⚠️ **Error: Data file not found!**")
     st.info("""
     Please place your Superstore CSV file in the `data/` folder:
@@ -31,6 +31,8 @@ if df is None:
     """)
     st.stop()
 
+df = dataset.df
+
 # ==================== HOME PAGE ====================
 
 st.title("📊 Superstore Sales Analysis Dashboard")
@@ -38,9 +40,20 @@ st.markdown("### Comprehensive Sales Analytics & Insights")
 
 st.markdown("---")
 
+perf.section("Batch")
+# Everything on this page, computed in one batch
+results = an.run_batch(df, {
+    'metrics': an.OVERVIEW_SPEC,
+    'category_sales': an.SALES_BY_CATEGORY_SPEC,
+    'region_sales': an.SALES_BY_REGION_SPEC,
+    'segment_sales': an.SALES_BY_SEGMENT_SPEC,
+    'monthly_sales': an.MONTHLY_SALES_SPEC
+})
+
 # Get overview metrics
-metrics = an.get_overview_metrics(df)
+metrics = results['metrics']
 
+perf.section("Key Performance Indicators")
 # Display Key Metrics
 st.markdown("## 📈 Key Performance Indicators")
 
@@ -93,6 +106,7 @@ with col6:
 
 st.markdown("---")
 
+perf.section("Sales Overview")
 # Sales Overview Charts
 st.markdown("## 📊 Sales Overview")
 
@@ -101,14 +115,14 @@ col1, col2 = st.columns(2)
 with col1:
     # Sales by Category
     st.markdown("### Sales by Category")
-    category_sales = an.get_sales_by_category(df)
+    category_sales = results['category_sales']
     chart_data = category_sales.set_index('Category')[['Sales']]
     st.bar_chart(chart_data)
 
 with col2:
     # Sales by Region
     st.markdown("### Sales by Region")
-    region_sales = an.get_sales_by_region(df)
+    region_sales = results['region_sales']
     chart_data = region_sales.set_index('Region')[['Sales']]
     st.bar_chart(chart_data)
 
@@ -116,7 +130,7 @@ st.markdown("---")
 
 # Sales by Customer Segment
 st.markdown("### Sales by Customer Segment")
-segment_sales = an.get_sales_by_segment(df)
+segment_sales = results['segment_sales']
 chart_data = segment_sales.set_index('Segment')[['Sales']]
 st.bar_chart(chart_data)
 
@@ -124,12 +138,13 @@ st.markdown("---")
 
 # Monthly Sales Trend
 st.markdown("### Monthly Sales Trend")
-monthly_sales = an.get_monthly_sales(df)
+monthly_sales = results['monthly_sales']
 chart_data = monthly_sales.set_index('Month')[['Sales', 'Profit']]
 st.line_chart(chart_data)
 
 st.markdown("---")
 
+perf.section("Dataset Summary")
 # Quick Data Summary
 st.markdown("## 📋 Dataset Summary")
 
@@ -156,4 +171,6 @@ st.markdown("""
     <p>Superstore Sales Dashboard | Built with Streamlit, Pandas, and NumPy</p>
     <p>Use the sidebar to navigate to different analysis pages →</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+perf.end()
@@ -0,0 +1,315 @@
+"""
+Batch Aggregation
+Plans several group-by specs into one pass per group key
+"""
+
+import numpy as np
+import pandas as pd
+
+import loader
+from topn import top_n
+
+
+AGGREGATIONS = ('sum', 'count', 'nunique')
+
+# Column of an aggregate cut to its top groups (see limits) holding each
+# group's position among every observed group, so build_result() labels
+# the rows as it would have without the cut
+POSITION = ('group', 'position')
+
+
+# ==================== FACTORIZATION ====================
+
+def _column(df, column):
+    """Get a column, computing time keys for frames that lack them"""
+    if column not in df.columns and column in loader.TIME_BUCKET_COLUMNS:
+        return loader.time_buckets(df['Order Date'])[column]
+    return df[column]
+
+
+def factorize(df, column):
+    """
+    Encode a column as integer codes
+
+    Categorical columns reuse their codes, so this is free for the
+    schema's dimension columns.
+
+    Parameters:
+        df: Sales DataFrame
+        column: Column name
+
+    Returns:
+        (codes array, uniques Index)
+    """
+    values = _column(df, column)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64), pd.Index(values.cat.categories, name=column)
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), pd.Index(uniques, name=column)
+
+
+# ==================== PLANNING ====================
+
+def _normalize(spec):
+    """Fill in spec defaults"""
+    spec = dict(spec)
+    spec.setdefault('by', None)
+    spec.setdefault('label', spec['by'])
+    for name, (column, how) in spec['measures'].items():
+        if how not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{how}' for measure '{name}'")
+    return spec
+
+
+def plan(specs):
+    """
+    Group specs by key and collect the distinct measures each key needs
+
+    Parameters:
+        specs: Dictionary of name -> spec
+
+    Returns:
+        Dictionary of group key -> sorted list of (column, how) pairs
+    """
+    needed = {}
+    for spec in specs.values():
+        measures = needed.setdefault(spec.get('by'), set())
+        measures.update(tuple(m) for m in spec['measures'].values())
+    return {by: sorted(measures) for by, measures in needed.items()}
+
+
+def limits(specs):
+    """
+    Get the top-N cut each group key's aggregate can take before shaping
+
+    A key can be cut when every spec grouped by it keeps the top rows
+    ranked by one of its measures, with no 'finish' in between, all by
+    the same measure and direction. The cut keeps the most rows any of
+    them needs.
+
+    Parameters:
+        specs: Dictionary of name -> spec
+
+    Returns:
+        Dictionary of group key -> (measure, ascending, n) for the keys that can be cut
+    """
+    ranks = {}
+    for spec in specs.values():
+        by = spec.get('by')
+        if (by is None or spec.get('finish') is not None or spec.get('top') is None
+                or spec.get('sort') not in spec['measures']):
+            ranks[by] = None
+            continue
+        rank = (tuple(spec['measures'][spec['sort']]), spec.get('ascending', False))
+        if ranks.setdefault(by, rank + (spec['top'],)) is None or ranks[by][:2] != rank:
+            ranks[by] = None
+        else:
+            ranks[by] = rank + (max(ranks[by][2], spec['top']),)
+    return {by: limit for by, limit in ranks.items() if limit is not None}
+
+
+# ==================== EXECUTION ====================
+
+def aggregate_key(df, by, measures, rows=None, factorize=factorize):
+    """
+    Compute several measures for one group key with a single factorization
+
+    Parameters:
+        df: Sales DataFrame
+        by: Column to group by, or None for grand totals
+        measures: List of (column, how) pairs
+        rows: Ascending row positions to include (None for all rows)
+        factorize: Function (df, column) -> (codes, uniques)
+
+    Returns:
+        DataFrame indexed by the observed group values, one column per (column, how)
+    """
+    if by is None:
+        codes, uniques = np.zeros(len(df), dtype=np.int64), pd.Index([None])
+    else:
+        codes, uniques = factorize(df, by)
+
+    if rows is not None:
+        codes = codes[rows]
+
+    # Missing keys (code -1) are dropped, like groupby(dropna=True)
+    valid = codes >= 0
+    if not valid.all():
+        rows = rows[valid] if rows is not None else np.flatnonzero(valid)
+        codes = codes[valid]
+    n_groups = len(uniques)
+
+    sizes = np.bincount(codes, minlength=n_groups)
+    results = {}
+    float_sums = {}
+    for column, how in measures:
+        if how == 'count':
+            results[(column, how)] = sizes
+        elif how == 'sum':
+            values = _column(df, column).to_numpy()
+            if rows is not None:
+                values = values[rows]
+            if np.issubdtype(values.dtype, np.integer):
+                sums = np.bincount(codes, weights=values.astype(np.float64), minlength=n_groups)
+                results[(column, how)] = sums.astype(np.int64)
+            else:
+                float_sums[(column, how)] = values
+        else:
+            value_codes, value_uniques = factorize(df, column)
+            if rows is not None:
+                value_codes = value_codes[rows]
+            present = value_codes >= 0
+            pairs = np.unique(codes[present] * len(value_uniques) + value_codes[present])
+            results[(column, how)] = np.bincount(pairs // len(value_uniques), minlength=n_groups)
+
+    if float_sums:
+        # Float sums go through groupby's compensated summation so the
+        # totals match df.groupby(by).sum() to the last bit; the codes
+        # are passed as a categorical, so nothing is hashed again
+        groups = pd.Categorical.from_codes(codes, categories=np.arange(n_groups))
+        sums = pd.DataFrame(float_sums).groupby(groups, observed=False).sum()
+        results.update({measure: sums[measure].to_numpy() for measure in float_sums})
+
+    frame = pd.DataFrame({measure: results[measure] for measure in measures}, index=uniques)
+    if by is not None:
+        # Only groups that have rows, like groupby(observed=True)
+        frame = frame[sizes > 0]
+    return frame
+
+
+def update_key(grouped, df, start, by, measures, rows=None, old_rows=None, factorize=factorize):
+    """
+    Update an aggregate_key() result with rows appended to the frame
+
+    Sums and counts add up. A nunique measure gains the (group, value)
+    pairs of the new rows that no old row already had; the old rows
+    are only probed for the values the new rows carry.
+
+    Parameters:
+        grouped: aggregate_key() result over the old rows
+        df: Grown DataFrame whose first `start` rows are the old rows
+        start: Number of old rows
+        by: Column to group by, or None for grand totals
+        measures: List of (column, how) pairs grouped was built with
+        rows: Ascending positions of the new rows to include (None for every new row)
+        old_rows: Ascending positions of the old rows grouped covers (None for every old row)
+        factorize: Function (df, column) -> (codes, uniques)
+
+    Returns:
+        DataFrame like aggregate_key() over the old and new rows
+    """
+    if rows is None:
+        rows = np.arange(start, len(df))
+    additive = [measure for measure in measures if measure[1] != 'nunique']
+    delta = aggregate_key(df, by, additive, rows, factorize)
+
+    if by is None:
+        codes, uniques = np.zeros(len(df), dtype=np.int64), pd.Index([None])
+    else:
+        codes, uniques = factorize(df, by)
+
+    new_counts = {}
+    for column, how in measures:
+        if how != 'nunique':
+            continue
+        value_codes, value_uniques = factorize(df, column)
+        n_values = len(value_uniques)
+
+        selected = rows[(codes[rows] >= 0) & (value_codes[rows] >= 0)]
+        pairs = np.unique(codes[selected] * n_values + value_codes[selected])
+
+        # Old rows holding any of the new rows' values
+        wanted = np.zeros(n_values, dtype=bool)
+        wanted[pairs % n_values] = True
+        if old_rows is None:
+            old = np.flatnonzero(wanted[value_codes[:start]])
+        else:
+            old = old_rows[wanted[value_codes[old_rows]]]
+        old = old[codes[old] >= 0]
+        old_pairs = np.unique(codes[old] * n_values + value_codes[old])
+
+        pairs = np.setdiff1d(pairs, old_pairs, assume_unique=True)
+        new_counts[(column, how)] = np.bincount(pairs // n_values, minlength=len(uniques))
+
+    # Add both sides by position over the union of their groups
+    index = grouped.index if by is None else grouped.index.union(delta.index)
+    old_positions = index.get_indexer(grouped.index)
+    new_positions = index.get_indexer(delta.index)
+    delta_groups = uniques.get_indexer(delta.index)
+
+    merged = {}
+    for measure in grouped.columns:
+        old_values = grouped[measure].to_numpy()
+        if measure in new_counts:
+            new_values = new_counts[measure][delta_groups]
+        else:
+            new_values = delta[measure].to_numpy()
+        values = np.zeros(len(index), dtype=np.result_type(old_values, new_values))
+        values[old_positions] += old_values
+        values[new_positions] += new_values
+        merged[measure] = values
+    return pd.DataFrame(merged, index=index)
+
+
+def build_result(spec, grouped):
+    """
+    Shape one spec's result from its key's aggregated frame
+
+    Parameters:
+        spec: Normalized spec
+        grouped: Frame from aggregate_key() for the spec's key, or cut to
+            its top groups with their POSITION
+
+    Returns:
+        DataFrame (or Series for grand totals), after 'finish', 'sort' and 'top'
+    """
+    columns = {name: grouped[tuple(measure)].to_numpy() for name, measure in spec['measures'].items()}
+
+    if spec['by'] is None:
+        result = pd.Series({name: values[0] for name, values in columns.items()})
+    else:
+        index = grouped[POSITION].to_numpy() if POSITION in grouped.columns else None
+        result = pd.DataFrame({spec['label']: grouped.index.to_numpy(), **columns}, index=index)
+
+    if spec.get('finish') is not None:
+        result = spec['finish'](result)
+
+    if spec.get('sort') is not None:
+        ascending = spec.get('ascending', False)
+        if spec.get('top') is not None:
+            result = top_n(result, spec['sort'], spec['top'], ascending)
+        else:
+            result = result.sort_values(spec['sort'], ascending=ascending)
+    return result
+
+
+def run_batch(df, specs, rows=None, factorize=factorize, aggregate=None):
+    """
+    Compute several aggregation specs together
+
+    Specs that share a group key share one factorization and one set of
+    measure passes. A spec is a dictionary with:
+        by: Column to group by, or None for grand totals
+        measures: Dictionary of output name -> (column, 'sum' | 'count' | 'nunique')
+        label: Output name of the group column (defaults to by)
+        finish: Function applied to the shaped result (optional)
+        sort: Column to sort by, descending unless ascending=True (optional)
+        top: Keep only the first n rows after sorting (optional)
+
+    Parameters:
+        df: Sales DataFrame
+        specs: Dictionary of name -> spec
+        rows: Ascending row positions to include (None for all rows)
+        factorize: Function (df, column) -> (codes, uniques)
+        aggregate: Function (by, measures) -> grouped frame, replacing aggregate_key
+
+    Returns:
+        Dictionary of name -> result
+    """
+    specs = {name: _normalize(spec) for name, spec in specs.items()}
+    if aggregate is None:
+        def aggregate(by, measures):
+            return aggregate_key(df, by, measures, rows, factorize)
+
+    grouped = {by: aggregate(by, measures) for by, measures in plan(specs).items()}
+    return {name: build_result(spec, grouped[spec['by']]) for name, spec in specs.items()}
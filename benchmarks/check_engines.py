@@ -0,0 +1,93 @@
+"""
+Engine Parity Check
+Checks that every installed engine aggregates like the pandas reference for every batch spec
+
+Run from the project root:
+    python benchmarks/check_engines.py                       # data/superstore.csv
+    python benchmarks/check_engines.py --rows 1000000 --engines duckdb
+
+Every *_SPEC runs alone (so top-N cuts are pushed into the engine) and
+all together (so keys shared by several specs are aggregated once),
+unfiltered and with value and date-range filters. Both the per-key
+aggregates and the results callers get (row labels included) are
+compared. Exits with 1 on any mismatch.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+
+import analysis as an  # noqa: E402
+import engine  # noqa: E402
+import loader  # noqa: E402
+from dataset import Dataset  # noqa: E402
+from run_benchmarks import scaled_csv  # noqa: E402
+
+
+def filter_sets(df):
+    """Get the filters every spec is checked with"""
+    last_year = int(df['Order Year'].max())
+    sets = [None]
+    sets += [{'Category': value} for value in an.get_unique_categories(df)]
+    sets += [{'Region': [value]} for value in an.get_unique_regions(df)[:2]]
+    sets.append({'Order Date': an.DateRange(pd.Timestamp(last_year, 1, 1), None)})
+    sets.append({'Segment': 'Consumer', 'Order Date': an.DateRange(None, pd.Timestamp(last_year, 6, 30))})
+    return sets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the engines return identical aggregates")
+    parser.add_argument('csv', nargs='?', default=loader.DATA_PATH, help="Source CSV")
+    parser.add_argument('--rows', type=int, help="Check on a synthetic CSV of this many rows instead")
+    parser.add_argument('--engines', help=f"Comma-separated engines (default: every installed one of {', '.join(engine.ENGINES[1:])})")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.engines.split(',')] if args.engines else list(engine.ENGINES[1:])
+    unknown = [name for name in names if name not in engine.ENGINES]
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(unknown)} (choose from {', '.join(engine.ENGINES)})")
+    missing = [name for name in names if not engine.is_available(name)]
+    for name in missing:
+        print(f"⚠️ {name} is not installed, skipped")
+    names = [name for name in names if name not in missing]
+    if not names:
+        print("❌ No engine to check")
+        sys.exit(1)
+
+    path = scaled_csv(args.rows) if args.rows else args.csv
+    df = an.load_data(path)
+    if df is None:
+        print(f"❌ ERROR: {path} not found!")
+        sys.exit(1)
+    # A shared Dataset frame, so the sqlite engine keeps its store next to the CSV
+    dataset = Dataset(df, df.attrs['source']['version'])
+    df = dataset.df
+
+    specs = {name: value for name, value in vars(an).items() if name.endswith('_SPEC')}
+    batches = [{name: spec} for name, spec in specs.items()] + [specs]
+    filters = filter_sets(df)
+
+    print(f"📊 {len(df):,} rows, {len(specs)} specs, {len(filters)} filter sets, engines: {', '.join(names)}")
+    start = time.perf_counter()
+    mismatches = []
+    for specs_batch in batches:
+        mismatches += engine.check_parity(df, specs_batch, filters, names)
+    print(f"⏱️ Checked in {time.perf_counter() - start:.1f}s")
+
+    for name, spec_filters, what, difference in mismatches:
+        print(f"❌ {name} {what} filters={spec_filters}")
+        print('   ' + difference.replace('\n', '\n   '))
+    if mismatches:
+        print(f"❌ {len(mismatches)} mismatch(es)")
+        sys.exit(1)
+    print("✅ Every engine matches the pandas reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Analysis Benchmarks
+Times every public analysis function and page filter path at several data scales
+
+Run from the project root:
+    python benchmarks/run_benchmarks.py                      # 10k, 1m and 10m rows
+    python benchmarks/run_benchmarks.py --scales 10k --save-baseline
+    python benchmarks/run_benchmarks.py --scales 10k --compare benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --scales 1m --engine duckdb
+
+Each case is timed cold (a fresh Dataset, so nothing is memoized) and
+warm (a Dataset the case already ran on), then run once more under
+tracemalloc for its peak memory and the memory it leaves allocated.
+Baselines are compared on the best of the timed calls, which is the
+least sensitive to other load on the machine.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import analysis as an  # noqa: E402
+import data_cache as dc  # noqa: E402
+import engine  # noqa: E402
+import loader  # noqa: E402
+import synthetic  # noqa: E402
+from dataset import Dataset  # noqa: E402
+
+
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+REPEATS = {'10k': 5, '1m': 3, '10m': 1}
+
+BENCH_DIR = os.path.join(ROOT, 'benchmarks')
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+# A case regresses when it is this much slower than the baseline...
+REGRESSION_THRESHOLD = 0.10
+# ...and slower by at least this many seconds (smaller gaps are timer noise)
+MIN_REGRESSION_SECONDS = 0.002
+
+
+# ==================== DATA ====================
+
+def scaled_csv(rows, source=loader.DATA_PATH):
+    """
+    Get a synthetic sales CSV of a given size, generating it on first use
+
+    The data is drawn from the source CSV's distributions with a fixed
+    seed (see synthetic.py), so every run and machine times the same
+    rows. Files are kept in benchmarks/data/ and reused.
+
+    Parameters:
+        rows: Number of rows
+        source: Real CSV to learn the distributions from
+
+    Returns:
+        Path of the CSV
+    """
+    path = os.path.join(DATA_DIR, f'superstore_{rows}.csv')
+    if not os.path.exists(path):
+        synthetic.generate(rows, path, seed=0, source=os.path.join(ROOT, source))
+    return path
+
+
+# ==================== CASES ====================
+
+def _last_year(df):
+    """Get the DateRange of the last year of data"""
+    start, end = an.get_date_range(df)
+    return an.DateRange(pd.Timestamp(end) - pd.DateOffset(years=1), end)
+
+
+# Page batches as declared at the top of each page
+PAGE_BATCHES = {
+    'home': {
+        'metrics': an.OVERVIEW_SPEC,
+        'category_sales': an.SALES_BY_CATEGORY_SPEC,
+        'region_sales': an.SALES_BY_REGION_SPEC,
+        'segment_sales': an.SALES_BY_SEGMENT_SPEC,
+        'monthly_sales': an.MONTHLY_SALES_SPEC
+    },
+    'product': {
+        'category_sales': an.SALES_BY_CATEGORY_SPEC,
+        'subcategory_sales': an.SALES_BY_SUBCATEGORY_SPEC,
+        'top_products': an.TOP_PRODUCTS_SPEC
+    },
+    'customer': {
+        'segment_sales': an.SALES_BY_SEGMENT_SPEC,
+        'top_customers': an.TOP_CUSTOMERS_SPEC
+    },
+    'regional': {
+        'region_sales': an.SALES_BY_REGION_SPEC,
+        'state_sales': an.SALES_BY_STATE_SPEC,
+        'city_sales': an.SALES_BY_CITY_SPEC
+    },
+    'trends': {
+        'monthly_sales': an.MONTHLY_SALES_SPEC,
+        'yearly_sales': an.YEARLY_SALES_SPEC,
+        'quarterly_sales': an.QUARTERLY_SALES_SPEC
+    },
+    'profitability': {
+        'profit_by_category': an.PROFIT_BY_CATEGORY_SPEC,
+        'profitable_products': an.MOST_PROFITABLE_PRODUCTS_SPEC,
+        'loss_products': an.LOSS_MAKING_PRODUCTS_SPEC,
+        'ship_mode_profit': an.PROFIT_BY_SHIP_MODE_SPEC
+    }
+}
+
+# Filtered batches of the pages' drill-down sections
+FILTERED_BATCHES = {
+    'product': ({'Category': 'Furniture'}, {
+        'metrics': an.OVERVIEW_SPEC,
+        'subcategory_sales': an.SALES_BY_SUBCATEGORY_SPEC
+    }),
+    'customer': ({'Segment': 'Consumer'}, {
+        'metrics': an.OVERVIEW_SPEC,
+        'top_customers': an.TOP_CUSTOMERS_SPEC
+    }),
+    'regional': ({'Region': 'West'}, {
+        'metrics': an.OVERVIEW_SPEC,
+        'state_sales': an.SALES_BY_STATE_SPEC,
+        'city_sales': an.SALES_BY_CITY_SPEC,
+        'category_sales': an.SALES_BY_CATEGORY_SPEC
+    })
+}
+
+
+def _cases():
+    """Get the benchmark cases as name -> function (df, path) -> result"""
+    cases = {
+        'get_overview_metrics': lambda df, path: an.get_overview_metrics(df),
+        'get_sales_by_category': lambda df, path: an.get_sales_by_category(df),
+        'get_sales_by_subcategory': lambda df, path: an.get_sales_by_subcategory(df),
+        'get_top_products': lambda df, path: an.get_top_products(df),
+        'get_sales_by_segment': lambda df, path: an.get_sales_by_segment(df),
+        'get_top_customers': lambda df, path: an.get_top_customers(df),
+        'get_sales_by_region': lambda df, path: an.get_sales_by_region(df),
+        'get_sales_by_state': lambda df, path: an.get_sales_by_state(df),
+        'get_sales_by_city': lambda df, path: an.get_sales_by_city(df),
+        'get_monthly_sales': lambda df, path: an.get_monthly_sales(df),
+        'get_yearly_sales': lambda df, path: an.get_yearly_sales(df),
+        'get_quarterly_sales': lambda df, path: an.get_quarterly_sales(df),
+        'get_period_metrics': lambda df, path: an.get_period_metrics(df, *_last_year(df)),
+        'get_rolling_totals': lambda df, path: an.get_rolling_totals(df, window=30),
+        'get_profit_by_category': lambda df, path: an.get_profit_by_category(df),
+        'get_most_profitable_products': lambda df, path: an.get_most_profitable_products(df),
+        'get_loss_making_products': lambda df, path: an.get_loss_making_products(df),
+        'get_sales_by_ship_mode': lambda df, path: an.get_sales_by_ship_mode(df),
+        'get_unique_values': lambda df, path: (an.get_unique_categories(df), an.get_unique_regions(df),
+                                               an.get_unique_segments(df), an.get_date_range(df)),
+        'filter: get_top_products by Category': lambda df, path: an.get_top_products(
+            df, filters={'Category': 'Technology'}),
+        'filter: get_monthly_sales by date range': lambda df, path: an.get_monthly_sales(
+            df, filters={'Order Date': _last_year(df)}),
+        'filter: get_period_metrics by Region': lambda df, path: an.get_period_metrics(
+            df, *_last_year(df), filters={'Region': 'West'}),
+    }
+    for page, specs in PAGE_BATCHES.items():
+        cases[f'page: {page}'] = lambda df, path, specs=specs: an.run_batch(df, specs)
+    for page, (filters, specs) in FILTERED_BATCHES.items():
+        cases[f'page filter: {page}'] = lambda df, path, specs=specs, filters=filters: an.run_batch(
+            df, specs, filters=filters)
+    cases['stream_batch: home'] = lambda df, path: an.stream_batch(PAGE_BATCHES['home'], path)
+    return cases
+
+
+# ==================== MEASUREMENT ====================
+
+def measure(setup, run, repeats):
+    """
+    Time a call and measure its memory
+
+    Parameters:
+        setup: Function () -> argument, not timed
+        run: Function (argument) -> result
+        repeats: Number of timed calls
+
+    Returns:
+        Dictionary of timings (seconds) and memory (bytes, blocks)
+    """
+    times = []
+    for _ in range(repeats):
+        argument = setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = run(argument)
+        times.append(time.perf_counter() - start)
+        del result
+
+    # Memory is measured on a separate call, since tracing slows it down
+    argument = setup()
+    gc.collect()
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    before, _ = tracemalloc.get_traced_memory()
+    result = run(argument)
+    after, peak = tracemalloc.get_traced_memory()
+    blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+    del result
+
+    return {
+        'median_s': statistics.median(times),
+        'min_s': min(times),
+        'repeats': repeats,
+        'peak_bytes': peak - before,
+        'allocated_bytes': after - before,
+        'allocated_blocks': blocks
+    }
+
+
+def bench_scale(scale, repeats=None, only=None):
+    """
+    Run every case at one scale
+
+    Parameters:
+        scale: Key of SCALES
+        repeats: Timed calls per case (defaults to REPEATS[scale])
+        only: Substring a case name must contain (None for all)
+
+    Returns:
+        Dictionary of case -> mode -> measurements
+    """
+    repeats = repeats if repeats is not None else REPEATS[scale]
+    path = scaled_csv(SCALES[scale])
+    results = {}
+
+    def report(name, mode, measured):
+        results.setdefault(name, {})[mode] = measured
+        print(f"  {name:<45} {mode:<7} {measured['median_s'] * 1000:>10.1f} ms"
+              f" {measured['peak_bytes'] / 2 ** 20:>9.1f} MiB peak")
+
+    if only is None or 'load_data' in only:
+        dc.clear_cache(path)
+        report('load_data', 'parse', measure(lambda: None, lambda _: an.load_data(path, use_cache=False), repeats))
+        an.load_data(path)
+        report('load_data', 'cached', measure(lambda: None, lambda _: an.load_data(path), repeats))
+
+    df = an.load_data(path)
+    version = df.attrs['source']['version']
+
+    for name, case in _cases().items():
+        if only is not None and only not in name:
+            continue
+        report(name, 'cold', measure(lambda: Dataset(df, version), lambda dataset: case(dataset.df, path), repeats))
+        warm = Dataset(df, version)
+        case(warm.df, path)
+        report(name, 'warm', measure(lambda: warm, lambda dataset: case(dataset.df, path), repeats))
+    return results
+
+
+# ==================== BASELINES ====================
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare results with a baseline run
+
+    Parameters:
+        results: Results dictionary from main()
+        baseline: Earlier results dictionary
+        threshold: Relative slowdown that counts as a regression
+
+    Returns:
+        List of (scale, case, mode, baseline seconds, new seconds) regressions
+    """
+    regressions = []
+    for scale, cases in results['results'].items():
+        for name, modes in cases.items():
+            for mode, measured in modes.items():
+                old = baseline.get('results', {}).get(scale, {}).get(name, {}).get(mode)
+                if old is None:
+                    continue
+                new_s, old_s = measured['min_s'], old['min_s']
+                change = (new_s - old_s) / old_s if old_s > 0 else 0.0
+                flag = ''
+                if new_s > old_s * (1 + threshold) and new_s - old_s >= MIN_REGRESSION_SECONDS:
+                    regressions.append((scale, name, mode, old_s, new_s))
+                    flag = '  <-- REGRESSION'
+                print(f"  {scale:<4} {name:<45} {mode:<7} {old_s * 1000:>10.1f} -> {new_s * 1000:>10.1f} ms"
+                      f" ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis functions at several data scales")
+    parser.add_argument('--scales', default=','.join(SCALES), help="Comma-separated scales (10k, 1m, 10m)")
+    parser.add_argument('--repeats', type=int, help="Timed calls per case (default depends on scale)")
+    parser.add_argument('--only', help="Only run cases whose name contains this text")
+    parser.add_argument('--output', help="JSON results file (default benchmarks/results/<time>.json)")
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help="Baseline JSON to compare with")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative slowdown counted as a regression (default 0.10)")
+    parser.add_argument('--save-baseline', action='store_true', help="Also save the results as the baseline")
+    parser.add_argument('--engine', choices=engine.ENGINES, default=engine.ENGINE,
+                        help="Engine the row scans run on (see engine.py)")
+    args = parser.parse_args()
+
+    scales = [scale.strip().lower() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales: {', '.join(unknown)} (choose from {', '.join(SCALES)})")
+    try:
+        engine.set_engine(args.engine)
+    except ImportError as error:
+        parser.error(str(error))
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'engine': args.engine,
+        'results': {}
+    }
+    for scale in scales:
+        print(f"📊 {scale} rows ({args.engine} engine)")
+        results['results'][scale] = bench_scale(scale, args.repeats, args.only)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1)
+    print(f"✅ Results written to {output}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+        print(f"✅ Baseline saved to {BASELINE_PATH}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"📈 Compared with {args.compare}")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Memory-Mapped Column Store
+Numeric, date and categorical-code columns saved as flat .npy arrays and mapped read-only,
+so every process serving the same data shares one copy through the page cache
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import data_cache as dc
+
+
+MANIFEST = 'manifest.json'
+
+
+# ==================== WRITING ====================
+
+def _column_entry(position, values):
+    """
+    Get the array to save for a column and its manifest entry
+
+    Returns:
+        (array, entry), or None if the column has no flat array form
+    """
+    file_name = f'{position:03d}.npy'
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if categories.dtype.kind not in 'OUiu' and not pd.api.types.is_string_dtype(categories.dtype):
+            return None
+        entry = {'kind': 'categorical', 'file': file_name, 'ordered': bool(values.cat.ordered),
+                 'categories': [category.item() if isinstance(category, np.generic) else category
+                                for category in categories]}
+        return values.array.codes, entry
+    array = values.to_numpy()
+    if array.dtype.kind not in 'biufM':
+        return None
+    return array, {'kind': 'array', 'file': file_name}
+
+
+def write_columns(df, csv_path, fingerprint, key=None):
+    """
+    Save a parsed frame as a column store next to its CSV
+
+    The store is built in a temporary directory and swapped in. Processes
+    still mapping the old files keep reading them until they reload.
+    Nothing is written if a column has no flat array form (e.g. plain
+    strings), so such frames fall back to the Parquet cache.
+
+    Parameters:
+        df: Parsed sales DataFrame
+        csv_path: Path of the source CSV
+        fingerprint: Fingerprint of the CSV the frame was parsed from
+        key: Parser settings used to build df
+
+    Returns:
+        True if the store was written
+    """
+    columns = []
+    for position, column in enumerate(df.columns):
+        saved = _column_entry(position, df[column])
+        if saved is None:
+            return False
+        columns.append((column, *saved))
+
+    root = dc.columns_dir(csv_path)
+    tmp_root = f'{root}.tmp-{os.getpid()}'
+    old_root = f'{root}.old-{os.getpid()}'
+    try:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        os.makedirs(tmp_root)
+        for column, array, entry in columns:
+            np.save(os.path.join(tmp_root, entry['file']), np.ascontiguousarray(array))
+        manifest = dict(fingerprint, key=key, rows=len(df), attrs=df.attrs,
+                        columns=[dict(entry, name=column) for column, array, entry in columns])
+        with open(os.path.join(tmp_root, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+        if os.path.exists(root):
+            os.replace(root, old_root)
+        os.replace(tmp_root, root)
+    except (OSError, TypeError, ValueError):
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        return False
+    finally:
+        shutil.rmtree(old_root, ignore_errors=True)
+    return True
+
+
+# ==================== READING ====================
+
+def read_columns(csv_path, key=None):
+    """
+    Map the column store of a CSV if its fingerprint still matches
+
+    Every column is a read-only view of a memory-mapped file, so
+    opening is O(columns) and processes mapping the same store share
+    the pages. The frame must be treated as read-only, like any shared
+    Dataset frame.
+
+    Parameters:
+        csv_path: Path of the source CSV
+        key: Parser settings the store must have been written with
+
+    Returns:
+        DataFrame or None
+    """
+    root = dc.columns_dir(csv_path)
+    manifest_path = os.path.join(root, MANIFEST)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('key') != key or not dc.is_current(csv_path, manifest, manifest_path):
+        return None
+
+    columns = {}
+    try:
+        for entry in manifest['columns']:
+            array = np.load(os.path.join(root, entry['file']), mmap_mode='r')
+            if entry['kind'] == 'categorical':
+                dtype = pd.CategoricalDtype(entry['categories'], ordered=entry['ordered'])
+                columns[entry['name']] = pd.Categorical.from_codes(array, dtype=dtype, validate=False)
+            else:
+                columns[entry['name']] = array
+    except (OSError, ValueError, KeyError):
+        return None
+
+    df = pd.DataFrame(columns, copy=False)
+    df.attrs = manifest['attrs']
+    return df
@@ -0,0 +1,166 @@
+"""
+Sales Cube
+Pre-aggregated sums over the main dimensions, built once per dataset version
+"""
+
+import numpy as np
+import pandas as pd
+
+
+CUBE_DIMENSIONS = ['Category', 'Sub-Category', 'Region', 'State', 'Segment', 'Ship Mode', 'Order Month']
+CUBE_MEASURES = ['Sales', 'Profit', 'Quantity', 'Discount']
+
+# Coarser time keys that can be derived from the Order Month ordinal
+DERIVED_TIME_DIMENSIONS = {
+    'Order Quarter': 3,
+    'Order Year': 12
+}
+
+
+class SalesCube:
+    """
+    Sums of the sales measures for every observed combination of dimensions
+
+    Each cell holds the Sales, Profit, Quantity and Discount sums plus
+    the number of rows (Rows) that fell into it. Roll-ups and filters
+    run over the cells instead of the rows. Filtered cubes keep the
+    cell ids of the full cube as their index.
+
+    Attributes:
+        cells: DataFrame with one row per observed dimension combination
+        row_cells: Cell id of each source row (full cube only)
+    """
+
+    def __init__(self, cells, row_cells=None):
+        self.cells = cells
+        self.row_cells = row_cells
+
+    @classmethod
+    def build(cls, df):
+        """
+        Aggregate a sales frame into a cube
+
+        Parameters:
+            df: Sales DataFrame with the Order Month time key
+
+        Returns:
+            SalesCube
+        """
+        grouped = df.groupby(CUBE_DIMENSIONS, observed=True)
+        cells = grouped[CUBE_MEASURES].sum()
+        cells['Rows'] = grouped.size()
+        row_cells = grouped.ngroup().to_numpy().astype(np.int32)
+        return cls(cells.reset_index(), row_cells)
+
+    def append(self, df, start):
+        """
+        Add appended rows to a full cube
+
+        Existing cells keep their ids and new combinations get ids
+        after them, so anything keyed by cell id stays valid.
+
+        Parameters:
+            df: Grown sales frame whose first `start` rows are already in the cube
+            start: Number of rows already in the cube
+
+        Returns:
+            SalesCube over all rows of df
+        """
+        delta = SalesCube.build(df.iloc[start:])
+
+        cells = self.cells.copy()
+        for column in CUBE_DIMENSIONS:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                cells[column] = cells[column].cat.set_categories(df[column].cat.categories)
+
+        combined = pd.concat([cells, delta.cells], ignore_index=True)
+        grouped = combined.groupby(CUBE_DIMENSIONS, observed=True, sort=False)
+        cell_ids = grouped.ngroup().to_numpy()
+        merged = grouped[CUBE_MEASURES + ['Rows']].sum().reset_index()
+
+        delta_cells = cell_ids[len(cells):][delta.row_cells]
+        row_cells = np.concatenate([self.row_cells, delta_cells]).astype(np.int32)
+        return SalesCube(merged, row_cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    @staticmethod
+    def supports(columns):
+        """Check whether every column is a cube dimension or derived time key"""
+        return all(c in CUBE_DIMENSIONS or c in DERIVED_TIME_DIMENSIONS for c in columns)
+
+    def _column(self, cells, column):
+        """Get a dimension column, deriving coarser time keys from Order Month"""
+        if column in DERIVED_TIME_DIMENSIONS:
+            months = cells['Order Month']
+            if column == 'Order Year':
+                return (months // 12).astype(np.int16).rename(column)
+            return (months // DERIVED_TIME_DIMENSIONS[column]).rename(column)
+        return cells[column]
+
+    def filter(self, filters):
+        """
+        Restrict the cube to cells matching the filters
+
+        Parameters:
+            filters: Dictionary of column -> value or list of values
+
+        Returns:
+            SalesCube
+        """
+        if not filters:
+            return self
+        mask = np.ones(len(self.cells), dtype=bool)
+        for column, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= self._column(self.cells, column).isin(values).to_numpy()
+        return SalesCube(self.cells[mask])
+
+    def rollup(self, by, measures=None):
+        """
+        Sum the cells up to one dimension
+
+        Parameters:
+            by: Dimension or derived time key to group by
+            measures: Measures to return (defaults to all plus Rows)
+
+        Returns:
+            DataFrame with the dimension and measure columns
+        """
+        measures = measures if measures is not None else CUBE_MEASURES + ['Rows']
+        keys = self._column(self.cells, by)
+        return self.cells[measures].groupby(keys, observed=True).sum().reset_index()
+
+    def totals(self, measures=None):
+        """
+        Sum every cell
+
+        Parameters:
+            measures: Measures to return (defaults to all plus Rows)
+
+        Returns:
+            Series of totals
+        """
+        measures = measures if measures is not None else CUBE_MEASURES + ['Rows']
+        return self.cells[measures].sum()
+
+    def distinct_rollup(self, by, sketches):
+        """
+        Estimate distinct counts per group by merging cell sketches
+
+        Parameters:
+            by: Dimension or derived time key to group by (None for one total)
+            sketches: sketches.CellSketches built over this cube's cells
+
+        Returns:
+            Series of estimates indexed by group
+        """
+        if by is None:
+            codes, uniques = np.zeros(len(self.cells), dtype=np.int64), pd.Index([None])
+        else:
+            codes, uniques = pd.factorize(self._column(self.cells, by), sort=True)
+        cell_groups = np.full(sketches.n_cells, -1, dtype=np.int64)
+        cell_groups[self.cells.index.to_numpy()] = codes
+        counts = sketches.group_counts(cell_groups, len(uniques))
+        return pd.Series(counts, index=pd.Index(uniques, name=by))
@@ -0,0 +1,292 @@
+"""
+Dataset Cache
+Stores the parsed sales data as a Parquet file next to the source CSV
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+
+CACHE_SUFFIX = '.cache.parquet'
+FINGERPRINT_SUFFIX = '.cache.json'
+COLUMNS_SUFFIX = '.columns'
+SNAPSHOT_SUFFIX = '.snapshot.pkl'
+SQLITE_SUFFIX = '.sqlite'
+HASH_CHUNK_SIZE = 1 << 20
+
+
+# ==================== FINGERPRINTS ====================
+
+def hash_file(path):
+    """
+    Hash the raw bytes of a file
+
+    Parameters:
+        path: File path
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def appended_fingerprint(path, fingerprint):
+    """
+    Check whether a file only grew by appending since it was fingerprinted
+
+    The old size's worth of bytes must still hash to the old hash and
+    end with a newline, so no existing row was changed. Both hashes
+    come from a single read of the file.
+
+    Parameters:
+        path: File path
+        fingerprint: Earlier fingerprint from file_fingerprint()
+
+    Returns:
+        Fingerprint of the current file, or None if it changed in any other way
+    """
+    stat = os.stat(path)
+    old_size = fingerprint['size']
+    if stat.st_size < old_size:
+        return None
+    if stat.st_size == old_size and stat.st_mtime_ns == fingerprint['mtime_ns']:
+        return dict(fingerprint)
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        remaining = old_size
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                return None
+            digest.update(chunk)
+            remaining -= len(chunk)
+            last = chunk
+        if digest.copy().hexdigest() != fingerprint['hash']:
+            return None
+        if stat.st_size > old_size and (old_size == 0 or not last.endswith(b'\n')):
+            # The last old row may have been continued
+            return None
+
+        remaining = stat.st_size - old_size
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                return None
+            digest.update(chunk)
+            remaining -= len(chunk)
+
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': digest.hexdigest()
+    }
+
+
+def file_fingerprint(path):
+    """
+    Build the fingerprint (size, mtime and content hash) of a file
+
+    Parameters:
+        path: File path
+
+    Returns:
+        Dictionary with size, mtime_ns and hash
+    """
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': hash_file(path)
+    }
+
+
+def data_version(fingerprint, key=None):
+    """
+    Get a short token identifying the parsed data
+
+    Parameters:
+        fingerprint: File fingerprint from file_fingerprint()
+        key: Parser settings used to build the frame
+
+    Returns:
+        Version string
+    """
+    digest = hashlib.blake2b(f"{fingerprint['hash']}:{key}".encode('utf-8'), digest_size=8)
+    return digest.hexdigest()
+
+
+def _cache_paths(csv_path):
+    """Get the cache file and fingerprint file paths for a CSV"""
+    base, _ = os.path.splitext(csv_path)
+    return base + CACHE_SUFFIX, base + FINGERPRINT_SUFFIX
+
+
+def columns_dir(csv_path):
+    """Get the directory of the memory-mapped column store for a CSV (see column_store.py)"""
+    base, _ = os.path.splitext(csv_path)
+    return base + COLUMNS_SUFFIX
+
+
+def snapshot_path(csv_path):
+    """Get the path of the precomputed page results for a CSV (see precompute.py)"""
+    base, _ = os.path.splitext(csv_path)
+    return base + SNAPSHOT_SUFFIX
+
+
+def sqlite_path(csv_path):
+    """Get the path of the SQLite store for a CSV (see sqlite_store.py)"""
+    base, _ = os.path.splitext(csv_path)
+    return base + SQLITE_SUFFIX
+
+
+def _read_fingerprint(fingerprint_path):
+    """Read a stored fingerprint, or None if missing or unreadable"""
+    try:
+        with open(fingerprint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    """Write JSON atomically so readers never see a partial file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+# ==================== CACHE READ / WRITE ====================
+
+def is_current(csv_path, stored, record_path):
+    """
+    Check whether a stored fingerprint still matches a CSV
+
+    Size and mtime are checked first. When only the mtime changed
+    (e.g. the file was copied during a deploy) the content hash decides,
+    and the record is refreshed so the next check is fast.
+
+    Parameters:
+        csv_path: Path of the source CSV
+        stored: Dictionary holding the size, mtime_ns and hash the cache was built from
+        record_path: JSON file stored was read from
+
+    Returns:
+        True if the CSV is unchanged
+    """
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return False
+
+    if stat.st_size != stored.get('size'):
+        return False
+
+    if stat.st_mtime_ns != stored.get('mtime_ns'):
+        if hash_file(csv_path) != stored.get('hash'):
+            return False
+        stored['mtime_ns'] = stat.st_mtime_ns
+        try:
+            _write_json(record_path, stored)
+        except OSError:
+            pass
+    return True
+
+
+def read_cache(csv_path, key=None):
+    """
+    Load the cached frame for a CSV if its fingerprint still matches (see is_current)
+
+    Parameters:
+        csv_path: Path of the source CSV
+        key: Parser settings the cache must have been written with
+
+    Returns:
+        DataFrame or None
+    """
+    cache_path, fingerprint_path = _cache_paths(csv_path)
+    stored = _read_fingerprint(fingerprint_path)
+    if stored is None or not os.path.exists(cache_path):
+        return None
+    if stored.get('key') != key or not is_current(csv_path, stored, fingerprint_path):
+        return None
+
+    try:
+        return pd.read_parquet(cache_path)
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def read_previous_cache(csv_path, key=None):
+    """
+    Load the cached frame whatever the CSV's current state
+
+    Used to extend the cache of a CSV that has since grown by appending.
+    The fingerprint the frame was parsed from is in
+    df.attrs['source']['fingerprint'], to check with appended_fingerprint().
+
+    Parameters:
+        csv_path: Path of the source CSV
+        key: Parser settings the cache must have been written with
+
+    Returns:
+        DataFrame or None
+    """
+    cache_path, fingerprint_path = _cache_paths(csv_path)
+    stored = _read_fingerprint(fingerprint_path)
+    if stored is None or stored.get('key') != key:
+        return None
+    try:
+        return pd.read_parquet(cache_path)
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def write_cache(df, csv_path, fingerprint, key=None):
+    """
+    Write the parsed frame and the CSV fingerprint next to the CSV
+
+    The cache is skipped silently if no Parquet engine is installed
+    or the data folder is read-only.
+
+    Parameters:
+        df: Parsed sales DataFrame
+        csv_path: Path of the source CSV
+        fingerprint: Fingerprint of the CSV taken before it was parsed
+        key: Parser settings used to build df
+
+    Returns:
+        True if the cache was written
+    """
+    cache_path, fingerprint_path = _cache_paths(csv_path)
+    try:
+        # Drop the old fingerprint first so a crash mid-write never pairs it with new data
+        if os.path.exists(fingerprint_path):
+            os.remove(fingerprint_path)
+        tmp_path = cache_path + '.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+        _write_json(fingerprint_path, dict(fingerprint, key=key))
+    except (ImportError, OSError, ValueError):
+        return False
+    return True
+
+
+def clear_cache(csv_path):
+    """Remove every file derived from a CSV: the cache, column store, precomputed snapshot and SQLite store"""
+    store = sqlite_path(csv_path)
+    for path in [*_cache_paths(csv_path), snapshot_path(csv_path), store, store + '-journal']:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    shutil.rmtree(columns_dir(csv_path), ignore_errors=True)
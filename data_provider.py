@@ -0,0 +1,69 @@
+"""
+Streamlit Data Provider
+Serves one process-wide Dataset to every page and session
+"""
+
+import os
+import threading
+
+import streamlit as st
+
+import analysis as an
+import precompute
+from dataset import refresh_dataset
+
+
+# Columns the pages filter on, indexed as soon as the data is loaded
+INDEXED_COLUMNS = ['Category', 'Region', 'Segment']
+
+_LOCK = threading.Lock()
+
+
+@st.cache_resource
+def _shared_datasets():
+    """
+    Get the process-wide path -> (Dataset, (size, mtime_ns)) map
+
+    cache_resource hands every caller the same object instead of an
+    unpickled copy, so all sessions share one Dataset per path.
+    """
+    return {}
+
+
+def get_dataset(path=an.DATA_PATH):
+    """
+    Get the shared, read-only Dataset
+
+    When the CSV's size or mtime changes, rows appended to it are
+    parsed on their own and applied to the cached aggregates; any other
+    change reloads the file. A precomputed snapshot matching the loaded
+    data is attached, so the pages' first run does no aggregation.
+
+    Parameters:
+        path: Path of the CSV file
+
+    Returns:
+        Dataset or None if the CSV is missing
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    seen = (stat.st_size, stat.st_mtime_ns)
+
+    datasets = _shared_datasets()
+    dataset, loaded = datasets.get(path, (None, None))
+    if dataset is not None and loaded == seen:
+        return dataset
+
+    with _LOCK:
+        dataset, loaded = datasets.get(path, (None, None))
+        if dataset is None or loaded != seen:
+            with st.spinner("Loading sales data..."):
+                dataset = refresh_dataset(dataset, path)
+            if dataset is not None:
+                # Serve the page results from `python precompute.py` when it ran on this data
+                precompute.attach_snapshot(dataset, path)
+                dataset.index.build(INDEXED_COLUMNS)
+            datasets[path] = (dataset, seen)
+    return dataset
@@ -0,0 +1,242 @@
+"""
+Shared Dataset
+Read-only sales data loaded once and shared by every page and session
+"""
+
+import threading
+import weakref
+
+import pandas as pd
+
+import batch
+import loader
+from cube import SalesCube
+from dimension_index import DimensionIndex
+from sketches import CellSketches
+from timeseries import DailyTotals
+
+
+# id(df) -> weak reference to the Dataset that owns df
+_REGISTRY = {}
+
+
+class Dataset:
+    """
+    Loaded sales data plus a version token
+
+    The frame is shared between pages and sessions without copying,
+    so callers must treat it as read-only: filter, group and copy it,
+    but never assign columns or values in place.
+
+    Structures derived from the frame (the cube, memoized aggregates)
+    are built on first use and kept for the lifetime of the Dataset,
+    i.e. once per data version. When rows are appended, append()
+    carries the ones that know how to absorb new rows over to the new
+    version.
+
+    Attributes:
+        df: Sales DataFrame
+        version: Token that changes whenever the source data or schema changes
+        index: DimensionIndex resolving filters to row ids
+    """
+
+    def __init__(self, df, version):
+        self.df = df
+        self.version = version
+        self._derived = {}
+        self._updates = {}
+        self._lock = threading.RLock()
+        self.index = DimensionIndex(self.codes, lambda column: self.df[column])
+
+        key = id(df)
+        ref = weakref.ref(self)
+        _REGISTRY[key] = ref
+        weakref.finalize(self, _unregister, key, ref)
+
+    def __len__(self):
+        return len(self.df)
+
+    def __repr__(self):
+        return f"Dataset(rows={len(self.df):,}, version='{self.version}')"
+
+    def derived(self, key, build, update=None):
+        """
+        Get a structure derived from the data, building it on first use
+
+        Parameters:
+            key: Hashable name of the structure
+            build: Function with no arguments that builds it
+            update: Function (value, old Dataset, new Dataset) -> value
+                covering rows appended in the new Dataset, or None to
+                rebuild it there (see append())
+
+        Returns:
+            The cached structure
+        """
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+                if update is not None:
+                    self._updates[key] = update
+            return self._derived[key]
+
+    def append(self, df):
+        """
+        Get the Dataset of a grown frame whose first len(self) rows are this dataset's
+
+        Derived structures with an update function are carried over by
+        applying just the new rows, in the order they were built.
+        Everything else (indexes, filtered memos) is rebuilt on first use.
+
+        Parameters:
+            df: Grown frame, e.g. from loader.append_sales_data()
+
+        Returns:
+            Dataset
+        """
+        dataset = Dataset(df, df.attrs['source']['version'])
+        with self._lock:
+            for key, value in list(self._derived.items()):
+                update = self._updates.get(key)
+                if update is None:
+                    continue
+                value = update(value, self, dataset)
+                if value is not None:
+                    dataset._derived[key] = value
+                    dataset._updates[key] = update
+        return dataset
+
+    def codes(self, column):
+        """Integer codes and unique values of a column (see batch.factorize)"""
+        return self.derived(('codes', column), lambda: batch.factorize(self.df, column))
+
+    @property
+    def cube(self):
+        """SalesCube over the whole dataset"""
+        return self.derived('cube', lambda: SalesCube.build(self.df), _update_cube)
+
+    def daily_totals(self, by=None):
+        """Daily prefix sums, overall or per value of one column"""
+        def build():
+            return DailyTotals.build(self.df, by, factorize=lambda df, column: self.codes(column))
+        return self.derived(('daily_totals', by), build, _update_daily_totals(by))
+
+    def cell_sketches(self, column):
+        """HyperLogLog sketches of a column for every cube cell"""
+        def build():
+            cube = self.cube
+            return CellSketches.build(cube.row_cells, self.df[column], len(cube))
+        return self.derived(('cell_sketches', column), build, _update_cell_sketches(column))
+
+
+# ==================== APPEND UPDATES ====================
+
+def _update_cube(cube, old, new):
+    """Add the appended rows to the cube"""
+    return cube.append(new.df, len(old))
+
+
+def _update_cell_sketches(column):
+    """Update function adding the appended rows' values to cell sketches"""
+    def update(sketches, old, new):
+        cube = new.cube
+        start = len(old)
+        return sketches.append(cube.row_cells[start:], new.df[column].iloc[start:], len(cube))
+    return update
+
+
+def _update_daily_totals(by):
+    """Update function merging the appended rows' daily totals"""
+    def update(daily, old, new):
+        rows = new.df.iloc[len(old):]
+        merged = daily.merge(DailyTotals.build(rows, by))
+        if 'Orders' in merged.prefix and _seen_before(old, 'Order ID', rows['Order ID']).any():
+            # An order spanning old and new rows would be counted twice
+            del merged.prefix['Orders']
+        return merged
+    return update
+
+
+def _seen_before(dataset, column, values):
+    """
+    Tell which values already occur in a dataset's column
+
+    Categories of a loaded frame are exactly its values, so categorical
+    columns are checked without touching the rows.
+    """
+    series = dataset.df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        known = series.cat.categories
+    else:
+        known = series.unique()
+    return values.isin(known).to_numpy()
+
+
+def _unregister(key, ref):
+    """Drop a registry entry unless a newer Dataset over the same frame has replaced it"""
+    if _REGISTRY.get(key) is ref:
+        del _REGISTRY[key]
+
+
+def find_dataset(df):
+    """
+    Get the Dataset that owns a frame
+
+    Parameters:
+        df: DataFrame
+
+    Returns:
+        Dataset, or None if df is not a Dataset's frame (e.g. a filtered copy)
+    """
+    ref = _REGISTRY.get(id(df))
+    dataset = ref() if ref is not None else None
+    if dataset is None or dataset.df is not df:
+        return None
+    return dataset
+
+
+def load_dataset(path=loader.DATA_PATH, schema=None):
+    """
+    Load the sales data as a shared Dataset
+
+    Parameters:
+        path: Path of the CSV file
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+
+    Returns:
+        Dataset or None
+    """
+    df = loader.load_sales_data(path, schema=schema)
+    if df is None:
+        return None
+    return Dataset(df, df.attrs['source']['version'])
+
+
+def refresh_dataset(dataset, path=loader.DATA_PATH, schema=None):
+    """
+    Bring a Dataset up to date with its CSV
+
+    Rows appended to the CSV are parsed on their own and applied to the
+    cached structures (see Dataset.append). Any other change reloads.
+
+    Parameters:
+        dataset: Dataset loaded from path (None to load it)
+        path: Path of the CSV file
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+
+    Returns:
+        Dataset (the same one when the CSV is unchanged) or None
+    """
+    if dataset is None:
+        return load_dataset(path, schema)
+
+    df = loader.append_sales_data(dataset.df, path, schema)
+    if df is None:
+        return load_dataset(path, schema)
+    if df is dataset.df:
+        return dataset
+    return dataset.append(df)
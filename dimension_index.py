@@ -0,0 +1,213 @@
+"""
+Dimension Index
+Sorted row-id lists per value of each dimension column, and a date-ordered
+permutation for date ranges, for filtering without a scan
+"""
+
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+# ==================== DATE RANGES ====================
+
+def timestamps(dates):
+    """Get dates as int64 nanosecond timestamps (missing dates sort first)"""
+    return np.asarray(dates, dtype='datetime64[ns]').view(np.int64)
+
+
+class DateRange(namedtuple('DateRange', ['start', 'end'])):
+    """
+    Filter value selecting the days from start to end, both included
+
+    start and end are dates, datetimes or strings, or None for an open
+    end. Any time of day is ignored.
+    """
+
+    __slots__ = ()
+
+    def bounds(self):
+        """Get the half-open [low, high) int64 timestamp range"""
+        low = np.iinfo(np.int64).min + 1
+        high = np.iinfo(np.int64).max
+        if self.start is not None:
+            low = pd.Timestamp(self.start).normalize().as_unit('ns').value
+        if self.end is not None:
+            high = (pd.Timestamp(self.end).normalize() + pd.Timedelta(days=1)).as_unit('ns').value
+        return low, high
+
+    def contains(self, stamps):
+        """Get a boolean array telling which int64 timestamps fall in the range"""
+        low, high = self.bounds()
+        return (stamps >= low) & (stamps < high)
+
+
+# ==================== INDEXES ====================
+
+class Postings:
+    """
+    Row ids of every value of one column
+
+    The row ids are stored grouped by value, ascending within each
+    value, with an offset table, so the rows of any value are a slice.
+
+    Attributes:
+        codes: Integer code of each row (-1 for missing)
+        uniques: Index of the values, position = code
+        order: Row ids grouped by code
+        offsets: Start of each code's rows in order (slot 0 holds missing values)
+    """
+
+    def __init__(self, codes, uniques):
+        self.codes = codes
+        self.uniques = uniques
+        dtype = np.int32 if len(codes) < 2 ** 31 else np.int64
+        self.order = np.argsort(codes, kind='stable').astype(dtype)
+        counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def lookup(self, values):
+        """Get the codes of values, ignoring values that never occur"""
+        codes = self.uniques.get_indexer(values)
+        return np.unique(codes[codes >= 0])
+
+    def count(self, codes):
+        """Get the number of rows having any of the codes"""
+        return int(np.sum(self.offsets[codes + 2] - self.offsets[codes + 1]))
+
+    def rows(self, codes):
+        """Get the ascending row ids having any of the codes"""
+        slices = [self.order[self.offsets[code + 1]:self.offsets[code + 2]] for code in codes]
+        if len(slices) == 1:
+            return slices[0]
+        if not slices:
+            return self.order[:0]
+        return np.sort(np.concatenate(slices))
+
+    def matches(self, rows, codes):
+        """Get a boolean array telling which of the rows have any of the codes"""
+        wanted = np.zeros(len(self.uniques) + 1, dtype=bool)
+        wanted[codes + 1] = True
+        return wanted[self.codes[rows] + 1]
+
+
+class DateIndex:
+    """
+    Row ids of a date column in date order
+
+    A date range is a contiguous slice of the order, found with two
+    binary searches on the sorted timestamps.
+
+    Attributes:
+        stamps: int64 timestamp of each row
+        order: Row ids sorted by date (ties keep row order)
+        sorted_stamps: stamps in that order
+    """
+
+    def __init__(self, dates):
+        self.stamps = timestamps(dates)
+        dtype = np.int32 if len(self.stamps) < 2 ** 31 else np.int64
+        self.order = np.argsort(self.stamps, kind='stable').astype(dtype)
+        self.sorted_stamps = self.stamps[self.order]
+
+    def lookup(self, date_range):
+        """Get the DateRange itself and the slice of the order holding it, in O(log n)"""
+        low, high = date_range.bounds()
+        start, stop = np.searchsorted(self.sorted_stamps, [low, high], side='left')
+        return date_range, slice(int(start), int(max(start, stop)))
+
+    def count(self, key):
+        """Get the number of rows in a range from lookup()"""
+        _, bounds = key
+        return bounds.stop - bounds.start
+
+    def rows(self, key):
+        """Get the ascending row ids in a range from lookup()"""
+        _, bounds = key
+        return np.sort(self.order[bounds])
+
+    def matches(self, rows, key):
+        """Get a boolean array telling which of the rows fall in a range from lookup()"""
+        date_range, _ = key
+        return date_range.contains(self.stamps[rows])
+
+
+class DimensionIndex:
+    """
+    Row-id index over the columns of a read-only frame
+
+    Each column's postings are built on first use and kept. A filter
+    resolves to the row ids of its most selective column, which are
+    then intersected with the other columns by probing their codes at
+    just those rows, so the cost follows the size of the smallest
+    posting list, not the size of the frame. DateRange values use a
+    DateIndex of their column instead.
+
+    Attributes:
+        factorize: Function column -> (codes array, uniques Index)
+        dates: Function column -> Series of dates
+    """
+
+    def __init__(self, factorize, dates):
+        self.factorize = factorize
+        self.dates = dates
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _index(self, key, build):
+        """Get an index, building it on first use"""
+        try:
+            return self._indexes[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._indexes:
+                self._indexes[key] = build()
+            return self._indexes[key]
+
+    def postings(self, column):
+        """Get the Postings of a column, building them on first use"""
+        return self._index(('postings', column), lambda: Postings(*self.factorize(column)))
+
+    def date_index(self, column):
+        """Get the DateIndex of a date column, building it on first use"""
+        return self._index(('dates', column), lambda: DateIndex(self.dates(column)))
+
+    def build(self, columns):
+        """Build the postings of several columns up front"""
+        for column in columns:
+            self.postings(column)
+        return self
+
+    def select(self, filters):
+        """
+        Get the rows matching every filter
+
+        Parameters:
+            filters: Dictionary of column -> list of values or DateRange
+
+        Returns:
+            Ascending array of row ids, or None when there are no filters
+        """
+        if not filters:
+            return None
+
+        terms = []
+        for column, values in filters.items():
+            if isinstance(values, DateRange):
+                index = self.date_index(column)
+            else:
+                index = self.postings(column)
+            key = index.lookup(values)
+            terms.append((index.count(key), index, key))
+        terms.sort(key=lambda term: term[0])
+
+        _, index, key = terms[0]
+        rows = index.rows(key)
+        for _, index, key in terms[1:]:
+            if len(rows) == 0:
+                break
+            rows = rows[index.matches(rows, key)]
+        return rows
@@ -0,0 +1,647 @@
+"""
+Execution Engines
+Runs the row-scanning group-bys on pandas, on an embedded columnar engine (DuckDB, Polars) or on an indexed SQLite store
+"""
+
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import batch
+import data_cache as dc
+import loader
+import sqlite_store
+from dataset import find_dataset
+from dimension_index import DateRange
+from topn import top_n_positions
+
+
+# 'pandas' is the reference engine. 'duckdb' and 'polars' run the filter,
+# group-by and top-N cut inside that engine, multithreaded over Arrow
+# columns; they need the package of the same name installed. 'sqlite'
+# runs them as SQL over an indexed database file and needs nothing extra.
+ENGINES = ('pandas', 'duckdb', 'polars', 'sqlite')
+ENGINE = os.environ.get('SUPERSTORE_ENGINE', 'pandas')
+
+# Module each engine needs
+_MODULES = {'pandas': 'pandas', 'duckdb': 'duckdb', 'polars': 'polars', 'sqlite': 'sqlite3'}
+
+# Relative tolerance for float sums in check_parity(). The engines add
+# floats in different orders, so totals can differ in the last bits.
+PARITY_RTOL = 1e-9
+
+# Absolute tolerance for shaped results: a value a finish rounds to cents
+# may land one cent apart (with margin for the float error of 0.01 itself)
+PARITY_ATOL = 0.011
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def is_available(name):
+    """Check whether the package an engine needs is installed"""
+    return name in ENGINES and importlib.util.find_spec(_MODULES[name]) is not None
+
+
+def set_engine(name):
+    """
+    Choose the engine the analysis functions scan rows with
+
+    Parameters:
+        name: One of ENGINES
+    """
+    global ENGINE
+    get_engine(name)
+    ENGINE = name
+
+
+def get_engine(name=None):
+    """
+    Get an engine by name, creating it on first use
+
+    Parameters:
+        name: One of ENGINES (defaults to the configured ENGINE)
+
+    Returns:
+        PandasEngine, DuckDBEngine, PolarsEngine or SQLiteEngine
+    """
+    name = name or ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}")
+    if not is_available(name):
+        raise ImportError(f"The {name} engine needs the {_MODULES[name]} package (pip install {_MODULES[name]})")
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = {
+                'pandas': PandasEngine, 'duckdb': DuckDBEngine, 'polars': PolarsEngine, 'sqlite': SQLiteEngine
+            }[name]()
+        return _engines[name]
+
+
+# ==================== TABLES ====================
+
+class Table:
+    """
+    A sales frame converted for one engine
+
+    Attributes:
+        data: The engine's copy of the columns
+        dtypes: Dictionary of column -> pandas dtype of its group values
+        categories: Dictionary of column -> categories, for the columns
+            data holds as integer codes (null for missing)
+    """
+
+    def __init__(self, data, dtypes, categories=None):
+        self.data = data
+        self.dtypes = dtypes
+        self.categories = categories or {}
+
+
+class _TableCache:
+    """
+    An engine's Table for each frame object, kept while the frame lives
+
+    Frames are not modified after loading (see dataset.py), so a frame's
+    Table stays valid and page reruns skip the conversion.
+    """
+
+    def __init__(self):
+        # id(frame) -> (weak reference to the frame, its Table)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, df, build):
+        """Get the Table of a frame, calling build() the first time"""
+        with self._lock:
+            entry = self._tables.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        table = build()
+        self.put(df, table)
+        return table
+
+    def put(self, df, table):
+        """Keep a frame's Table"""
+        key, ref = id(df), weakref.ref(df)
+        with self._lock:
+            self._tables[key] = (ref, table)
+        weakref.finalize(df, self._forget, key, ref)
+
+    def _forget(self, key, ref):
+        with self._lock:
+            if key in self._tables and self._tables[key][0] is ref:
+                del self._tables[key]
+
+
+def _with_time_buckets(df):
+    """Get df with every time key column, computing the missing ones from Order Date"""
+    missing = [column for column in loader.TIME_BUCKET_COLUMNS if column not in df.columns]
+    if not missing or 'Order Date' not in df.columns:
+        return df
+    return pd.concat([df, loader.time_buckets(df['Order Date'])[missing]], axis=1)
+
+
+def _group_dtypes(df):
+    """Get the dtype aggregate_key() gives each column's group values"""
+    return {
+        column: values.cat.categories.dtype if isinstance(values.dtype, pd.CategoricalDtype) else values.dtype
+        for column, values in df.items()
+    }
+
+
+def _coded_table(df):
+    """
+    Convert a frame to an Arrow Table, with categoricals as their codes
+
+    Integer codes group, count and sort like the values (in the
+    categories' order) and are cheaper for the engines than strings.
+    """
+    import pyarrow as pa
+    df = _with_time_buckets(df)
+    categories = {}
+    arrays = {}
+    for column, values in df.items():
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            categories[column] = values.cat.categories
+            arrays[column] = pa.array(codes, mask=codes < 0)
+        else:
+            arrays[column] = pa.Array.from_pandas(values)
+    return Table(pa.table(arrays), _group_dtypes(df), categories)
+
+
+def _quote(column):
+    """Quote a column name as an SQL identifier"""
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _date_bounds(value):
+    """Get the [low, high) Timestamps of a DateRange (None for an open side)"""
+    low = None if value.start is None else pd.Timestamp(value.start).normalize()
+    high = None if value.end is None else pd.Timestamp(value.end).normalize() + pd.Timedelta(days=1)
+    return low, high
+
+
+def _filter_values(value):
+    """Get the list of values an equality filter accepts"""
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _filter_keys(table, column, value):
+    """Get the list of values an equality filter accepts, as stored in table"""
+    values = _filter_values(value)
+    if column not in table.categories:
+        return values
+    codes = table.categories[column].get_indexer(values)
+    return codes[codes >= 0].tolist()
+
+
+def _grouped_frame(table, by, measures, keys, columns, positions=None):
+    """
+    Shape an engine's output like batch.aggregate_key()
+
+    Parameters:
+        table: Table the engine read
+        by: Group column, or None for grand totals
+        measures: List of (column, how) pairs
+        keys: Array of group values (ignored for by=None)
+        columns: One array per measure, in order
+        positions: Position of each group among every group, for output cut to the top groups
+
+    Returns:
+        DataFrame indexed by group value, one column per (column, how)
+    """
+    if by is None:
+        index = pd.Index([None])
+    elif by in table.categories:
+        index = pd.Index(table.categories[by].take(np.asarray(keys, dtype=np.int64)), name=by)
+    else:
+        index = pd.Index(np.asarray(keys), name=by).astype(table.dtypes[by])
+    data = {}
+    for (column, how), values in zip(measures, columns):
+        values = np.asarray(values)
+        if how == 'sum' and not np.issubdtype(np.dtype(table.dtypes[column]), np.integer):
+            data[(column, how)] = values.astype(np.float64)
+        else:
+            data[(column, how)] = values.astype(np.int64)
+    if positions is not None:
+        data[batch.POSITION] = np.asarray(positions, dtype=np.int64)
+    return pd.DataFrame(data, index=index, columns=pd.MultiIndex.from_tuples(list(data)))
+
+
+# ==================== ENGINES ====================
+
+class PandasEngine:
+    """
+    Reference engine: batch.aggregate_key() over the matching rows
+
+    Every other engine must return what this one returns.
+    """
+
+    name = 'pandas'
+
+    def __init__(self):
+        self._tables = _TableCache()
+
+    def table(self, df):
+        """Get the Table this engine aggregates, built once per frame"""
+        if 'Order Date' not in df.columns or all(column in df.columns for column in loader.TIME_BUCKET_COLUMNS):
+            # Nothing to convert, and caching a Table holding df would keep df alive
+            return Table(df, _group_dtypes(df))
+
+        def build():
+            frame = _with_time_buckets(df)
+            return Table(frame, _group_dtypes(frame))
+        return self._tables.get(df, build)
+
+    def aggregate(self, table, by, measures, filters=None, limit=None):
+        """
+        Aggregate the rows matching filters for one group key
+
+        Parameters:
+            table: Table from table()
+            by: Column to group by, or None for grand totals
+            measures: List of (column, how) pairs
+            filters: Dictionary of column -> value(s) or DateRange
+            limit: (measure, ascending, n) to keep only the first n groups
+                ranked by measure (see batch.limits), or None for every group
+
+        Returns:
+            DataFrame like batch.aggregate_key(): in group order, or in rank
+            order with a batch.POSITION column when limited
+        """
+        df = table.data
+        rows = None
+        if filters:
+            mask = np.ones(len(df), dtype=bool)
+            for column, value in filters.items():
+                if isinstance(value, DateRange):
+                    low, high = _date_bounds(value)
+                    if low is not None:
+                        mask &= (df[column] >= low).to_numpy()
+                    if high is not None:
+                        mask &= (df[column] < high).to_numpy()
+                else:
+                    mask &= df[column].isin(_filter_values(value)).to_numpy()
+            rows = np.flatnonzero(mask)
+
+        grouped = batch.aggregate_key(df, by, measures, rows)
+        if limit is not None:
+            measure, ascending, n = limit
+            positions = top_n_positions(grouped[measure].to_numpy(), n, ascending)
+            grouped = grouped.iloc[positions].copy()
+            grouped[batch.POSITION] = positions
+        return grouped
+
+
+def _sql_aggregate(table, by, measures, filters, limit, float_sum, date_param):
+    """
+    Build the query of aggregate() for an SQL engine, over a table named sales
+
+    Filter values are bound as parameters, never formatted into the SQL.
+
+    Parameters:
+        table: Table the query reads
+        by, measures, filters, limit: See PandasEngine.aggregate
+        float_sum: SQL function summing floats
+        date_param: Function Timestamp -> parameter compared with a date column
+
+    Returns:
+        (sql, params); the columns are g (the group value, unless by is None),
+        m0, m1, ... (the measures) and, when limited, p (the group's position)
+    """
+    q = _quote
+    selects = []
+    for i, (column, how) in enumerate(measures):
+        if how == 'count':
+            expression = 'COUNT(*)'
+        elif how == 'nunique':
+            expression = f'COUNT(DISTINCT {q(column)})'
+        elif np.issubdtype(np.dtype(table.dtypes[column]), np.integer):
+            expression = f'CAST(COALESCE(SUM({q(column)}), 0) AS BIGINT)'
+        else:
+            expression = f'COALESCE({float_sum}({q(column)}), 0)'
+        selects.append(f'{expression} AS m{i}')
+    if by is not None and limit is not None:
+        # Numbered over every group, before the LIMIT cuts them
+        selects.append(f'ROW_NUMBER() OVER (ORDER BY {q(by)}) - 1 AS p')
+
+    conditions, params = [], []
+    for column, value in (filters or {}).items():
+        if isinstance(value, DateRange):
+            low, high = _date_bounds(value)
+            if low is not None:
+                conditions.append(f'{q(column)} >= ?')
+                params.append(date_param(low))
+            if high is not None:
+                conditions.append(f'{q(column)} < ?')
+                params.append(date_param(high))
+        else:
+            values = _filter_keys(table, column, value)
+            if not values:
+                conditions.append('FALSE')
+                continue
+            conditions.append(f'{q(column)} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+
+    sql = f'SELECT {", ".join(selects)} FROM sales'
+    if by is not None:
+        conditions.append(f'{q(by)} IS NOT NULL')
+        sql = f'SELECT {q(by)} AS g, {", ".join(selects)} FROM sales'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    if by is not None:
+        sql += f' GROUP BY {q(by)}'
+        if limit is None:
+            sql += f' ORDER BY {q(by)}'
+        else:
+            measure, ascending, n = limit
+            position = measures.index(tuple(measure))
+            sql += f' ORDER BY m{position} {"ASC" if ascending else "DESC"}, {q(by)} LIMIT {int(n)}'
+    return sql, params
+
+
+class DuckDBEngine:
+    """
+    Embedded DuckDB over an Arrow copy of the frame (see _coded_table)
+
+    Each call is one parameterized SQL query on its own connection, so
+    sessions can aggregate concurrently.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self):
+        import duckdb
+        self._duckdb = duckdb
+        self._tables = _TableCache()
+
+    def table(self, df):
+        """Get the Table this engine aggregates, built once per frame"""
+        return self._tables.get(df, lambda: _coded_table(df))
+
+    def aggregate(self, table, by, measures, filters=None, limit=None):
+        """Aggregate the rows matching filters for one group key (see PandasEngine.aggregate)"""
+        # fsum is a compensated sum, like pandas groupby sums
+        sql, params = _sql_aggregate(table, by, measures, filters, limit, 'fsum', lambda stamp: stamp)
+        with self._duckdb.connect() as con:
+            con.register('sales', table.data)
+            result = con.execute(sql, params).fetchnumpy()
+        return _grouped_frame(table, by, measures, result.get('g'), [result[f'm{i}'] for i in range(len(measures))],
+                              result.get('p'))
+
+
+class SQLiteEngine:
+    """
+    SQLite store on disk (see sqlite_store.py)
+
+    A shared Dataset's rows are ingested once per version into
+    <csv>.sqlite, or read from there if sqlite_store.py already built
+    it, so the engine's copy of the rows stays on disk and in the OS
+    page cache rather than in every process's heap. Filters on the
+    indexed columns are range scans of covering indexes. Other frames
+    (or a read-only data folder) get a temporary store that lives as
+    long as their Table. Each frame's Table is built once, and rows
+    appended to a Dataset are inserted into its store (see append).
+
+    SQLite's SUM is not compensated, so float sums can differ from the
+    reference in the last bits (see PARITY_RTOL).
+    """
+
+    name = 'sqlite'
+
+    def __init__(self):
+        self._tables = _TableCache()
+
+    def table(self, df):
+        """Get the Table this engine aggregates, built once per frame"""
+        return self._tables.get(df, lambda: self._build(df))
+
+    def _build(self, df):
+        """Write or open the store of a frame"""
+        frame = _with_time_buckets(df)
+        dataset = find_dataset(df)
+        source = df.attrs.get('source') or {}
+        table = None
+        if dataset is not None and source.get('path'):
+            try:
+                path = sqlite_store.open_store(frame, dataset.version, dc.sqlite_path(source['path']))
+                table = Table(path, _group_dtypes(frame))
+            except (OSError, sqlite3.Error):
+                pass
+        if table is None:
+            handle, path = tempfile.mkstemp(suffix=dc.SQLITE_SUFFIX)
+            os.close(handle)
+            sqlite_store.write_store(frame, path, dataset.version if dataset is not None else None)
+            table = Table(path, _group_dtypes(frame))
+            weakref.finalize(table, os.remove, path)
+        return table
+
+    def append(self, table, df, start, version=None, previous=None):
+        """
+        Carry a Table over rows appended to its frame
+
+        Only the new rows are inserted into the Table's store, which then
+        holds the grown frame (a Dataset superseded by the append reads
+        the grown store too).
+
+        Parameters:
+            table: Table of the frame's first start rows
+            df: Grown frame
+            start: Number of rows table holds
+            version: Data version of the grown frame
+            previous: Data version table was built for
+
+        Returns:
+            The Table, or None if the store has to be written again
+        """
+        frame = _with_time_buckets(df)
+        if not sqlite_store.append_store(frame, start, table.data, version, previous):
+            return None
+        table.dtypes = _group_dtypes(frame)
+        self._tables.put(df, table)
+        return table
+
+    def aggregate(self, table, by, measures, filters=None, limit=None):
+        """Aggregate the rows matching filters for one group key (see PandasEngine.aggregate)"""
+        sql, params = _sql_aggregate(table, by, measures, filters, limit, 'SUM', sqlite_store.date_text)
+        con = sqlite_store.connect(table.data)
+        try:
+            rows = con.execute(sql, params).fetchall()
+        finally:
+            con.close()
+        limited = by is not None and limit is not None
+        columns = list(zip(*rows)) if rows else [()] * (len(measures) + (by is not None) + limited)
+        if by is None:
+            return _grouped_frame(table, by, measures, None, columns)
+        return _grouped_frame(table, by, measures, columns[0], columns[1:1 + len(measures)],
+                              columns[-1] if limited else None)
+
+
+class PolarsEngine:
+    """
+    Polars lazy queries over a copy of the frame (see _coded_table)
+
+    Polars has no compensated float sum, so Sales and Profit totals can
+    differ from the reference in the last bits (see PARITY_RTOL).
+    """
+
+    name = 'polars'
+
+    def __init__(self):
+        import polars
+        self._pl = polars
+        self._tables = _TableCache()
+
+    def table(self, df):
+        """Get the Table this engine aggregates, built once per frame"""
+        def build():
+            table = _coded_table(df)
+            return Table(self._pl.from_arrow(table.data), table.dtypes, table.categories)
+        return self._tables.get(df, build)
+
+    def aggregate(self, table, by, measures, filters=None, limit=None):
+        """Aggregate the rows matching filters for one group key (see PandasEngine.aggregate)"""
+        pl = self._pl
+        expressions = []
+        for i, (column, how) in enumerate(measures):
+            if how == 'count':
+                expression = pl.len()
+            elif how == 'nunique':
+                expression = pl.col(column).drop_nulls().n_unique()
+            elif np.issubdtype(np.dtype(table.dtypes[column]), np.integer):
+                expression = pl.col(column).cast(pl.Int64).sum()
+            else:
+                expression = pl.col(column).sum()
+            expressions.append(expression.alias(f'm{i}'))
+
+        query = table.data.lazy()
+        for column, value in (filters or {}).items():
+            if isinstance(value, DateRange):
+                low, high = _date_bounds(value)
+                if low is not None:
+                    query = query.filter(pl.col(column) >= low.to_pydatetime())
+                if high is not None:
+                    query = query.filter(pl.col(column) < high.to_pydatetime())
+            else:
+                query = query.filter(pl.col(column).is_in(_filter_keys(table, column, value)))
+
+        if by is None:
+            result = query.select(expressions).collect()
+            return _grouped_frame(table, by, measures, None, [result[f'm{i}'].to_numpy() for i in range(len(measures))])
+
+        query = query.filter(pl.col(by).is_not_null()).group_by(by).agg(expressions).sort(by)
+        if limit is not None:
+            measure, ascending, n = limit
+            position = measures.index(tuple(measure))
+            query = query.with_row_index('p').sort([f'm{position}', by], descending=[not ascending, False]).head(n)
+        result = query.collect()
+        return _grouped_frame(table, by, measures, result[by].to_numpy(),
+                              [result[f'm{i}'].to_numpy() for i in range(len(measures))],
+                              result['p'].to_numpy() if limit is not None else None)
+
+
+# ==================== PARITY ====================
+
+def _difference(expected, actual):
+    """
+    Compare two aggregate frames or shaped results, index included, allowing PARITY_RTOL on floats
+
+    A last-bit difference in a sum can flip a value rounded to cents, so
+    floats also pass within PARITY_ATOL.
+
+    Returns:
+        None if they match, else a description of the difference
+    """
+    try:
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=PARITY_RTOL, atol=PARITY_ATOL)
+        elif isinstance(expected, pd.Series):
+            pd.testing.assert_series_equal(expected, actual, check_exact=False, rtol=PARITY_RTOL, atol=PARITY_ATOL)
+        else:
+            pd.testing.assert_series_equal(pd.Series(expected), pd.Series(actual),
+                                           check_exact=False, rtol=PARITY_RTOL, atol=PARITY_ATOL)
+    except (AssertionError, TypeError) as error:
+        return str(error).strip()
+    return None
+
+
+def run_batch(df, specs, filters=None, name=None):
+    """
+    Compute aggregation specs with one engine (see batch.run_batch)
+
+    Group keys whose specs all rank and keep the top rows (batch.limits)
+    are cut to them inside the engine. The engine's copy of df is made
+    on the first call and reused while df lives.
+
+    Parameters:
+        df: Sales DataFrame
+        specs: Dictionary of name -> spec
+        filters: Dictionary of column -> value(s) or DateRange
+        name: One of ENGINES (defaults to the configured ENGINE)
+
+    Returns:
+        Dictionary of name -> result
+    """
+    engine = get_engine(name)
+    table = engine.table(df)
+    limits = batch.limits(specs)
+    return batch.run_batch(df, specs, aggregate=lambda by, measures: engine.aggregate(
+        table, by, measures, filters, limits.get(by)))
+
+
+def check_parity(df, specs, filter_sets=(None,), engines=None):
+    """
+    Check that engines return what the pandas reference returns
+
+    For each filters dictionary, every group key the specs need is
+    aggregated, cut to the top rows where batch.limits allows, and
+    compared with the reference engine's aggregate: same groups in the
+    same order, same dtypes, same counts and integer sums, float sums
+    within PARITY_RTOL. Then every spec's shaped result, as run_batch()
+    returns it with the cuts pushed into the engine, is compared with
+    the uncut pandas result callers get without an engine, row labels
+    included.
+
+    Parameters:
+        df: Sales DataFrame
+        specs: Dictionary of name -> spec
+        filter_sets: Filters dictionaries (or None) to aggregate with
+        engines: Engine names to check (defaults to every installed one)
+
+    Returns:
+        List of (engine, filters, what, difference) for every mismatch,
+        what being 'by=<group key>' or 'spec=<spec name>'
+    """
+    names = [name for name in engines or ENGINES if name != 'pandas' and is_available(name)]
+    reference = get_engine('pandas')
+    tables = {name: get_engine(name).table(df) for name in ['pandas', *names]}
+    keys = batch.plan(specs)
+    limits = batch.limits(specs)
+
+    mismatches = []
+    for filters in filter_sets:
+        for by, measures in keys.items():
+            expected = reference.aggregate(tables['pandas'], by, measures, filters, limits.get(by))
+            for name in names:
+                actual = get_engine(name).aggregate(tables[name], by, measures, filters, limits.get(by))
+                difference = _difference(expected, actual)
+                if difference is not None:
+                    mismatches.append((name, filters, f'by={by}', difference))
+
+        expected = batch.run_batch(df, specs, aggregate=lambda by, measures: reference.aggregate(
+            tables['pandas'], by, measures, filters))
+        for name in names:
+            actual = batch.run_batch(df, specs, aggregate=lambda by, measures: get_engine(name).aggregate(
+                tables[name], by, measures, filters, limits.get(by)))
+            for spec_name in specs:
+                difference = _difference(expected[spec_name], actual[spec_name])
+                if difference is not None:
+                    mismatches.append((name, filters, f'spec={spec_name}', difference))
+    return mismatches
@@ -0,0 +1,279 @@
+"""
+Hot-Path Instrumentation
+Times analysis calls and page sections into a fixed-size ring buffer, switched on and off at runtime
+
+Turn it on with SUPERSTORE_INSTRUMENT=1 or from the Performance page. While it
+is off, analysis functions and Dataset.derived are the plain, unwrapped ones.
+"""
+
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+import analysis
+from dataset import Dataset
+
+
+# Records kept; the oldest are dropped first
+RING_SIZE = int(os.environ.get('SUPERSTORE_INSTRUMENT_RING', '10000'))
+
+FIELDS = ('kind', 'name', 'started', 'seconds', 'rows', 'result_size', 'cache')
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+_enabled = False
+_records = collections.deque(maxlen=RING_SIZE)
+_originals = {}
+_toggle_lock = threading.Lock()
+# Per thread: [hits, misses] of each instrumented call in progress
+_local = threading.local()
+
+
+# ==================== RECORDING ====================
+
+def _calls():
+    """Get this thread's stack of instrumented calls in progress"""
+    try:
+        return _local.calls
+    except AttributeError:
+        _local.calls = []
+        return _local.calls
+
+
+def _result_size(result):
+    """Rows of a table, entries of a dictionary, or 1 for a scalar"""
+    if isinstance(result, (pd.DataFrame, pd.Series, dict, list, tuple)):
+        return len(result)
+    return 1
+
+
+def _cache_status(hits, misses):
+    """'miss' if anything was built, 'hit' if everything came from memos, None if nothing is memoized"""
+    if misses:
+        return 'miss'
+    return 'hit' if hits else None
+
+
+def _instrumented(name, func):
+    """Wrap an analysis function so each call is recorded"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        calls = _calls()
+        counts = [0, 0]
+        calls.append(counts)
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            calls.pop()
+            if calls:
+                # Memo lookups of nested calls count for the caller too
+                calls[-1][0] += counts[0]
+                calls[-1][1] += counts[1]
+
+        cache = _cache_status(*counts)
+        df = args[0] if args and isinstance(args[0], pd.DataFrame) else None
+        rows = None if df is None else 0 if cache == 'hit' else len(df)
+        _records.append(('function', name, started, seconds, rows, _result_size(result), cache))
+        return result
+    return wrapper
+
+
+def _counted_derived(self, key, build, update=None):
+    """Dataset.derived that counts memo hits and misses for the call in progress"""
+    calls = getattr(_local, 'calls', None)
+    if calls:
+        calls[-1][0 if key in self._derived else 1] += 1
+    return _originals['Dataset.derived'](self, key, build, update)
+
+
+def _public_functions():
+    """Get the public functions defined in analysis.py"""
+    return {
+        name: value for name, value in vars(analysis).items()
+        if callable(value) and not name.startswith('_') and getattr(value, '__module__', None) == 'analysis'
+    }
+
+
+# ==================== SWITCHING ====================
+
+def is_enabled():
+    """Check whether instrumentation is on"""
+    return _enabled
+
+
+def set_enabled(enabled):
+    """
+    Turn instrumentation on or off for the whole process
+
+    Turning it on replaces every public analysis function with a timed
+    wrapper and Dataset.derived with a version that counts memo hits.
+    Turning it off puts the originals back, so nothing is left on the
+    hot path. Callers must reach analysis functions through the module
+    (an.get_...) for this to take effect.
+
+    Parameters:
+        enabled: True to record, False to stop
+    """
+    global _enabled
+    with _toggle_lock:
+        if enabled == _enabled:
+            return
+        if enabled:
+            for name, func in _public_functions().items():
+                _originals[name] = func
+                setattr(analysis, name, _instrumented(name, func))
+            _originals['Dataset.derived'] = Dataset.derived
+            Dataset.derived = _counted_derived
+        else:
+            Dataset.derived = _originals.pop('Dataset.derived')
+            for name, func in _originals.items():
+                setattr(analysis, name, func)
+            _originals.clear()
+        _enabled = enabled
+
+
+# ==================== PAGES ====================
+
+class PageTimer:
+    """
+    Times one run of a page script, section by section
+
+    Each section() call ends the previous section, and end() records
+    the section in progress and the whole run. Times cover building
+    the page's elements, not the browser drawing them.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self._section = None
+        self._started = time.time()
+        self._start = self._section_start = time.perf_counter()
+
+    def section(self, name):
+        """Start timing the next section"""
+        now = time.perf_counter()
+        self._close(now)
+        self._section = name
+        self._section_start = now
+
+    def end(self):
+        """Record the section in progress and the whole run"""
+        now = time.perf_counter()
+        self._close(now)
+        self._section = None
+        _records.append(('page', self.page, self._started, now - self._start, None, None, None))
+
+    def _close(self, now):
+        if self._section is not None:
+            started = self._started + (self._section_start - self._start)
+            _records.append(('section', f'{self.page} › {self._section}', started,
+                             now - self._section_start, None, None, None))
+
+
+class _NoTimer:
+    """PageTimer stand-in used while instrumentation is off"""
+
+    def section(self, name):
+        pass
+
+    def end(self):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def page_timer(page):
+    """
+    Get a timer for one run of a page (a no-op while instrumentation is off)
+
+    Parameters:
+        page: Page name
+
+    Returns:
+        PageTimer
+    """
+    return PageTimer(page) if _enabled else _NO_TIMER
+
+
+# ==================== REPORTING ====================
+
+def records():
+    """
+    Get the recorded calls, oldest first
+
+    Returns:
+        DataFrame with one row per record and the FIELDS columns
+    """
+    return pd.DataFrame(list(_records), columns=list(FIELDS))
+
+
+def clear():
+    """Drop every record"""
+    _records.clear()
+
+
+def summary(recorded=None):
+    """
+    Summarize the records per function, page and page section
+
+    Parameters:
+        recorded: DataFrame from records() (defaults to the current buffer)
+
+    Returns:
+        DataFrame with call counts, p50/p95/p99 and mean milliseconds,
+        mean rows scanned and result size, and the memo hit rate
+    """
+    recorded = records() if recorded is None else recorded
+    columns = ['kind', 'name', 'calls'] + [f'p{int(q * 100)} ms' for q in PERCENTILES] + [
+        'mean ms', 'rows scanned', 'result size', 'hit rate']
+    if recorded.empty:
+        return pd.DataFrame(columns=columns)
+
+    recorded = recorded.assign(
+        ms=recorded['seconds'] * 1000,
+        hit=recorded['cache'].map({'hit': 1.0, 'miss': 0.0}),
+        rows=pd.to_numeric(recorded['rows']),
+        result_size=pd.to_numeric(recorded['result_size'])
+    )
+    grouped = recorded.groupby(['kind', 'name'], sort=False)
+    table = grouped['ms'].quantile(list(PERCENTILES)).unstack()
+    table.columns = [f'p{int(q * 100)} ms' for q in PERCENTILES]
+    table.insert(0, 'calls', grouped.size())
+    table['mean ms'] = grouped['ms'].mean()
+    table['rows scanned'] = grouped['rows'].mean()
+    table['result size'] = grouped['result_size'].mean()
+    table['hit rate'] = grouped['hit'].mean()
+    table = table.reset_index()[columns]
+    return table.sort_values(['kind', 'p95 ms'], ascending=[True, False], ignore_index=True)
+
+
+def export_json(recorded=None):
+    """
+    Serialize the records and their summary as JSON
+
+    Parameters:
+        recorded: DataFrame from records() (defaults to the current buffer)
+
+    Returns:
+        JSON string with 'summary' and 'records' lists
+    """
+    recorded = records() if recorded is None else recorded
+    return json.dumps({
+        'exported': time.time(),
+        'ring_size': RING_SIZE,
+        'summary': json.loads(summary(recorded).to_json(orient='records')),
+        'records': json.loads(recorded.to_json(orient='records'))
+    }, indent=1)
+
+
+if os.environ.get('SUPERSTORE_INSTRUMENT', '0') == '1':
+    set_enabled(True)
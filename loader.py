@@ -0,0 +1,408 @@
+"""
+Sales Data Loader
+Detects the CSV encoding once and parses the file in a single pass
+"""
+
+import codecs
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import column_store
+import data_cache as dc
+from schema import SUPERSTORE_SCHEMA, schema_key
+
+
+# Bump when parsing changes so cached frames are rebuilt
+PARSER_VERSION = 'loader-5'
+
+DATA_PATH = 'data/superstore.csv'
+
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_COUNT = 16
+
+# Bytes that have no mapping in Windows-1252
+CP1252_UNDEFINED = frozenset(b'\x81\x8d\x8f\x90\x9d')
+
+
+# ==================== ENCODING DETECTION ====================
+
+def _read_samples(path, sample_size=SAMPLE_SIZE, sample_count=SAMPLE_COUNT):
+    """
+    Read evenly spaced byte windows from a file
+
+    Parameters:
+        path: File path
+        sample_size: Bytes per window
+        sample_count: Number of windows
+
+    Returns:
+        List of (offset, bytes) tuples
+    """
+    size = os.path.getsize(path)
+    if size <= sample_size * sample_count:
+        with open(path, 'rb') as f:
+            return [(0, f.read())]
+
+    step = (size - sample_size) // (sample_count - 1)
+    samples = []
+    with open(path, 'rb') as f:
+        for i in range(sample_count):
+            offset = i * step
+            f.seek(offset)
+            samples.append((offset, f.read(sample_size)))
+    return samples
+
+
+def _is_utf8(offset, data):
+    """Check a byte window decodes as UTF-8, ignoring sequences cut at its edges"""
+    if offset > 0:
+        # Skip continuation bytes of a character that started before the window
+        start = 0
+        while start < min(len(data), 3) and 0x80 <= data[start] <= 0xBF:
+            start += 1
+        data = data[start:]
+    try:
+        # final=False tolerates a multi-byte character cut at the end of the window
+        codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_encoding(path, sample_size=SAMPLE_SIZE, sample_count=SAMPLE_COUNT):
+    """
+    Detect the text encoding of a CSV by sampling its bytes
+
+    Files up to sample_size * sample_count bytes are checked in full.
+    Larger files are checked at evenly spaced windows.
+
+    Parameters:
+        path: File path
+        sample_size: Bytes per window
+        sample_count: Number of windows
+
+    Returns:
+        Encoding name ('utf-8-sig', 'utf-8', 'cp1252' or 'latin-1')
+    """
+    samples = _read_samples(path, sample_size, sample_count)
+
+    if samples[0][1].startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    if all(_is_utf8(offset, data) for offset, data in samples):
+        return 'utf-8'
+
+    if not any(CP1252_UNDEFINED.intersection(data) for _, data in samples):
+        return 'cp1252'
+
+    # latin-1 maps every byte, so it always decodes
+    return 'latin-1'
+
+
+# ==================== LOADING ====================
+
+def cache_key(schema=None):
+    """Get the on-disk cache key for frames parsed with a schema"""
+    schema = schema if schema is not None else SUPERSTORE_SCHEMA
+    return f'{PARSER_VERSION}:{schema_key(schema)}'
+
+
+def _convert_dates(df, schema):
+    """Convert date columns with their declared formats"""
+    for column, date_format in schema['dates'].items():
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], format=date_format)
+
+
+def read_sales_csv(path, schema=None):
+    """
+    Parse a sales CSV with its detected encoding and declared schema
+
+    The encoding is recorded in df.attrs['source'].
+
+    Parameters:
+        path: Path of the CSV file
+        schema: Schema dictionary (defaults to SUPERSTORE_SCHEMA)
+
+    Returns:
+        DataFrame
+    """
+    schema = schema if schema is not None else SUPERSTORE_SCHEMA
+    dtypes = schema['dtypes']
+
+    encoding = detect_encoding(path)
+    encoding_errors = 'strict'
+    try:
+        df = pd.read_csv(path, encoding=encoding, dtype=dtypes)
+    except UnicodeDecodeError:
+        # A byte outside the sampled windows did not fit - reparse once, tolerantly
+        encoding, encoding_errors = 'cp1252', 'replace'
+        df = pd.read_csv(path, encoding=encoding, encoding_errors=encoding_errors, dtype=dtypes)
+
+    _convert_dates(df, schema)
+
+    df.attrs['source'] = {
+        'path': path,
+        'encoding': encoding,
+        'encoding_errors': encoding_errors
+    }
+    return df
+
+
+def load_sales_data(path=DATA_PATH, use_cache=True, schema=None):
+    """
+    Load sales data through the on-disk caches (see analysis.load_data)
+
+    A current column store is mapped without parsing anything. Otherwise
+    the frame comes from the Parquet cache or the CSV, is saved as a
+    column store, and the mapped copy is returned, so every process
+    loading the same data shares its pages.
+
+    Parameters:
+        path: Path of the CSV file
+        use_cache: Read and write the on-disk cache
+        schema: Column types and date formats (defaults to SUPERSTORE_SCHEMA)
+
+    Returns:
+        DataFrame or None
+    """
+    key = cache_key(schema)
+    if use_cache:
+        df = column_store.read_columns(path, key=key)
+        if df is not None:
+            return df
+
+        df = dc.read_cache(path, key=key)
+        if df is not None:
+            return _mapped(df, path, key)
+
+        # If the CSV only grew since it was cached, parse just the new rows
+        df = dc.read_previous_cache(path, key=key)
+        if df is not None:
+            df = append_sales_data(df, path, schema)
+            if df is not None:
+                dc.write_cache(df, path, df.attrs['source']['fingerprint'], key=key)
+                return _mapped(df, path, key)
+
+    try:
+        # Fingerprint before parsing so a file replaced mid-parse is not cached under the new key
+        fingerprint = dc.file_fingerprint(path)
+        df = read_sales_csv(path, schema)
+    except FileNotFoundError:
+        return None
+
+    # Time keys are computed once here so the trend functions never convert dates
+    add_time_buckets(df)
+
+    df.attrs['source']['fingerprint'] = fingerprint
+    df.attrs['source']['version'] = dc.data_version(fingerprint, key)
+
+    if use_cache:
+        dc.write_cache(df, path, fingerprint, key=key)
+        return _mapped(df, path, key)
+
+    return df
+
+
+def _mapped(df, path, key):
+    """Save a frame as a column store and return the mapped copy (df itself if that fails)"""
+    if column_store.write_columns(df, path, df.attrs['source']['fingerprint'], key):
+        mapped = column_store.read_columns(path, key=key)
+        if mapped is not None:
+            return mapped
+    return df
+
+
+# ==================== APPENDED ROWS ====================
+
+def read_appended_rows(path, source, schema=None):
+    """
+    Parse only the rows appended to a CSV since a frame was loaded from it
+
+    Parameters:
+        path: Path of the CSV file
+        source: df.attrs['source'] of the loaded frame
+        schema: Schema dictionary (defaults to SUPERSTORE_SCHEMA)
+
+    Returns:
+        (DataFrame of the new rows with time keys, fingerprint of the grown file),
+        or None if the file changed other than by appending
+    """
+    schema = schema if schema is not None else SUPERSTORE_SCHEMA
+    fingerprint = source.get('fingerprint')
+    if fingerprint is None:
+        return None
+
+    try:
+        current = dc.appended_fingerprint(path, fingerprint)
+        if current is None:
+            return None
+        with open(path, 'rb') as f:
+            header = f.readline()
+            f.seek(fingerprint['size'])
+            tail = f.read(current['size'] - fingerprint['size'])
+    except OSError:
+        return None
+
+    if tail and not tail.endswith(b'\n'):
+        # A row is still being written
+        return None
+
+    try:
+        rows = pd.read_csv(io.BytesIO(header + tail), encoding=source['encoding'],
+                           encoding_errors=source['encoding_errors'], dtype=schema['dtypes'])
+    except UnicodeDecodeError:
+        # The new rows do not fit the detected encoding, so the whole file must be re-read
+        return None
+
+    _convert_dates(rows, schema)
+    add_time_buckets(rows)
+    return rows, current
+
+
+def append_rows(df, rows):
+    """
+    Append newly parsed rows to a loaded frame
+
+    Categorical columns get the sorted union of both sets of
+    categories, so the result equals a full parse of the grown file.
+
+    Parameters:
+        df: Loaded sales DataFrame
+        rows: New rows with the same columns
+
+    Returns:
+        New DataFrame (df is not modified)
+    """
+    columns = {}
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            columns[column] = pd.Series(union_categoricals([df[column], rows[column]], sort_categories=True))
+        else:
+            columns[column] = pd.concat([df[column], rows[column]], ignore_index=True)
+
+    combined = pd.DataFrame(columns)
+    combined.attrs = dict(df.attrs)
+    return combined
+
+
+def append_sales_data(df, path=DATA_PATH, schema=None):
+    """
+    Bring a loaded frame up to date with the rows appended to its CSV
+
+    Only the appended bytes are parsed. The first len(df) rows of the
+    result are df's rows.
+
+    Parameters:
+        df: Frame from load_sales_data()
+        path: Path of the CSV file
+        schema: Column types and date formats (defaults to SUPERSTORE_SCHEMA)
+
+    Returns:
+        DataFrame (df itself when nothing was appended), or None if the
+        CSV changed other than by appending
+    """
+    source = df.attrs['source']
+    appended = read_appended_rows(path, source, schema)
+    if appended is None:
+        return None
+
+    rows, fingerprint = appended
+    if len(rows) == 0:
+        return df
+
+    combined = append_rows(df, rows)
+    combined.attrs['source'] = dict(source, fingerprint=fingerprint,
+                                    version=dc.data_version(fingerprint, cache_key(schema)))
+    return combined
+
+
+# ==================== CHUNKED READING ====================
+
+def read_sales_chunks(path, chunk_rows, schema=None, columns=None, encoding=None, encoding_errors='strict'):
+    """
+    Parse a sales CSV in chunks of rows, for files too large to load at once
+
+    Each chunk has its dates converted and, when Order Date is read as
+    a date, its time keys added. Categorical columns only know the values of
+    their own chunk, so chunks must be combined by value, not by code.
+
+    Parameters:
+        path: Path of the CSV file
+        chunk_rows: Rows per chunk, or a function () -> rows called before each chunk
+        schema: Schema dictionary (defaults to SUPERSTORE_SCHEMA)
+        columns: Columns to read (None for all)
+        encoding: Text encoding (detected when None)
+        encoding_errors: How undecodable bytes are handled
+
+    Yields:
+        DataFrame chunks in file order
+    """
+    schema = schema if schema is not None else SUPERSTORE_SCHEMA
+    encoding = encoding if encoding is not None else detect_encoding(path)
+    next_rows = chunk_rows if callable(chunk_rows) else lambda: chunk_rows
+
+    with pd.read_csv(path, encoding=encoding, encoding_errors=encoding_errors, dtype=schema['dtypes'],
+                     usecols=columns, iterator=True) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(max(1, int(next_rows())))
+            except StopIteration:
+                return
+            _convert_dates(chunk, schema)
+            if 'Order Date' in chunk.columns and 'Order Date' in schema['dates']:
+                add_time_buckets(chunk)
+            yield chunk
+
+
+# ==================== TIME BUCKETS ====================
+
+TIME_BUCKET_COLUMNS = ['Order Year', 'Order Quarter', 'Order Month', 'Order Week', 'Order Day']
+
+
+def time_buckets(dates):
+    """
+    Compute integer time keys for a datetime Series
+
+    Order Quarter and Order Month are ordinals (year * 4 + quarter - 1,
+    year * 12 + month - 1). Order Day counts days since 1970-01-01 and
+    Order Week counts Monday-based weeks.
+
+    Parameters:
+        dates: Datetime Series
+
+    Returns:
+        DataFrame with one column per time key
+    """
+    day = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    year = dates.dt.year.to_numpy().astype(np.int32)
+    month = dates.dt.month.to_numpy().astype(np.int32)
+
+    return pd.DataFrame({
+        'Order Year': year.astype(np.int16),
+        'Order Quarter': year * 4 + (month - 1) // 3,
+        'Order Month': year * 12 + month - 1,
+        # 1970-01-01 was a Thursday, so shift by 3 days to start weeks on Monday
+        'Order Week': ((day + 3) // 7).astype(np.int32),
+        'Order Day': day.astype(np.int32)
+    }, index=dates.index)
+
+
+def add_time_buckets(df):
+    """
+    Add the integer time key columns computed from Order Date
+
+    Parameters:
+        df: Sales DataFrame
+
+    Returns:
+        The same DataFrame with the time key columns added
+    """
+    buckets = time_buckets(df['Order Date'])
+    for column in TIME_BUCKET_COLUMNS:
+        df[column] = buckets[column]
+    return df
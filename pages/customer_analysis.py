@@ -4,30 +4,42 @@ Customer Analysis Page
 
 import streamlit as st
 import analysis as an
+import instrumentation
+from data_provider import get_dataset
 
 st.set_page_config(page_title="Customer Analysis", page_icon="👥", layout="wide")
 
-# Load data
-@st.cache_data
-def load_data():
-    return an.load_data()
+# Time this run section by section (a no-op unless instrumentation is on)
+perf = instrumentation.page_timer("Customer Analysis")
 
-df = load_data()
+perf.section("Load data")
+# Load shared data
+dataset = get_dataset()
 
-if df is None:
+if dataset is None:
     st.error("⚠️ Data file not found!")
     st.stop()
 
+df = dataset.df
+
 # ==================== CUSTOMER ANALYSIS PAGE ====================
 
 st.title("👥 Customer Analysis")
 
+perf.section("Batch")
+# Everything on this page, computed in one batch (ranked lists are sliced below)
+results = an.run_batch(df, {
+    'segment_sales': an.SALES_BY_SEGMENT_SPEC,
+    'top_customers': an.TOP_CUSTOMERS_SPEC
+})
+
 st.markdown("---")
 
+perf.section("Customer Segments")
 # Customer Segments
 st.markdown("## 📊 Customer Segments")
 
-segment_sales = an.get_sales_by_segment(df)
+segment_sales = results['segment_sales']
 
 col1, col2 = st.columns(2)
 
@@ -42,13 +54,14 @@ with col2:
 
 st.markdown("---")
 
+perf.section("Top Customers")
 # Top Customers
 st.markdown("## 🌟 Top Customers")
 
 # Number of customers to show
 n_customers = st.slider("Number of Customers to Display", 5, 20, 10)
 
-top_customers = an.get_top_customers(df, n=n_customers)
+top_customers = results['top_customers'].head(n_customers)
 
 col1, col2 = st.columns([2, 1])
 
@@ -73,6 +86,7 @@ st.dataframe(top_customers, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Segment Performance Comparison")
 # Segment Comparison
 st.markdown("## 📈 Segment Performance Comparison")
 
@@ -95,29 +109,35 @@ with col3:
 
 st.markdown("---")
 
+perf.section("Filter by Segment")
 # Segment Filter
 st.markdown("## 🔍 Filter by Segment")
 
 selected_segment = st.selectbox("Select Customer Segment", an.get_unique_segments(df))
 
 if selected_segment:
-    filtered_df = df[df['Segment'] == selected_segment]
+    segment_filter = {'Segment': selected_segment}
+    filtered = an.run_batch(df, {
+        'metrics': an.OVERVIEW_SPEC,
+        'top_customers': an.TOP_CUSTOMERS_SPEC
+    }, filters=segment_filter)
+    filtered_metrics = filtered['metrics']
     
     # Filtered metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Sales", f"${filtered_df['Sales'].sum():,.0f}")
+        st.metric("Total Sales", f"${filtered_metrics['total_sales']:,.0f}")
     with col2:
-        st.metric("Total Profit", f"${filtered_df['Profit'].sum():,.0f}")
+        st.metric("Total Profit", f"${filtered_metrics['total_profit']:,.0f}")
     with col3:
-        st.metric("Total Orders", f"{filtered_df['Order ID'].nunique():,}")
+        st.metric("Total Orders", f"{filtered_metrics['total_orders']:,}")
     with col4:
-        st.metric("Total Customers", f"{filtered_df['Customer ID'].nunique():,}")
+        st.metric("Total Customers", f"{filtered_metrics['total_customers']:,}")
     
     # Top customers in segment
     st.markdown(f"### Top 10 Customers in {selected_segment} Segment")
-    filtered_customers = an.get_top_customers(filtered_df, n=10)
+    filtered_customers = filtered['top_customers'].head(10)
     
     col1, col2 = st.columns(2)
     
@@ -126,4 +146,6 @@ if selected_segment:
         st.bar_chart(chart_data)
     
     with col2:
-        st.dataframe(filtered_customers, width='stretch', hide_index=True)
\ No newline at end of file
+        st.dataframe(filtered_customers, width='stretch', hide_index=True)
+
+perf.end()
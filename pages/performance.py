@@ -0,0 +1,86 @@
+"""
+Performance Page
+"""
+
+import streamlit as st
+import instrumentation
+
+st.set_page_config(page_title="Performance", page_icon="⏱️", layout="wide")
+
+# ==================== PERFORMANCE PAGE ====================
+
+st.title("⏱️ Performance")
+st.markdown(
+    "Timings of the analysis functions and page sections from recent reruns. "
+    "Instrumentation applies to every session of this server and costs nothing while it is off."
+)
+
+enabled = st.toggle("Record timings", value=instrumentation.is_enabled())
+if enabled != instrumentation.is_enabled():
+    instrumentation.set_enabled(enabled)
+
+recorded = instrumentation.records()
+summary = instrumentation.summary(recorded)
+
+st.markdown("---")
+
+if recorded.empty:
+    st.info("No timings recorded yet. Turn recording on and open the other pages.")
+    st.stop()
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    st.metric("Records", f"{len(recorded):,}", help=f"The newest {instrumentation.RING_SIZE:,} are kept")
+with col2:
+    function_calls = recorded[recorded['kind'] == 'function']
+    hit_rate = (function_calls['cache'] == 'hit').sum() / max(function_calls['cache'].notna().sum(), 1)
+    st.metric("Memo Hit Rate", f"{hit_rate:.0%}", help="Share of memoized calls answered without building anything")
+with col3:
+    st.metric("Page Runs", f"{(recorded['kind'] == 'page').sum():,}")
+
+st.markdown("---")
+
+# Page runs and their sections
+st.markdown("## 📄 Pages")
+
+pages = summary[summary['kind'].isin(['page', 'section'])]
+if len(pages) > 0:
+    st.markdown("### Slowest Sections (p95)")
+    sections = pages[pages['kind'] == 'section']
+    chart_data = sections.set_index('name')[['p50 ms', 'p95 ms']].head(15)
+    st.bar_chart(chart_data)
+    st.dataframe(pages.drop(columns=['rows scanned', 'result size', 'hit rate']), width='stretch', hide_index=True)
+else:
+    st.info("No page runs recorded yet.")
+
+st.markdown("---")
+
+# Analysis functions
+st.markdown("## 🧮 Analysis Functions")
+
+functions = summary[summary['kind'] == 'function']
+if len(functions) > 0:
+    st.markdown("### Slowest Functions (p95)")
+    chart_data = functions.set_index('name')[['p50 ms', 'p95 ms', 'p99 ms']].head(15)
+    st.bar_chart(chart_data)
+    st.dataframe(functions.drop(columns=['kind']), width='stretch', hide_index=True)
+else:
+    st.info("No analysis calls recorded yet.")
+
+st.markdown("---")
+
+# Recent records and export
+st.markdown("## 📋 Recent Calls")
+
+st.dataframe(recorded.iloc[::-1].head(200), width='stretch', hide_index=True)
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.download_button("Export JSON", instrumentation.export_json(recorded),
+                       file_name="superstore_timings.json", mime="application/json")
+with col2:
+    if st.button("Clear Records"):
+        instrumentation.clear()
+        st.rerun()
@@ -4,30 +4,43 @@ Product Analysis Page
 
 import streamlit as st
 import analysis as an
+import instrumentation
+from data_provider import get_dataset
 
 st.set_page_config(page_title="Product Analysis", page_icon="📦", layout="wide")
 
-# Load data
-@st.cache_data
-def load_data():
-    return an.load_data()
+# Time this run section by section (a no-op unless instrumentation is on)
+perf = instrumentation.page_timer("Product Analysis")
 
-df = load_data()
+perf.section("Load data")
+# Load shared data
+dataset = get_dataset()
 
-if df is None:
+if dataset is None:
     st.error("⚠️ Data file not found!")
     st.stop()
 
+df = dataset.df
+
 # ==================== PRODUCT ANALYSIS PAGE ====================
 
 st.title("📦 Product Analysis")
 
+perf.section("Batch")
+# Everything on this page, computed in one batch (ranked lists are sliced below)
+results = an.run_batch(df, {
+    'category_sales': an.SALES_BY_CATEGORY_SPEC,
+    'subcategory_sales': an.SALES_BY_SUBCATEGORY_SPEC,
+    'top_products': an.TOP_PRODUCTS_SPEC
+})
+
 st.markdown("---")
 
+perf.section("Category Performance")
 # Category Performance
 st.markdown("## 🏷️ Category Performance")
 
-category_sales = an.get_sales_by_category(df)
+category_sales = results['category_sales']
 
 col1, col2 = st.columns(2)
 
@@ -47,13 +60,14 @@ st.dataframe(category_sales, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Sub-Category Analysis")
 # Sub-Category Analysis
 st.markdown("## 📋 Sub-Category Analysis")
 
 # Number of sub-categories to show
 n_subcategories = st.slider("Number of Sub-Categories to Display", 5, 20, 10)
 
-subcategory_sales = an.get_sales_by_subcategory(df, n=n_subcategories)
+subcategory_sales = results['subcategory_sales'].head(n_subcategories)
 
 col1, col2 = st.columns(2)
 
@@ -68,13 +82,14 @@ with col2:
 
 st.markdown("---")
 
+perf.section("Top Products")
 # Top Products
 st.markdown("## 🌟 Top Products")
 
 # Number of products to show
 n_products = st.slider("Number of Products to Display", 5, 20, 10, key='products_slider')
 
-top_products = an.get_top_products(df, n=n_products)
+top_products = results['top_products'].head(n_products)
 
 col1, col2 = st.columns([2, 1])
 
@@ -99,29 +114,35 @@ st.dataframe(top_products, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Filter by Category")
 # Category Filter
 st.markdown("## 🔍 Filter by Category")
 
 selected_category = st.selectbox("Select Category", an.get_unique_categories(df))
 
 if selected_category:
-    filtered_df = df[df['Category'] == selected_category]
+    category_filter = {'Category': selected_category}
+    filtered = an.run_batch(df, {
+        'metrics': an.OVERVIEW_SPEC,
+        'subcategory_sales': an.SALES_BY_SUBCATEGORY_SPEC
+    }, filters=category_filter)
+    filtered_metrics = filtered['metrics']
     
     # Filtered metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Sales", f"${filtered_df['Sales'].sum():,.0f}")
+        st.metric("Total Sales", f"${filtered_metrics['total_sales']:,.0f}")
     with col2:
-        st.metric("Total Profit", f"${filtered_df['Profit'].sum():,.0f}")
+        st.metric("Total Profit", f"${filtered_metrics['total_profit']:,.0f}")
     with col3:
-        st.metric("Total Orders", f"{filtered_df['Order ID'].nunique():,}")
+        st.metric("Total Orders", f"{filtered_metrics['total_orders']:,}")
     with col4:
-        st.metric("Total Quantity", f"{int(filtered_df['Quantity'].sum()):,}")
+        st.metric("Total Quantity", f"{filtered_metrics['total_quantity']:,}")
     
     # Sub-categories in selected category
     st.markdown(f"### Sub-Categories in {selected_category}")
-    filtered_subcategory = an.get_sales_by_subcategory(filtered_df, n=20)
+    filtered_subcategory = filtered['subcategory_sales'].head(20)
     
     col1, col2 = st.columns(2)
     
@@ -130,4 +151,6 @@ if selected_category:
         st.bar_chart(chart_data)
     
     with col2:
-        st.dataframe(filtered_subcategory, width='stretch', hide_index=True)
\ No newline at end of file
+        st.dataframe(filtered_subcategory, width='stretch', hide_index=True)
+
+perf.end()
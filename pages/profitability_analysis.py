@@ -4,26 +4,40 @@ Profitability Analysis Page
 
 import streamlit as st
 import analysis as an
+import instrumentation
+from data_provider import get_dataset
 
 st.set_page_config(page_title="Profitability Analysis", page_icon="💰", layout="wide")
 
-# Load data
-@st.cache_data
-def load_data():
-    return an.load_data()
+# Time this run section by section (a no-op unless instrumentation is on)
+perf = instrumentation.page_timer("Profitability Analysis")
 
-df = load_data()
+perf.section("Load data")
+# Load shared data
+dataset = get_dataset()
 
-if df is None:
+if dataset is None:
     st.error("⚠️ Data file not found!")
     st.stop()
 
+df = dataset.df
+
 # ==================== PROFITABILITY ANALYSIS PAGE ====================
 
 st.title("💰 Profitability Analysis")
 
+perf.section("Batch")
+# Everything on this page, computed in one batch (ranked lists are sliced below)
+results = an.run_batch(df, {
+    'profit_by_category': an.PROFIT_BY_CATEGORY_SPEC,
+    'profitable_products': an.MOST_PROFITABLE_PRODUCTS_SPEC,
+    'loss_products': an.LOSS_MAKING_PRODUCTS_SPEC,
+    'ship_mode_profit': an.PROFIT_BY_SHIP_MODE_SPEC
+})
+
 st.markdown("---")
 
+perf.section("Overall Profitability")
 # Overall Profitability Metrics
 st.markdown("## 📊 Overall Profitability")
 
@@ -45,10 +59,11 @@ with col4:
 
 st.markdown("---")
 
+perf.section("Profitability by Category")
 # Profit by Category
 st.markdown("## 📦 Profitability by Category")
 
-profit_by_category = an.get_profit_by_category(df)
+profit_by_category = results['profit_by_category']
 
 col1, col2 = st.columns(2)
 
@@ -68,12 +83,13 @@ st.dataframe(profit_by_category, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Most Profitable Products")
 # Most Profitable Products
 st.markdown("## 🌟 Most Profitable Products")
 
 n_products = st.slider("Number of Products to Display", 5, 20, 10)
 
-profitable_products = an.get_most_profitable_products(df, n=n_products)
+profitable_products = results['profitable_products'].head(n_products)
 
 col1, col2 = st.columns([2, 1])
 
@@ -98,12 +114,13 @@ st.dataframe(profitable_products, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Loss-Making Products")
 # Loss-Making Products
 st.markdown("## ⚠️ Loss-Making Products")
 
 n_loss_products = st.slider("Number of Loss Products to Display", 5, 20, 10, key='loss_slider')
 
-loss_products = an.get_loss_making_products(df, n=n_loss_products)
+loss_products = results['loss_products'].head(n_loss_products)
 
 if len(loss_products) > 0:
     col1, col2 = st.columns([2, 1])
@@ -132,19 +149,11 @@ else:
 
 st.markdown("---")
 
+perf.section("Profitability by Shipping Mode")
 # Shipping Mode Analysis
 st.markdown("## 🚚 Profitability by Shipping Mode")
 
-ship_mode_sales = an.get_sales_by_ship_mode(df)
-
-# Calculate profit by shipping mode
-ship_mode_profit = df.groupby('Ship Mode').agg({
-    'Sales': 'sum',
-    'Profit': 'sum'
-}).reset_index()
-
-ship_mode_profit['Profit_Margin'] = (ship_mode_profit['Profit'] / ship_mode_profit['Sales'] * 100).fillna(0).round(2)
-ship_mode_profit = ship_mode_profit.sort_values('Profit', ascending=False)
+ship_mode_profit = results['ship_mode_profit']
 
 col1, col2 = st.columns(2)
 
@@ -155,4 +164,6 @@ with col1:
 
 with col2:
     st.markdown("### Shipping Mode Details")
-    st.dataframe(ship_mode_profit, width='stretch', hide_index=True)
\ No newline at end of file
+    st.dataframe(ship_mode_profit, width='stretch', hide_index=True)
+
+perf.end()
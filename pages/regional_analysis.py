@@ -4,30 +4,43 @@ Regional Analysis Page
 
 import streamlit as st
 import analysis as an
+import instrumentation
+from data_provider import get_dataset
 
 st.set_page_config(page_title="Regional Analysis", page_icon="📍", layout="wide")
 
-# Load data
-@st.cache_data
-def load_data():
-    return an.load_data()
+# Time this run section by section (a no-op unless instrumentation is on)
+perf = instrumentation.page_timer("Regional Analysis")
 
-df = load_data()
+perf.section("Load data")
+# Load shared data
+dataset = get_dataset()
 
-if df is None:
+if dataset is None:
     st.error("⚠️ Data file not found!")
     st.stop()
 
+df = dataset.df
+
 # ==================== REGIONAL ANALYSIS PAGE ====================
 
 st.title("📍 Regional Analysis")
 
+perf.section("Batch")
+# Everything on this page, computed in one batch (ranked lists are sliced below)
+results = an.run_batch(df, {
+    'region_sales': an.SALES_BY_REGION_SPEC,
+    'state_sales': an.SALES_BY_STATE_SPEC,
+    'city_sales': an.SALES_BY_CITY_SPEC
+})
+
 st.markdown("---")
 
+perf.section("Sales by Region")
 # Regional Performance
 st.markdown("## 🗺️ Sales by Region")
 
-region_sales = an.get_sales_by_region(df)
+region_sales = results['region_sales']
 
 col1, col2 = st.columns(2)
 
@@ -47,13 +60,14 @@ st.dataframe(region_sales, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Sales by State")
 # State Analysis
 st.markdown("## 🏛️ Sales by State")
 
 # Number of states to show
 n_states = st.slider("Number of States to Display", 5, 20, 10)
 
-state_sales = an.get_sales_by_state(df, n=n_states)
+state_sales = results['state_sales'].head(n_states)
 
 col1, col2 = st.columns([2, 1])
 
@@ -78,13 +92,14 @@ st.dataframe(state_sales, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Sales by City")
 # City Analysis
 st.markdown("## 🏙️ Sales by City")
 
 # Number of cities to show
 n_cities = st.slider("Number of Cities to Display", 5, 20, 10, key='cities_slider')
 
-city_sales = an.get_sales_by_city(df, n=n_cities)
+city_sales = results['city_sales'].head(n_cities)
 
 col1, col2 = st.columns(2)
 
@@ -99,25 +114,33 @@ with col2:
 
 st.markdown("---")
 
+perf.section("Filter by Region")
 # Region Filter
 st.markdown("## 🔍 Filter by Region")
 
 selected_region = st.selectbox("Select Region", an.get_unique_regions(df))
 
 if selected_region:
-    filtered_df = df[df['Region'] == selected_region]
+    region_filter = {'Region': selected_region}
+    filtered = an.run_batch(df, {
+        'metrics': an.OVERVIEW_SPEC,
+        'state_sales': an.SALES_BY_STATE_SPEC,
+        'city_sales': an.SALES_BY_CITY_SPEC,
+        'category_sales': an.SALES_BY_CATEGORY_SPEC
+    }, filters=region_filter)
+    filtered_metrics = filtered['metrics']
     
     # Filtered metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Sales", f"${filtered_df['Sales'].sum():,.0f}")
+        st.metric("Total Sales", f"${filtered_metrics['total_sales']:,.0f}")
     with col2:
-        st.metric("Total Profit", f"${filtered_df['Profit'].sum():,.0f}")
+        st.metric("Total Profit", f"${filtered_metrics['total_profit']:,.0f}")
     with col3:
-        st.metric("Total Orders", f"{filtered_df['Order ID'].nunique():,}")
+        st.metric("Total Orders", f"{filtered_metrics['total_orders']:,}")
     with col4:
-        st.metric("Total Customers", f"{filtered_df['Customer ID'].nunique():,}")
+        st.metric("Total Customers", f"{filtered_metrics['total_customers']:,}")
     
     st.markdown(f"### Performance in {selected_region} Region")
     
@@ -126,20 +149,20 @@ if selected_region:
     with col1:
         # Top states in region
         st.markdown("#### Top States")
-        region_states = an.get_sales_by_state(filtered_df, n=10)
+        region_states = filtered['state_sales'].head(10)
         chart_data = region_states.set_index('State')[['Sales']]
         st.bar_chart(chart_data)
     
     with col2:
         # Top cities in region
         st.markdown("#### Top Cities")
-        region_cities = an.get_sales_by_city(filtered_df, n=10)
+        region_cities = filtered['city_sales'].head(10)
         chart_data = region_cities.set_index('City')[['Sales']]
         st.bar_chart(chart_data)
     
     # Category performance in region
     st.markdown(f"#### Category Performance in {selected_region}")
-    region_category = an.get_sales_by_category(filtered_df)
+    region_category = filtered['category_sales']
     
     col1, col2 = st.columns(2)
     
@@ -148,4 +171,6 @@ if selected_region:
         st.bar_chart(chart_data)
     
     with col2:
-        st.dataframe(region_category, width='stretch', hide_index=True)
\ No newline at end of file
+        st.dataframe(region_category, width='stretch', hide_index=True)
+
+perf.end()
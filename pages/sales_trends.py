@@ -4,30 +4,43 @@ Sales Trends Page
 
 import streamlit as st
 import analysis as an
+import instrumentation
+from data_provider import get_dataset
 
 st.set_page_config(page_title="Sales Trends", page_icon="📈", layout="wide")
 
-# Load data
-@st.cache_data
-def load_data():
-    return an.load_data()
+# Time this run section by section (a no-op unless instrumentation is on)
+perf = instrumentation.page_timer("Sales Trends")
 
-df = load_data()
+perf.section("Load data")
+# Load shared data
+dataset = get_dataset()
 
-if df is None:
+if dataset is None:
     st.error("⚠️ Data file not found!")
     st.stop()
 
+df = dataset.df
+
 # ==================== SALES TRENDS PAGE ====================
 
 st.title("📈 Sales Trends Analysis")
 
+perf.section("Batch")
+# Everything on this page, computed in one batch
+results = an.run_batch(df, {
+    'monthly_sales': an.MONTHLY_SALES_SPEC,
+    'yearly_sales': an.YEARLY_SALES_SPEC,
+    'quarterly_sales': an.QUARTERLY_SALES_SPEC
+})
+
 st.markdown("---")
 
+perf.section("Monthly Sales Trend")
 # Monthly Sales Trend
 st.markdown("## 📅 Monthly Sales Trend")
 
-monthly_sales = an.get_monthly_sales(df)
+monthly_sales = results['monthly_sales']
 
 col1, col2 = st.columns([3, 1])
 
@@ -52,10 +65,11 @@ st.dataframe(monthly_sales, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Yearly Sales Trend")
 # Yearly Sales Trend
 st.markdown("## 📆 Yearly Sales Trend")
 
-yearly_sales = an.get_yearly_sales(df)
+yearly_sales = results['yearly_sales']
 
 col1, col2 = st.columns(2)
 
@@ -75,10 +89,11 @@ st.dataframe(yearly_sales, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Quarterly Sales Trend")
 # Quarterly Sales Trend
 st.markdown("## 📊 Quarterly Sales Trend")
 
-quarterly_sales = an.get_quarterly_sales(df)
+quarterly_sales = results['quarterly_sales']
 
 col1, col2 = st.columns([3, 1])
 
@@ -103,6 +118,7 @@ st.dataframe(quarterly_sales, width='stretch', hide_index=True)
 
 st.markdown("---")
 
+perf.section("Growth Analysis")
 # Growth Analysis
 st.markdown("## 📊 Growth Analysis")
 
@@ -131,6 +147,7 @@ else:
 
 st.markdown("---")
 
+perf.section("Custom Date Range Analysis")
 # Date Range Filter
 st.markdown("## 🔍 Custom Date Range Analysis")
 
@@ -145,27 +162,41 @@ with col2:
     end_date = st.date_input("End Date", value=max_date, min_value=min_date, max_value=max_date)
 
 if start_date and end_date:
-    # Filter data by date range
-    filtered_df = df[(df['Order Date'].dt.date >= start_date) & (df['Order Date'].dt.date <= end_date)]
+    # Totals come from the daily prefix sums, the monthly trend from the date index
+    filtered_metrics = an.get_period_metrics(df, start_date, end_date)
     
-    if len(filtered_df) > 0:
+    if filtered_metrics['total_orders'] > 0:
         # Display metrics for filtered period
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Sales", f"${filtered_df['Sales'].sum():,.0f}")
+            st.metric("Total Sales", f"${filtered_metrics['total_sales']:,.0f}")
         with col2:
-            st.metric("Total Profit", f"${filtered_df['Profit'].sum():,.0f}")
+            st.metric("Total Profit", f"${filtered_metrics['total_profit']:,.0f}")
         with col3:
-            st.metric("Total Orders", f"{filtered_df['Order ID'].nunique():,}")
+            st.metric("Total Orders", f"{filtered_metrics['total_orders']:,}")
         with col4:
-            profit_margin = (filtered_df['Profit'].sum() / filtered_df['Sales'].sum() * 100) if filtered_df['Sales'].sum() > 0 else 0
-            st.metric("Profit Margin", f"{profit_margin:.2f}%")
+            st.metric("Profit Margin", f"{filtered_metrics['profit_margin']:.2f}%")
         
         # Show monthly trend for filtered period
         st.markdown("### Monthly Trend (Filtered Period)")
-        filtered_monthly = an.get_monthly_sales(filtered_df)
+        date_filter = {'Order Date': an.DateRange(start_date, end_date)}
+        filtered_monthly = an.get_monthly_sales(df, filters=date_filter)
         chart_data = filtered_monthly.set_index('Month')[['Sales', 'Profit']]
         st.line_chart(chart_data)
     else:
-        st.warning("No data available for the selected date range")
\ No newline at end of file
+        st.warning("No data available for the selected date range")
+
+st.markdown("---")
+
+perf.section("Rolling Totals")
+# Rolling Totals
+st.markdown("## 📉 Rolling Totals")
+
+window = st.selectbox("Trailing window (days)", an.ROLLING_WINDOWS, index=1)
+
+rolling_totals = an.get_rolling_totals(df, window=window)
+chart_data = rolling_totals.set_index('Date')[['Sales', 'Profit']]
+st.line_chart(chart_data)
+
+perf.end()
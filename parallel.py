@@ -0,0 +1,235 @@
+"""
+Parallel Aggregation
+Runs batch aggregations over partitions of the groups in a process pool, with the columns in shared memory
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import batch
+
+
+# Worker processes for large aggregations (0 or 1 keeps everything in-process)
+WORKERS = int(os.environ.get('SUPERSTORE_WORKERS', '0'))
+
+# Below this many rows the pool's overhead outweighs the gain
+MIN_PARALLEL_ROWS = int(os.environ.get('SUPERSTORE_MIN_PARALLEL_ROWS', '200000'))
+
+# Partitions per worker, so an uneven partition does not hold up the others
+PARTITIONS_PER_WORKER = 2
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def set_workers(workers):
+    """
+    Choose how many worker processes large aggregations use
+
+    Parameters:
+        workers: Number of processes (0 or 1 to aggregate in-process)
+    """
+    global WORKERS
+    if workers < 0:
+        raise ValueError("workers must not be negative")
+    WORKERS = workers
+
+
+def _get_pool(workers):
+    """Get the process pool, starting it on first use or when the worker count changed"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            # forkserver children do not inherit the Streamlit threads' state
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown():
+    """Stop the worker processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+# ==================== SHARED COLUMNS ====================
+
+class SharedArrays:
+    """
+    Arrays copied once into shared memory blocks that workers map by name
+
+    Use as a context manager: the blocks are released on exit.
+
+    Attributes:
+        specs: Dictionary of name -> (block name, dtype string, shape), picklable
+    """
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.specs = {}
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+                self.specs[name] = (block.name, array.dtype.str, array.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the shared memory blocks"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _attach(specs):
+    """
+    Map shared arrays in a worker
+
+    Returns:
+        (dictionary of name -> read-only array, list of blocks to close afterwards)
+    """
+    arrays, blocks = {}, []
+    for name, (block_name, dtype, shape) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    return arrays, blocks
+
+
+# ==================== WORKERS ====================
+
+def _aggregate_partition(specs, by, measures, sizes, low, high):
+    """
+    Aggregate the rows whose group code lies in [low, high), in a worker
+
+    Parameters:
+        specs: SharedArrays.specs holding 'codes:<column>' for the key and
+            distinct columns, '<column>' for summed columns and optionally 'rows'
+        by: Group key column
+        measures: List of (column, how) pairs
+        sizes: Number of unique values of each coded column
+        low, high: Group code range of the partition
+
+    Returns:
+        DataFrame like batch.aggregate_key(), indexed by group code
+    """
+    arrays, blocks = _attach(specs)
+    try:
+        codes = arrays[f'codes:{by}']
+        rows = arrays.get('rows')
+        if rows is None:
+            rows = np.flatnonzero((codes >= low) & (codes < high))
+        else:
+            selected = codes[rows]
+            rows = rows[(selected >= low) & (selected < high)]
+
+        frame = pd.DataFrame({name: array for name, array in arrays.items() if ':' not in name and name != 'rows'},
+                             copy=False)
+
+        def factorize(df, column):
+            return arrays[f'codes:{column}'], pd.RangeIndex(sizes[column])
+
+        return batch.aggregate_key(frame, by, measures, rows, factorize)
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+# ==================== EXECUTION ====================
+
+def _partition_bounds(sizes, partitions):
+    """Split group codes into contiguous ranges holding about the same number of rows"""
+    cumulative = np.cumsum(sizes)
+    targets = cumulative[-1] * np.arange(1, partitions) / partitions
+    cuts = np.searchsorted(cumulative, targets, side='right')
+    bounds = np.unique(np.concatenate([[0], cuts, [len(sizes)]]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def aggregate_key(df, by, measures, rows=None, factorize=batch.factorize, workers=None):
+    """
+    Compute batch.aggregate_key() over a process pool
+
+    The groups are split into code ranges of about equal row counts,
+    and each worker aggregates all rows of its groups. Each group's
+    float sums therefore see the same rows in the same order as the
+    in-process path, so the result is identical, not just close.
+    Grand totals and small inputs stay in-process.
+
+    Parameters:
+        df: Sales DataFrame
+        by: Column to group by, or None for grand totals
+        measures: List of (column, how) pairs
+        rows: Ascending row positions to include (None for all rows)
+        factorize: Function (df, column) -> (codes, uniques)
+        workers: Number of processes (defaults to WORKERS)
+
+    Returns:
+        DataFrame indexed by the observed group values, one column per (column, how)
+    """
+    workers = WORKERS if workers is None else workers
+    n_rows = len(df) if rows is None else len(rows)
+    if by is None or workers <= 1 or n_rows < MIN_PARALLEL_ROWS:
+        return batch.aggregate_key(df, by, measures, rows, factorize)
+
+    codes, uniques = factorize(df, by)
+    selected = codes if rows is None else codes[rows]
+    group_sizes = np.bincount(selected[selected >= 0], minlength=len(uniques))
+    if group_sizes.sum() == 0:
+        return batch.aggregate_key(df, by, measures, rows, factorize)
+
+    arrays = {f'codes:{by}': codes}
+    sizes = {by: len(uniques)}
+    for column, how in measures:
+        if how == 'sum':
+            arrays[column] = df[column].to_numpy()
+        elif how == 'nunique':
+            arrays[f'codes:{column}'], value_uniques = factorize(df, column)
+            sizes[column] = len(value_uniques)
+    if rows is not None:
+        arrays['rows'] = rows
+
+    pool = _get_pool(workers)
+    with SharedArrays(arrays) as shared:
+        futures = [
+            pool.submit(_aggregate_partition, shared.specs, by, measures, sizes, low, high)
+            for low, high in _partition_bounds(group_sizes, workers * PARTITIONS_PER_WORKER)
+        ]
+        parts = [future.result() for future in futures]
+
+    # Partitions cover ascending code ranges, so the concatenation is in code order
+    result = pd.concat(parts)
+    result.index = uniques.take(result.index.to_numpy())
+    return result
@@ -0,0 +1,312 @@
+"""
+Partitioned Dataset Store
+Parquet files laid out by year=/month= (and optionally Region=), with per-partition
+min/max statistics so filtered loads only read the partitions that can match
+
+Convert a CSV with:
+    python partition_store.py data/superstore.csv data/superstore_store [--by-region]
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import data_cache as dc
+import loader
+from dimension_index import DateRange
+
+
+MANIFEST = '_manifest.json'
+STORE_VERSION = 'store-1'
+
+# Hive's name for the partition of missing keys
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Rows within a partition are sorted by date, so row groups prune date ranges inside a month
+ROW_GROUP_SIZE = 64 * 1024
+
+# Columns whose min/max are kept per partition
+STATS_COLUMNS = ['Order Date', 'Region']
+
+
+# ==================== WRITING ====================
+
+def _partition_dir(year, month, region=None):
+    """Get the relative directory of a partition"""
+    parts = [f'year={NULL_PARTITION if year is None else year}',
+             f'month={NULL_PARTITION if month is None else f"{month:02d}"}']
+    if region is not None:
+        parts.append(f'Region={region}')
+    return os.path.join(*parts)
+
+
+def _stat(value):
+    """Make a min/max value JSON-friendly"""
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _min_max(values):
+    """Get the JSON-friendly min and max of a column's values (categoricals by value)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        values = pd.Series(values.cat.categories.take(np.unique(codes[codes >= 0])))
+    return _stat(values.min()), _stat(values.max())
+
+
+def write_store(df, root, by_region=False):
+    """
+    Write a sales frame as a partitioned store
+
+    The store is built next to root and swapped in, so readers never
+    see half of it.
+
+    Parameters:
+        df: Sales DataFrame from load_data()
+        root: Store directory
+        by_region: Also partition each month by Region
+
+    Returns:
+        Manifest dictionary
+    """
+    dates = df['Order Date']
+    keys = [dates.dt.year.rename('year'), dates.dt.month.rename('month')]
+    if by_region:
+        keys.append(df['Region'].rename('region'))
+
+    tmp_root = f'{root}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_root, ignore_errors=True)
+    partitions = []
+    for values, part in df.groupby(keys, observed=True, dropna=False, sort=True):
+        year, month = (None if pd.isna(v) else int(v) for v in values[:2])
+        region = values[2] if by_region else None
+        if by_region and pd.isna(region):
+            region = NULL_PARTITION
+
+        part = part.sort_values('Order Date', kind='stable')
+        stats = {column: _min_max(part[column]) for column in STATS_COLUMNS if column in part.columns}
+        relative = _partition_dir(year, month, region)
+        os.makedirs(os.path.join(tmp_root, relative))
+        path = os.path.join(relative, 'part-0.parquet')
+        part.to_parquet(os.path.join(tmp_root, path), index=False, row_group_size=ROW_GROUP_SIZE)
+
+        partitions.append({
+            'path': path,
+            'year': year,
+            'month': month,
+            'region': region,
+            'rows': len(part),
+            'min': {column: low for column, (low, high) in stats.items()},
+            'max': {column: high for column, (low, high) in stats.items()}
+        })
+
+    source = df.attrs.get('source', {})
+    manifest = {
+        'store_version': STORE_VERSION,
+        'source': source.get('path'),
+        'version': source.get('version'),
+        'partition_by': ['year', 'month'] + (['Region'] if by_region else []),
+        'partitions': partitions
+    }
+    with open(os.path.join(tmp_root, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+
+    old_root = f'{root}.old-{os.getpid()}'
+    if os.path.exists(root):
+        os.replace(root, old_root)
+    os.replace(tmp_root, root)
+    shutil.rmtree(old_root, ignore_errors=True)
+    return manifest
+
+
+def convert(csv_path, root, by_region=False, schema=None):
+    """
+    Parse a sales CSV and write it as a partitioned store
+
+    Parameters:
+        csv_path: Path of the CSV file
+        root: Store directory
+        by_region: Also partition each month by Region
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+
+    Returns:
+        Manifest dictionary, or None if the CSV does not exist
+    """
+    df = loader.load_sales_data(csv_path, schema=schema)
+    if df is None:
+        return None
+    return write_store(df, root, by_region)
+
+
+# ==================== PRUNING ====================
+
+def is_store(path):
+    """Check whether a path is a partitioned store"""
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def read_manifest(root):
+    """Read the manifest of a store"""
+    with open(os.path.join(root, MANIFEST), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _values(value):
+    """Wrap a single filter value in a list"""
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _may_match(partition, column, value):
+    """Check whether a partition can hold rows matching one filter"""
+    low, high = partition['min'].get(column), partition['max'].get(column)
+
+    if column == 'Order Date' and isinstance(value, DateRange):
+        if low is None:
+            return False
+        start, stop = value.bounds()
+        return pd.Timestamp(high).value >= start and pd.Timestamp(low).value < stop
+    if column == 'Order Year':
+        return partition['year'] is None or partition['year'] in _values(value)
+    if column == 'Order Month':
+        if partition['year'] is None:
+            return True
+        return partition['year'] * 12 + partition['month'] - 1 in _values(value)
+    if low is not None and not isinstance(value, DateRange):
+        return any(low <= v <= high for v in _values(value) if isinstance(v, type(low)))
+    return True
+
+
+def prune(manifest, filters=None):
+    """
+    Get the partitions that can hold rows matching the filters
+
+    Order Date ranges and Region values are checked against each
+    partition's min/max, Order Year and Order Month against its keys.
+
+    Parameters:
+        manifest: Store manifest
+        filters: Dictionary of column -> value, list of values or DateRange
+
+    Returns:
+        List of partition entries
+    """
+    return [
+        partition for partition in manifest['partitions']
+        if all(_may_match(partition, column, value) for column, value in (filters or {}).items())
+    ]
+
+
+def last_days(root, days=90):
+    """
+    Get the DateRange of the last `days` days of data in a store
+
+    Parameters:
+        root: Store directory
+        days: Number of days, the last day with data included
+
+    Returns:
+        DateRange, or None for an empty store
+    """
+    ends = [p['max'].get('Order Date') for p in read_manifest(root)['partitions']]
+    ends = [end for end in ends if end is not None]
+    if not ends:
+        return None
+    last = pd.Timestamp(max(ends)).normalize()
+    return DateRange(last - pd.Timedelta(days=days - 1), last)
+
+
+# ==================== READING ====================
+
+def _row_filters(filters):
+    """Translate filters into Parquet row filters, so row groups are skipped too"""
+    row_filters = []
+    for column, value in (filters or {}).items():
+        if isinstance(value, DateRange):
+            start, stop = value.bounds()
+            if value.start is not None:
+                row_filters.append((column, '>=', pd.Timestamp(start)))
+            if value.end is not None:
+                row_filters.append((column, '<', pd.Timestamp(stop)))
+        else:
+            row_filters.append((column, 'in', _values(value)))
+    return row_filters
+
+
+def _concat(parts):
+    """Concatenate partition frames, taking the sorted union of categories"""
+    if len(parts) == 1:
+        return parts[0]
+    columns = {}
+    for column in parts[0].columns:
+        if isinstance(parts[0][column].dtype, pd.CategoricalDtype):
+            columns[column] = pd.Series(union_categoricals([part[column] for part in parts], sort_categories=True))
+        else:
+            columns[column] = pd.concat([part[column] for part in parts], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_store(root, filters=None, columns=None):
+    """
+    Load the rows of a store matching the filters
+
+    Only partitions whose statistics can match are opened, and within
+    them Parquet row filters skip row groups and rows, so a date range
+    reads about as many rows as it covers. Rows come back in
+    partition order, sorted by Order Date within each partition.
+
+    Parameters:
+        root: Store directory
+        filters: Dictionary of column -> value, list of values or DateRange
+        columns: Columns to read (None for all)
+
+    Returns:
+        DataFrame with df.attrs['source'] describing the store and the partitions read
+    """
+    manifest = read_manifest(root)
+    partitions = prune(manifest, filters)
+    row_filters = _row_filters(filters) or None
+
+    parts = [
+        pd.read_parquet(os.path.join(root, partition['path']), columns=columns, filters=row_filters)
+        for partition in partitions
+    ]
+    if not parts and manifest['partitions']:
+        # Nothing can match: read one partition's schema for an empty frame of the right dtypes
+        parts = [pd.read_parquet(os.path.join(root, manifest['partitions'][0]['path']), columns=columns).iloc[:0]]
+    df = _concat(parts) if parts else pd.DataFrame()
+
+    paths = [partition['path'] for partition in partitions]
+    key = f"{STORE_VERSION}:{paths}:{sorted((filters or {}).items(), key=lambda item: item[0])}"
+    df.attrs['source'] = {
+        'path': root,
+        'partitions': paths,
+        'version': dc.data_version({'hash': manifest['version']}, key)
+    }
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a sales CSV into a partitioned Parquet store")
+    parser.add_argument('csv', nargs='?', default=loader.DATA_PATH, help="Source CSV")
+    parser.add_argument('root', nargs='?', default='data/superstore_store', help="Store directory")
+    parser.add_argument('--by-region', action='store_true', help="Also partition each month by Region")
+    args = parser.parse_args()
+
+    manifest = convert(args.csv, args.root, args.by_region)
+    if manifest is None:
+        print(f"❌ ERROR: {args.csv} not found!")
+        raise SystemExit(1)
+    rows = sum(partition['rows'] for partition in manifest['partitions'])
+    print(f"✅ Wrote {rows:,} rows in {len(manifest['partitions'])} partitions to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Precompute Page Results
+Computes every result the pages render and saves it as a snapshot they serve from on a cold start
+
+Run after each deploy or in CI with:
+    python precompute.py [data/superstore.csv] [--output PATH]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import analysis as an
+import data_cache as dc
+import loader
+from dataset import load_dataset
+
+
+# Bump when the contents or layout of snapshots change
+SNAPSHOT_VERSION = 'snapshot-2'
+
+
+# ==================== BUILDING ====================
+
+def build_snapshot(dataset):
+    """
+    Compute the page results of a Dataset
+
+    Parameters:
+        dataset: Dataset with no snapshot attached
+
+    Returns:
+        Snapshot dictionary
+    """
+    return {
+        'snapshot_version': SNAPSHOT_VERSION,
+        'version': dataset.version,
+        'top_n_max': an.TOP_N_MAX,
+        'distinct_mode': an.DISTINCT_MODE,
+        'rows': len(dataset),
+        'created': time.time(),
+        'results': an.precompute_results(dataset.df)
+    }
+
+
+def write_snapshot(snapshot, path):
+    """
+    Save a snapshot, replacing any previous one in a single step
+
+    Parameters:
+        snapshot: Snapshot from build_snapshot()
+        path: Snapshot file
+    """
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# ==================== SERVING ====================
+
+def read_snapshot(path, version):
+    """
+    Load the results of a snapshot if it was built from the given data version
+
+    The snapshot must also match this process's TOP_N_MAX and
+    DISTINCT_MODE, which shape the ranked results and distinct counts.
+
+    The file is a pickle, so it must come from this tool, like the code.
+
+    Parameters:
+        path: Snapshot file
+        version: Dataset version the results must belong to
+
+    Returns:
+        Dictionary of result key -> result, or None if the snapshot is
+        missing, unreadable or stale
+    """
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict):
+        return None
+    current = (snapshot.get('snapshot_version') == SNAPSHOT_VERSION
+               and snapshot.get('version') == version
+               and snapshot.get('top_n_max') == an.TOP_N_MAX
+               and snapshot.get('distinct_mode') == an.DISTINCT_MODE)
+    return snapshot['results'] if current else None
+
+
+def attach_snapshot(dataset, path=loader.DATA_PATH):
+    """
+    Serve a freshly loaded Dataset's page results from its CSV's snapshot
+
+    Must be called before the Dataset answers any analysis call.
+    Datasets of appended rows have a new version, so they never match
+    an older snapshot. Results are served only while DISTINCT_MODE
+    stays the mode the snapshot was computed in.
+
+    Parameters:
+        dataset: Dataset loaded from path
+        path: Path of the CSV file
+
+    Returns:
+        True if a current snapshot was attached
+    """
+    results = read_snapshot(dc.snapshot_path(path), dataset.version)
+    if results is None:
+        return False
+    # Keyed by mode, so results stop being served if the mode is switched later
+    return dataset.derived(('snapshot', an.DISTINCT_MODE), lambda: results) is results
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the results every page renders")
+    parser.add_argument('csv', nargs='?', default=loader.DATA_PATH, help="Source CSV")
+    parser.add_argument('--output', help="Snapshot file (defaults to <csv>.snapshot.pkl, where the pages look)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = load_dataset(args.csv)
+    if dataset is None:
+        print(f"❌ ERROR: {args.csv} not found!")
+        sys.exit(1)
+    loaded = time.perf_counter()
+
+    snapshot = build_snapshot(dataset)
+    output = args.output or dc.snapshot_path(args.csv)
+    write_snapshot(snapshot, output)
+    done = time.perf_counter()
+
+    print(f"✅ Loaded {len(dataset):,} rows in {loaded - start:.1f}s")
+    print(f"✅ Computed {len(snapshot['results'])} results in {done - loaded:.1f}s")
+    print(f"✅ Snapshot for version {dataset.version} written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Sales Data Schema
+Declared column types and date formats used when parsing the CSV
+"""
+
+import copy
+import json
+
+
+# Columns not listed here are left for pandas to infer
+SUPERSTORE_SCHEMA = {
+    'dtypes': {
+        'Row ID': 'int32',
+        'Order ID': 'category',
+        'Ship Mode': 'category',
+        'Customer ID': 'category',
+        'Customer Name': 'category',
+        'Segment': 'category',
+        'Country': 'category',
+        'City': 'category',
+        'State': 'category',
+        'Postal Code': 'category',
+        'Region': 'category',
+        'Product ID': 'category',
+        'Category': 'category',
+        'Sub-Category': 'category',
+        'Product Name': 'category',
+        'Sales': 'float64',
+        'Quantity': 'int32',
+        'Discount': 'float32',
+        'Profit': 'float64'
+    },
+    'dates': {
+        'Order Date': '%m/%d/%Y',
+        'Ship Date': '%m/%d/%Y'
+    }
+}
+
+
+def make_schema(dtypes=None, dates=None, base=None):
+    """
+    Build a schema by overriding entries of a base schema
+
+    Use this for store exports whose columns or date formats differ.
+    A dtype or date format of None removes the column from the schema.
+
+    Parameters:
+        dtypes: Dictionary of column -> dtype overrides
+        dates: Dictionary of column -> strftime format overrides
+        base: Schema to start from (defaults to SUPERSTORE_SCHEMA)
+
+    Returns:
+        Schema dictionary
+    """
+    schema = copy.deepcopy(base if base is not None else SUPERSTORE_SCHEMA)
+    for section, overrides in (('dtypes', dtypes), ('dates', dates)):
+        for column, value in (overrides or {}).items():
+            if value is None:
+                schema[section].pop(column, None)
+            else:
+                schema[section][column] = value
+    return schema
+
+
+def load_schema(path):
+    """
+    Load schema overrides from a JSON file with 'dtypes' and 'dates' keys
+
+    Parameters:
+        path: Path of the JSON file
+
+    Returns:
+        Schema dictionary
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        overrides = json.load(f)
+    return make_schema(overrides.get('dtypes'), overrides.get('dates'))
+
+
+def schema_key(schema):
+    """Get a stable string identifying a schema (used in cache keys)"""
+    return json.dumps(schema, sort_keys=True)
@@ -0,0 +1,250 @@
+"""
+SQLite Store
+Ingests the sales data into a local SQLite database with covering indexes, which the sqlite engine queries on disk
+
+Build it ahead of a deploy with:
+    python sqlite_store.py [data/superstore.csv] [--output PATH]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from urllib.request import pathname2url
+
+import pandas as pd
+
+import data_cache as dc
+import loader
+from dataset import load_dataset
+
+
+# Bump when the table layout or indexes change
+STORE_VERSION = 'sqlite-1'
+
+TABLE = 'sales'
+INSERT_CHUNK_ROWS = 100_000
+
+# Dates are stored as text in this format, which sorts like the dates
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Columns the aggregates read, appended to every index so a filtered
+# aggregate is answered from the index alone, without reading the table
+COVERED_COLUMNS = ['Sales', 'Profit', 'Quantity', 'Order ID', 'Customer ID']
+
+# Index name -> leading key columns
+INDEXES = {
+    'idx_order_date': ['Order Date', 'Order Year', 'Order Quarter', 'Order Month'],
+    'idx_region_state': ['Region', 'State'],
+    'idx_category_subcategory': ['Category', 'Sub-Category'],
+    'idx_segment': ['Segment']
+}
+
+
+def quote(column):
+    """Quote a column name as an SQL identifier"""
+    return '"' + column.replace('"', '""') + '"'
+
+
+def date_text(timestamp):
+    """Format a Timestamp like the stored dates, to compare with them"""
+    return pd.Timestamp(timestamp).strftime(DATE_FORMAT)
+
+
+# ==================== INGESTION ====================
+
+def _sql_type(dtype):
+    """Get the SQLite column type for a pandas dtype"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'TEXT'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _sql_values(values):
+    """Convert a column to a list of Python values SQLite can bind (None for missing)"""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        text = values.dt.strftime(DATE_FORMAT)
+        return text.astype(object).where(values.notna(), None).tolist()
+    if isinstance(values.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(values.dtype):
+        return values.astype(object).where(values.notna(), None).tolist()
+    # NaN floats are stored as NULL by SQLite
+    return values.tolist()
+
+
+def write_store(df, path, version=None):
+    """
+    Write a frame to a new SQLite database, replacing any previous one in a single step
+
+    Every column is stored, the time keys included, then the INDEXES are
+    built and their statistics gathered for the query planner.
+
+    Parameters:
+        df: Sales DataFrame with its time key columns
+        path: Database file
+        version: Data version the store is tagged with (see read_version)
+    """
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        con = sqlite3.connect(tmp_path)
+        try:
+            # The file only becomes the store once it is complete, so skip the journal
+            con.execute('PRAGMA journal_mode = OFF')
+            con.execute('PRAGMA synchronous = OFF')
+            columns = ', '.join(f'{quote(column)} {_sql_type(dtype)}' for column, dtype in df.dtypes.items())
+            con.execute(f'CREATE TABLE {TABLE} ({columns})')
+            _insert_rows(con, df)
+
+            for name, keys in INDEXES.items():
+                if all(column in df.columns for column in keys + COVERED_COLUMNS):
+                    index_columns = ', '.join(quote(column) for column in keys + COVERED_COLUMNS)
+                    con.execute(f'CREATE INDEX {name} ON {TABLE} ({index_columns})')
+            con.execute('ANALYZE')
+
+            con.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+            con.executemany('INSERT INTO meta VALUES (?, ?)',
+                            [('store_version', STORE_VERSION), ('version', version), ('rows', str(len(df)))])
+            con.commit()
+        finally:
+            con.close()
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _insert_rows(con, df):
+    """Insert a frame's rows into the sales table, INSERT_CHUNK_ROWS at a time"""
+    insert = f'INSERT INTO {TABLE} VALUES ({", ".join("?" * len(df.columns))})'
+    for start in range(0, len(df), INSERT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + INSERT_CHUNK_ROWS]
+        con.executemany(insert, zip(*(_sql_values(chunk[column]) for column in df.columns)))
+
+
+def append_store(df, start, path, version=None, previous=None):
+    """
+    Add the rows of a grown frame past start to an existing store
+
+    The rows go in one transaction, so readers see the store before or
+    after the append, never in between. The indexes are updated by the
+    inserts and keep their statistics.
+
+    Parameters:
+        df: Grown Sales DataFrame with its time key columns, whose first start rows are in the store
+        start: Number of rows already in the store
+        path: Database file
+        version: Data version to tag the store with
+        previous: Data version the store must be tagged with now
+
+    Returns:
+        True if the rows were added, False if the store does not hold
+        exactly the first start rows of previous (write it again instead)
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        con = sqlite3.connect(path)
+        try:
+            meta = dict(con.execute('SELECT key, value FROM meta').fetchall())
+            columns = [row[1] for row in con.execute(f'PRAGMA table_info({TABLE})')]
+            if (meta.get('store_version') != STORE_VERSION or meta.get('version') != previous
+                    or meta.get('rows') != str(start) or columns != list(df.columns)):
+                return False
+            with con:
+                _insert_rows(con, df.iloc[start:])
+                con.executemany('UPDATE meta SET value = ? WHERE key = ?',
+                                [(version, 'version'), (str(len(df)), 'rows')])
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+# ==================== READING ====================
+
+def connect(path):
+    """
+    Open a store read-only
+
+    Parameters:
+        path: Database file
+
+    Returns:
+        sqlite3 Connection
+    """
+    return sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?mode=ro', uri=True)
+
+
+def read_version(path):
+    """
+    Get the data version a store was written for
+
+    Returns:
+        Version string, or None if the store is missing, unreadable or
+        from another STORE_VERSION
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        con = connect(path)
+        try:
+            meta = dict(con.execute('SELECT key, value FROM meta').fetchall())
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return None
+    return meta.get('version') if meta.get('store_version') == STORE_VERSION else None
+
+
+def open_store(df, version, path):
+    """
+    Get a store holding df, writing it unless the one at path is already current
+
+    Parameters:
+        df: Sales DataFrame of a shared Dataset, with its time key columns
+        version: The Dataset's version
+        path: Database file
+
+    Returns:
+        Path of the store
+    """
+    if read_version(path) != version:
+        write_store(df, path, version)
+    return path
+
+
+# ==================== COMMAND LINE ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest the sales CSV into an indexed SQLite database")
+    parser.add_argument('csv', nargs='?', default=loader.DATA_PATH, help="Source CSV")
+    parser.add_argument('--output', help="Database file (defaults to <csv>.sqlite, where the sqlite engine looks)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = load_dataset(args.csv)
+    if dataset is None:
+        print(f"❌ ERROR: {args.csv} not found!")
+        sys.exit(1)
+    loaded = time.perf_counter()
+
+    output = args.output or dc.sqlite_path(args.csv)
+    if read_version(output) == dataset.version:
+        print(f"✅ {output} is already current (version {dataset.version})")
+        return
+    write_store(dataset.df, output, dataset.version)
+    done = time.perf_counter()
+
+    print(f"✅ Loaded {len(dataset):,} rows in {loaded - start:.1f}s")
+    print(f"✅ Wrote {output} ({os.path.getsize(output) / 2 ** 20:,.1f} MiB) in {done - loaded:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
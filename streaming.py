@@ -0,0 +1,352 @@
+"""
+Streaming Aggregation
+Folds a sales CSV chunk by chunk into mergeable partial aggregates, for data larger than memory
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import batch
+import loader
+from schema import SUPERSTORE_SCHEMA
+from sketches import DEFAULT_PRECISION, estimate, hash_values, register_ranks
+
+
+# Memory a streaming run may use for its parsed chunk and partial aggregates
+MEMORY_BUDGET = int(os.environ.get('SUPERSTORE_MEMORY_BUDGET_MB', '256')) * 2 ** 20
+
+# Peak working memory per byte of parsed chunk (read buffers, codes, temporaries)
+CHUNK_OVERHEAD = 4
+
+MIN_CHUNK_ROWS = 1_000
+SAMPLE_ROWS = 1_000
+
+# Row count kept with every partial, so the observed groups are known even when every measure is a distinct count
+ROWS = (None, 'count')
+
+
+# ==================== PARTIAL AGGREGATES ====================
+
+def _add_sums(left, right):
+    """Add two (group index, measure -> array) pairs of additive measures over the union of their groups"""
+    if left is None:
+        return right
+    (left_index, left_columns), (right_index, right_columns) = left, right
+    index = left_index if left_index.equals(right_index) else left_index.union(right_index)
+    left_positions = index.get_indexer(left_index)
+    right_positions = index.get_indexer(right_index)
+
+    columns = {}
+    for measure, left_values in left_columns.items():
+        right_values = right_columns[measure]
+        values = np.zeros(len(index), dtype=np.result_type(left_values, right_values))
+        values[left_positions] += left_values
+        values[right_positions] += right_values
+        columns[measure] = values
+    return index, columns
+
+
+class PartialAggregate:
+    """
+    Mergeable partial result of the measures of one group key
+
+    Sums and counts are kept per group value and add up across chunks.
+    A nunique measure keeps either the distinct (group, value) pairs
+    seen so far ('exact') or one HyperLogLog sketch per group
+    ('approx', fixed size per group, see sketches.py). Partials built
+    over any split of the rows merge into the same result, up to float
+    rounding in the last bits of float sums.
+
+    Attributes:
+        by: Column to group by, or None for grand totals
+        measures: List of (column, how) pairs
+        distinct: 'exact' or 'approx'
+        precision: HyperLogLog precision for 'approx'
+    """
+
+    def __init__(self, by, measures, distinct='exact', precision=DEFAULT_PRECISION):
+        self.by = by
+        self.measures = list(measures)
+        self.distinct = distinct
+        self.precision = precision
+        self.sums = None
+        self.pairs = {}
+        self.sketches = {}
+
+    @property
+    def _additive(self):
+        return [measure for measure in self.measures if measure[1] != 'nunique'] + [ROWS]
+
+    def add(self, df, rows=None, factorize=batch.factorize):
+        """
+        Fold rows of a chunk into the partial
+
+        Parameters:
+            df: Chunk of the sales data
+            rows: Ascending row positions to include (None for all rows)
+            factorize: Function (df, column) -> (codes, uniques)
+
+        Returns:
+            self
+        """
+        table = batch.aggregate_key(df, self.by, self._additive, rows, factorize)
+        sums = {measure: table[measure].to_numpy() for measure in self._additive}
+        self.sums = _add_sums(self.sums, (table.index, sums))
+
+        for column, how in self.measures:
+            if how != 'nunique':
+                continue
+            groups, values = self._pairs(df, column, rows, factorize)
+            if self.distinct == 'approx':
+                self._add_sketch((column, how), groups, values)
+            else:
+                self._add_pairs((column, how), groups, values)
+        return self
+
+    def _pairs(self, df, column, rows, factorize):
+        """Get the distinct (group, value) pairs of a chunk"""
+        if self.by is None:
+            codes, uniques = np.zeros(len(df), dtype=np.int64), pd.Index([None])
+        else:
+            codes, uniques = factorize(df, self.by)
+        value_codes, value_uniques = factorize(df, column)
+        if rows is not None:
+            codes, value_codes = codes[rows], value_codes[rows]
+
+        present = (codes >= 0) & (value_codes >= 0)
+        pairs = np.unique(codes[present] * len(value_uniques) + value_codes[present])
+        groups, values = np.divmod(pairs, len(value_uniques))
+        return uniques.take(groups), value_uniques.take(values)
+
+    def _add_pairs(self, measure, groups, values):
+        """Add distinct pairs, dropping duplicates once the unmerged pairs outgrow the merged ones"""
+        parts = self.pairs.setdefault(measure, [])
+        parts.append(pd.DataFrame({'group': groups, 'value': values}))
+        merged = len(parts[0]) if len(parts) > 1 else 0
+        if sum(len(part) for part in parts[1:]) > merged:
+            self.pairs[measure] = [pd.concat(parts, ignore_index=True).drop_duplicates(ignore_index=True)]
+
+    def _add_sketch(self, measure, groups, values):
+        """Add values to the sketches of their groups"""
+        group_index = pd.Index(groups).unique()
+        if measure in self.sketches:
+            index, registers = self.sketches[measure]
+            if not group_index.isin(index).all():
+                grown = index.append(group_index[~group_index.isin(index)])
+                registers = np.concatenate([registers, np.zeros((len(grown) - len(index), registers.shape[1]), dtype=np.uint8)])
+                index = grown
+        else:
+            index, registers = group_index, np.zeros((len(group_index), 2 ** self.precision), dtype=np.uint8)
+
+        register, rank = register_ranks(hash_values(np.asarray(values)), self.precision)
+        np.maximum.at(registers, (index.get_indexer(groups), register), rank)
+        self.sketches[measure] = (index, registers)
+
+    def merge(self, other):
+        """
+        Merge another partial of the same key and measures into this one
+
+        Parameters:
+            other: PartialAggregate over other rows
+
+        Returns:
+            self
+        """
+        if other.sums is not None:
+            self.sums = _add_sums(self.sums, other.sums)
+        for measure, parts in other.pairs.items():
+            for part in parts:
+                self._add_pairs(measure, part['group'], part['value'])
+        for measure, (index, registers) in other.sketches.items():
+            if measure not in self.sketches:
+                self.sketches[measure] = (index, registers.copy())
+                continue
+            own_index, own_registers = self.sketches[measure]
+            union = own_index.append(index[~index.isin(own_index)])
+            merged = np.zeros((len(union), own_registers.shape[1]), dtype=np.uint8)
+            merged[:len(own_index)] = own_registers
+            positions = union.get_indexer(index)
+            merged[positions] = np.maximum(merged[positions], registers)
+            self.sketches[measure] = (union, merged)
+        return self
+
+    def memory_usage(self):
+        """Get the approximate number of bytes held by the partial"""
+        size = 0
+        if self.sums is not None:
+            index, columns = self.sums
+            size += index.memory_usage(deep=True) + sum(values.nbytes for values in columns.values())
+        for parts in self.pairs.values():
+            size += sum(int(part.memory_usage(deep=True).sum()) for part in parts)
+        for index, registers in self.sketches.values():
+            size += index.memory_usage(deep=True) + registers.nbytes
+        return size
+
+    def result(self):
+        """
+        Get the merged result
+
+        Returns:
+            DataFrame like batch.aggregate_key(): indexed by the sorted
+            observed group values, one column per (column, how)
+        """
+        if self.sums is None:
+            index = pd.Index([None]) if self.by is None else pd.Index([])
+            sums = {measure: np.zeros(len(index), dtype=np.int64) for measure in self._additive}
+        else:
+            index, sums = self.sums
+            if self.by is not None:
+                order = index.argsort()
+                index, sums = index[order], {measure: values[order] for measure, values in sums.items()}
+        index = index.rename(self.by)
+
+        columns = {}
+        for measure in self.measures:
+            if measure[1] != 'nunique':
+                columns[measure] = sums[measure]
+            elif self.distinct == 'approx':
+                columns[measure] = self._sketch_counts(measure, index)
+            else:
+                columns[measure] = self._pair_counts(measure, index)
+        return pd.DataFrame(columns, index=index)
+
+    def _pair_counts(self, measure, index):
+        """Count the distinct values of each group from the kept pairs"""
+        parts = self.pairs.get(measure, [])
+        if not parts:
+            return np.zeros(len(index), dtype=np.int64)
+        pairs = pd.concat(parts, ignore_index=True).drop_duplicates()
+        if self.by is None:
+            return np.array([len(pairs)], dtype=np.int64)
+        counts = pairs.groupby('group', sort=False).size()
+        return counts.reindex(index, fill_value=0).to_numpy().astype(np.int64)
+
+    def _sketch_counts(self, measure, index):
+        """Estimate the distinct values of each group from its sketch"""
+        if measure not in self.sketches:
+            return np.zeros(len(index), dtype=np.int64)
+        groups, registers = self.sketches[measure]
+        positions = groups.get_indexer(index)
+        counts = np.zeros(len(index), dtype=np.int64)
+        found = positions >= 0
+        counts[found] = np.round(estimate(registers[positions[found]])).astype(np.int64)
+        return counts
+
+
+# ==================== CHUNK SIZING ====================
+
+def needed_columns(specs, filter_columns=()):
+    """
+    Get the CSV columns a set of specs and filters read
+
+    Parameters:
+        specs: Dictionary of name -> spec
+        filter_columns: Columns the filters test
+
+    Returns:
+        List of column names (time keys are computed from Order Date)
+    """
+    columns = list(filter_columns)
+    for spec in specs.values():
+        columns.append(spec.get('by'))
+        columns.extend(column for column, how in spec['measures'].values())
+    columns = ['Order Date' if column in loader.TIME_BUCKET_COLUMNS else column for column in columns]
+    return list(dict.fromkeys(column for column in columns if column is not None))
+
+
+def row_bytes(path, columns=None, schema=None, encoding=None, encoding_errors='strict'):
+    """
+    Estimate the in-memory size of one parsed row from the first rows of the file
+
+    Parameters:
+        path: Path of the CSV file
+        columns: Columns to read (None for all)
+        schema: Schema dictionary (defaults to SUPERSTORE_SCHEMA)
+        encoding: Text encoding (detected when None)
+        encoding_errors: How undecodable bytes are handled
+
+    Returns:
+        Bytes per row
+    """
+    chunks = loader.read_sales_chunks(path, SAMPLE_ROWS, schema, columns, encoding, encoding_errors)
+    sample = next(chunks, None)
+    chunks.close()
+    if sample is None or len(sample) == 0:
+        return 1
+    return max(1, int(sample.memory_usage(deep=True).sum() / len(sample)))
+
+
+# ==================== STREAMING EXECUTION ====================
+
+def stream_aggregates(path, keys, rows=None, filter_columns=(), memory_budget=None, distinct='exact', schema=None):
+    """
+    Aggregate a CSV chunk by chunk into one PartialAggregate per group key
+
+    Each chunk is sized so that it, its working memory and the partials
+    built so far fit in the memory budget, so memory follows the budget
+    and the number of groups, not the number of rows. With exact
+    distinct counts the partials also grow with the distinct
+    (group, value) pairs; 'approx' caps that at one sketch per group.
+
+    Parameters:
+        path: Path of the CSV file
+        keys: Dictionary of group key -> list of (column, how) pairs, e.g. from batch.plan()
+        rows: Function chunk -> ascending row positions to include, or None (None for all rows)
+        filter_columns: Columns the rows function reads
+        memory_budget: Bytes to stay within (defaults to MEMORY_BUDGET)
+        distinct: 'exact' or 'approx' distinct counts
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+
+    Returns:
+        Dictionary of group key -> PartialAggregate
+    """
+    schema = schema if schema is not None else SUPERSTORE_SCHEMA
+    memory_budget = memory_budget if memory_budget is not None else MEMORY_BUDGET
+    columns = needed_columns({by: {'by': by, 'measures': dict(enumerate(measures))} for by, measures in keys.items()},
+                             filter_columns)
+
+    def fold(encoding, encoding_errors):
+        partials = {by: PartialAggregate(by, measures, distinct) for by, measures in keys.items()}
+        per_row = row_bytes(path, columns, schema, encoding, encoding_errors) * CHUNK_OVERHEAD
+
+        def chunk_rows():
+            held = sum(partial.memory_usage() for partial in partials.values())
+            return max(MIN_CHUNK_ROWS, (memory_budget - held) // per_row)
+
+        for chunk in loader.read_sales_chunks(path, chunk_rows, schema, columns, encoding, encoding_errors):
+            selected = rows(chunk) if rows is not None else None
+            for partial in partials.values():
+                partial.add(chunk, selected)
+        return partials
+
+    try:
+        return fold(loader.detect_encoding(path), 'strict')
+    except UnicodeDecodeError:
+        # A byte outside the sampled windows did not fit - refold once, tolerantly
+        return fold('cp1252', 'replace')
+
+
+def stream_batch(path, specs, rows=None, filter_columns=(), memory_budget=None, distinct='exact', schema=None):
+    """
+    Compute aggregation specs over a CSV without loading it
+
+    Takes the same specs as batch.run_batch() and returns the same
+    results. Ranked specs are ranked once every chunk is merged, since
+    a group's total is only known at the end.
+
+    Parameters:
+        path: Path of the CSV file
+        specs: Dictionary of name -> spec
+        rows: Function chunk -> ascending row positions to include, or None (None for all rows)
+        filter_columns: Columns the rows function reads
+        memory_budget: Bytes to stay within (defaults to MEMORY_BUDGET)
+        distinct: 'exact' or 'approx' distinct counts
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+
+    Returns:
+        Dictionary of name -> result
+    """
+    partials = stream_aggregates(path, batch.plan(specs), rows, filter_columns, memory_budget, distinct, schema)
+    return batch.run_batch(None, specs, aggregate=lambda by, measures: partials[by].result())
@@ -0,0 +1,434 @@
+"""
+Synthetic Sales Data
+Generates Superstore-like data at any scale from distributions learned from the real CSV
+
+Generate a file with:
+    python synthetic.py 10000000 data/superstore_10m.csv [--seed 0]
+    python synthetic.py 10000000 data/superstore_10m.parquet
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import loader
+
+
+# Orders generated per chunk (about 1M rows); fixed so a seed always gives the same file
+CHUNK_ORDERS = 500_000
+
+# Column order of the Superstore export
+COLUMNS = [
+    'Row ID', 'Order ID', 'Order Date', 'Ship Date', 'Ship Mode', 'Customer ID', 'Customer Name',
+    'Segment', 'Country', 'City', 'State', 'Postal Code', 'Region', 'Product ID', 'Category',
+    'Sub-Category', 'Product Name', 'Sales', 'Quantity', 'Discount', 'Profit'
+]
+
+LOCATION_COLUMNS = ['City', 'State', 'Postal Code', 'Region']
+PRODUCT_COLUMNS = ['Product ID', 'Category', 'Sub-Category', 'Product Name']
+
+# Synthetic customer numbers start above the real 5-digit ones, so IDs never collide
+FIRST_CUSTOMER_NUMBER = 100000
+FIRST_ORDER_NUMBER = 100000
+
+
+# ==================== PROFILE ====================
+
+def _weights(keys):
+    """Get the distinct rows of a frame and how often each occurs, in first-seen order"""
+    counts = keys.value_counts(sort=False, dropna=False)
+    return counts.index.to_frame(index=False), counts.to_numpy(np.float64)
+
+
+def fit_profile(df):
+    """
+    Learn the distributions the generator samples from
+
+    Orders keep the real mix of customers, locations, ship modes,
+    delivery times, dates (year and month, so growth and seasonality
+    carry over) and lines per order. Lines keep the real product mix:
+    products are drawn by popularity, and each line copies the quantity,
+    discount and profit margin of a real line of the same sub-category,
+    so discounts still drive losses where they do in the real data.
+
+    Parameters:
+        df: Sales DataFrame from loader.load_sales_data()
+
+    Returns:
+        Profile dictionary
+    """
+    orders = df.drop_duplicates('Order ID')
+
+    customers = df.drop_duplicates('Customer ID')[['Customer ID', 'Customer Name', 'Segment']]
+    order_counts = df.groupby('Customer ID', observed=True)['Order ID'].nunique()
+    names = customers['Customer Name'].astype(str).str.split(' ', n=1, expand=True)
+
+    segments = customers['Segment'].astype(str).value_counts(sort=False)
+    locations, location_weights = _weights(orders[LOCATION_COLUMNS].astype(str))
+    ship, ship_weights = _weights(pd.DataFrame({
+        'mode': orders['Ship Mode'].astype(str),
+        'days': (orders['Ship Date'] - orders['Order Date']).dt.days
+    }))
+    months, month_weights = _weights(pd.DataFrame({
+        'year': orders['Order Date'].dt.year,
+        'month': orders['Order Date'].dt.month
+    }))
+    starts = pd.to_datetime(months.assign(day=1))
+    months['start'] = starts.to_numpy().astype('datetime64[D]').astype(np.int64)
+    months['days'] = starts.dt.days_in_month.to_numpy()
+    prefixes = orders['Order ID'].astype(str).str.split('-').str[0].value_counts(sort=False)
+
+    lines = df[PRODUCT_COLUMNS].astype(str)
+    discount = df['Discount'].to_numpy(np.float64).round(2)
+    # List price of one unit before discount
+    lines['price'] = df['Sales'].to_numpy() / (df['Quantity'].to_numpy() * (1 - discount))
+    products = lines.groupby(PRODUCT_COLUMNS, sort=False).agg(lines=('price', 'size'), price=('price', 'median'))
+    products = products.reset_index()
+
+    # Real lines sorted by sub-category, to copy quantity, discount and margin from
+    templates = pd.DataFrame({
+        'sub_category': lines['Sub-Category'],
+        'quantity': df['Quantity'].to_numpy(np.int32),
+        'discount': discount,
+        'margin': df['Profit'].to_numpy() / df['Sales'].to_numpy()
+    }).sort_values('sub_category', kind='stable')
+    sub_categories, template_starts, template_counts = np.unique(
+        templates['sub_category'].to_numpy(), return_index=True, return_counts=True)
+
+    return {
+        'country': str(df['Country'].mode().iloc[0]),
+        'customers': customers.astype(str).reset_index(drop=True),
+        'customer_orders': order_counts.reindex(customers['Customer ID']).to_numpy(np.int64),
+        'rows_per_customer': len(df) / len(customers),
+        'first_names': np.unique(names[0].to_numpy(str)),
+        'last_names': np.unique(names[1].dropna().to_numpy(str)),
+        'segments': (segments.index.to_numpy(str), segments.to_numpy(np.float64)),
+        'lines_per_order': df.groupby('Order ID', observed=True).size().to_numpy(np.int64),
+        'locations': (locations, location_weights),
+        'ship': (ship, ship_weights),
+        'months': (months, month_weights),
+        'prefixes': (prefixes.index.to_numpy(str), prefixes.to_numpy(np.float64)),
+        'products': products,
+        'product_templates': np.searchsorted(sub_categories, products['Sub-Category'].to_numpy(str)),
+        'templates': templates.reset_index(drop=True),
+        'template_starts': template_starts,
+        'template_counts': template_counts
+    }
+
+
+def load_profile(source=loader.DATA_PATH):
+    """
+    Learn a generator profile from a sales CSV
+
+    Parameters:
+        source: Path of the real CSV
+
+    Returns:
+        Profile dictionary, or None if the CSV does not exist
+    """
+    df = loader.load_sales_data(source)
+    if df is None:
+        return None
+    return fit_profile(df)
+
+
+# ==================== SAMPLING ====================
+
+def _choice(rng, weights, size):
+    """Draw indices in proportion to weights"""
+    cumulative = np.cumsum(weights)
+    return np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side='right')
+
+
+def customer_pool(profile, rows, seed=0):
+    """
+    Build the customers a data set of `rows` rows is drawn from
+
+    The pool grows with the rows so orders per customer stay realistic.
+    Its first customers are the real ones; the others get names mixed
+    from real first and last names, a middle initial, a segment drawn
+    from the real mix, and an activity (expected orders) drawn from the
+    real orders-per-customer distribution.
+
+    Parameters:
+        profile: Profile from fit_profile()
+        rows: Number of rows to generate
+        seed: Random seed
+
+    Returns:
+        Dictionary of per-customer arrays
+    """
+    rng = np.random.default_rng([seed, 0])
+    real = len(profile['customers'])
+    size = max(1, int(round(rows / profile['rows_per_customer'])))
+    extra = max(0, size - real)
+
+    activity = np.concatenate([
+        profile['customer_orders'][:size],
+        rng.choice(profile['customer_orders'], extra)
+    ])
+    segment_names, segment_weights = profile['segments']
+    return {
+        'size': size,
+        'real': min(size, real),
+        'cumulative': np.cumsum(activity),
+        'segment': _choice(rng, segment_weights, extra),
+        'first': rng.integers(len(profile['first_names']), size=extra),
+        'middle': rng.integers(26, size=extra),
+        'last': rng.integers(len(profile['last_names']), size=extra)
+    }
+
+
+def _customer_columns(profile, pool, customers):
+    """
+    Get Customer ID, Customer Name and Segment of a set of customers
+
+    Parameters:
+        profile: Profile from fit_profile()
+        pool: Pool from customer_pool()
+        customers: Distinct customer indices
+
+    Returns:
+        (ids, names, segments) as pyarrow string arrays
+    """
+    real = customers[customers < pool['real']]
+    table = profile['customers']
+    ids = list(table['Customer ID'].to_numpy()[real])
+    names = list(table['Customer Name'].to_numpy()[real])
+    segments = list(table['Segment'].to_numpy()[real])
+
+    synthetic = customers[customers >= pool['real']] - pool['real']
+    if len(synthetic):
+        first = pa.array(profile['first_names'][pool['first'][synthetic]])
+        last = pa.array(profile['last_names'][pool['last'][synthetic]])
+        middle = pa.array(np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))[pool['middle'][synthetic]])
+        initials = pc.binary_join_element_wise(pc.utf8_slice_codeunits(first, 0, 1),
+                                               pc.utf8_slice_codeunits(last, 0, 1), '')
+        numbers = pa.array(synthetic + pool['real'] + FIRST_CUSTOMER_NUMBER).cast(pa.string())
+        ids += pc.binary_join_element_wise(initials, numbers, '-').to_pylist()
+        names += pc.binary_join_element_wise(first, pc.binary_join_element_wise(middle, '.', ''), last,
+                                             ' ').to_pylist()
+        segments += list(profile['segments'][0][pool['segment'][synthetic]])
+    return pa.array(ids, pa.string()), pa.array(names, pa.string()), pa.array(segments, pa.string())
+
+
+def _take(values, indices):
+    """Take strings by position as a pyarrow array"""
+    return pc.take(pa.array(values, pa.string()), pa.array(indices))
+
+
+def _day_labels(first_day, last_day):
+    """Get m/d/yyyy labels for a range of days since 1970-01-01, as in the Superstore export"""
+    dates = pd.to_datetime(np.arange(first_day, last_day + 1).astype('datetime64[D]'))
+    labels = dates.month.astype(str) + '/' + dates.day.astype(str) + '/' + dates.year.astype(str)
+    return pa.array(labels.to_numpy(str))
+
+
+def _chunk(profile, pool, rng, first_order, first_row, orders, max_rows, dates_as_text):
+    """
+    Generate the rows of a run of orders
+
+    Parameters:
+        profile: Profile from fit_profile()
+        pool: Pool from customer_pool()
+        rng: Random generator of the chunk
+        first_order: Number of orders before the chunk
+        first_row: Number of rows before the chunk
+        orders: Orders to generate
+        max_rows: Rows left to generate; the chunk is cut at this many
+        dates_as_text: Write dates as m/d/yyyy strings instead of timestamps
+
+    Returns:
+        (pyarrow Table with the Superstore columns, number of orders in it)
+    """
+    # ----- Orders -----
+    lines = rng.choice(profile['lines_per_order'], orders)
+    ends = np.cumsum(lines)
+    if ends[-1] > max_rows:
+        orders = int(np.searchsorted(ends, max_rows, side='left')) + 1
+        lines = lines[:orders]
+        lines[-1] -= ends[orders - 1] - max_rows
+
+    customer = np.searchsorted(pool['cumulative'], rng.random(orders) * pool['cumulative'][-1], side='right')
+
+    months, month_weights = profile['months']
+    month = _choice(rng, month_weights, orders)
+    years = months['year'].to_numpy()[month]
+    order_day = (months['start'].to_numpy()[month]
+                 + (rng.random(orders) * months['days'].to_numpy()[month]).astype(np.int64))
+
+    ship, ship_weights = profile['ship']
+    shipping = _choice(rng, ship_weights, orders)
+    ship_day = order_day + ship['days'].to_numpy()[shipping]
+
+    locations, location_weights = profile['locations']
+    location = _choice(rng, location_weights, orders)
+    prefix_names, prefix_weights = profile['prefixes']
+    prefix = _choice(rng, prefix_weights, orders)
+
+    order_number = np.arange(first_order, first_order + orders) + FIRST_ORDER_NUMBER
+    order_ids = pc.binary_join_element_wise(
+        _take(prefix_names, prefix), pa.array(years).cast(pa.string()), pa.array(order_number).cast(pa.string()), '-')
+
+    # ----- Lines -----
+    rows = int(lines.sum())
+    order_of_row = np.repeat(np.arange(orders), lines)
+
+    products = profile['products']
+    product = _choice(rng, products['lines'].to_numpy(), rows)
+    sub_category = profile['product_templates'][product]
+    template = (profile['template_starts'][sub_category]
+                + (rng.random(rows) * profile['template_counts'][sub_category]).astype(np.int64))
+    templates = profile['templates']
+    quantity = templates['quantity'].to_numpy()[template]
+    discount = templates['discount'].to_numpy()[template]
+    sales = (products['price'].to_numpy()[product] * quantity * (1 - discount)).round(4)
+    profit = (sales * templates['margin'].to_numpy()[template]).round(4)
+
+    distinct_customers, customer_of_order = np.unique(customer, return_inverse=True)
+    customer_ids, customer_names, segments = _customer_columns(profile, pool, distinct_customers)
+    customer_of_row = pa.array(customer_of_order[order_of_row])
+    location_of_row = location[order_of_row]
+
+    if dates_as_text:
+        first_day = int(min(order_day.min(), ship_day.min()))
+        labels = _day_labels(first_day, int(max(order_day.max(), ship_day.max())))
+        order_dates = pc.take(labels, pa.array(order_day[order_of_row] - first_day))
+        ship_dates = pc.take(labels, pa.array(ship_day[order_of_row] - first_day))
+    else:
+        order_dates = pa.array(order_day[order_of_row].astype('datetime64[D]').astype('datetime64[us]'))
+        ship_dates = pa.array(ship_day[order_of_row].astype('datetime64[D]').astype('datetime64[us]'))
+
+    columns = {
+        'Row ID': pa.array(np.arange(first_row + 1, first_row + rows + 1, dtype=np.int64)),
+        'Order ID': pc.take(order_ids, pa.array(order_of_row)),
+        'Order Date': order_dates,
+        'Ship Date': ship_dates,
+        'Ship Mode': _take(ship['mode'].to_numpy(str), shipping[order_of_row]),
+        'Customer ID': pc.take(customer_ids, customer_of_row),
+        'Customer Name': pc.take(customer_names, customer_of_row),
+        'Segment': pc.take(segments, customer_of_row),
+        'Country': _take([profile['country']], np.zeros(rows, np.int64))
+    }
+    for column in LOCATION_COLUMNS:
+        columns[column] = _take(locations[column].to_numpy(str), location_of_row)
+    for column in PRODUCT_COLUMNS:
+        columns[column] = _take(products[column].to_numpy(str), product)
+    columns.update({
+        'Sales': pa.array(sales),
+        'Quantity': pa.array(quantity.astype(np.int64)),
+        'Discount': pa.array(discount),
+        'Profit': pa.array(profit)
+    })
+    return pa.table({column: columns[column] for column in COLUMNS}), orders
+
+
+def generate_chunks(profile, rows, seed=0, dates_as_text=True):
+    """
+    Generate synthetic sales rows in chunks
+
+    Each chunk draws from its own random stream derived from the seed,
+    so the same profile, rows and seed always give the same data.
+
+    Parameters:
+        profile: Profile from fit_profile()
+        rows: Number of rows
+        seed: Random seed
+        dates_as_text: Give dates as m/d/yyyy strings (for CSV) instead of timestamps
+
+    Yields:
+        pyarrow Tables of about CHUNK_ORDERS orders, in Row ID order
+    """
+    pool = customer_pool(profile, rows, seed)
+    done_rows, done_orders, chunk = 0, 0, 0
+    while done_rows < rows:
+        rng = np.random.default_rng([seed, chunk + 1])
+        table, orders = _chunk(profile, pool, rng, done_orders, done_rows, CHUNK_ORDERS, rows - done_rows,
+                               dates_as_text)
+        done_rows += table.num_rows
+        done_orders += orders
+        chunk += 1
+        yield table
+
+
+# ==================== WRITING ====================
+
+def generate(rows, path, seed=0, source=loader.DATA_PATH, profile=None):
+    """
+    Write a synthetic sales file of `rows` rows
+
+    Files ending in .parquet are written as Parquet with typed dates,
+    anything else as a CSV in the Superstore export's layout. The file
+    is written next to path and moved into place when complete.
+
+    Parameters:
+        rows: Number of rows
+        path: Output file
+        seed: Random seed
+        source: Real CSV to learn the distributions from
+        profile: Profile from fit_profile() (learned from source when None)
+
+    Returns:
+        Path of the file, or None if the source CSV does not exist
+    """
+    if rows <= 0:
+        raise ValueError("rows must be positive")
+    profile = profile if profile is not None else load_profile(source)
+    if profile is None:
+        return None
+
+    parquet = path.endswith('.parquet')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+
+    writer = None
+    try:
+        for table in generate_chunks(profile, rows, seed, dates_as_text=not parquet):
+            if writer is None:
+                writer = (pq.ParquetWriter(tmp_path, table.schema) if parquet
+                          else pa_csv.CSVWriter(tmp_path, table.schema,
+                                                write_options=pa_csv.WriteOptions(quoting_style='needed')))
+            writer.write_table(table)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if writer is not None:
+        writer.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Superstore sales file")
+    parser.add_argument('rows', type=int, help="Number of rows")
+    parser.add_argument('output', help="Output file (.csv, or .parquet for Parquet)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--source', default=loader.DATA_PATH, help="Real CSV to learn the distributions from")
+    args = parser.parse_args()
+
+    if args.rows <= 0:
+        parser.error("rows must be positive")
+
+    start = time.perf_counter()
+    path = generate(args.rows, args.output, args.seed, args.source)
+    if path is None:
+        print(f"❌ ERROR: {args.source} not found!")
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Wrote {args.rows:,} rows to {path} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
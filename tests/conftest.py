@@ -0,0 +1,98 @@
+"""
+Shared fixtures for the cache and engine tests
+
+The sample CSV is copied to a temporary folder, so the caches, stores
+and snapshots the tests build never touch data/.
+"""
+
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analysis as an  # noqa: E402
+import engine  # noqa: E402
+from dataset import load_dataset  # noqa: E402
+
+
+SOURCE_CSV = os.path.join(ROOT, 'data', 'superstore.csv')
+
+# Every page metric, as run_batch() computes them
+SPECS = {name: value for name, value in vars(an).items() if name.endswith('_SPEC')}
+
+# Filters the results are compared under: none, cube dimensions, and date ranges
+FILTER_SETS = [
+    None,
+    {'Category': 'Technology'},
+    {'Region': ['West', 'East']},
+    {'Order Date': an.DateRange(pd.Timestamp(2017, 1, 1), None)},
+    {'Segment': 'Consumer', 'Order Date': an.DateRange(None, pd.Timestamp(2016, 6, 30))}
+]
+
+# Rows of the CSV the append tests start from
+FIRST_ROWS = 8000
+
+
+def assert_results_equal(expected, actual, rtol=1e-9):
+    """Check that two run_batch() results match, row labels included"""
+    assert list(expected) == list(actual)
+    for name in expected:
+        if isinstance(expected[name], pd.DataFrame):
+            pd.testing.assert_frame_equal(expected[name], actual[name], check_exact=False, rtol=rtol, obj=name)
+        else:
+            assert expected[name] == pytest.approx(actual[name], rel=rtol), name
+
+
+def write_rows(source, path, rows=None, append=False):
+    """Write the header and the first rows of a CSV (all of them for None), or append the rest"""
+    with open(source, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    header, body = lines[0], lines[1:]
+    if append:
+        data = b''.join(body[rows:])
+    else:
+        data = header + b''.join(body if rows is None else body[:rows])
+    with open(path, 'ab' if append else 'wb') as f:
+        f.write(data)
+
+
+@pytest.fixture(autouse=True)
+def defaults(monkeypatch):
+    """Run every test with exact distinct counts on the pandas engine"""
+    monkeypatch.setattr(an, 'DISTINCT_MODE', 'exact')
+    monkeypatch.setattr(engine, 'ENGINE', 'pandas')
+
+
+@pytest.fixture(scope='session')
+def csv_path(tmp_path_factory):
+    """The sample CSV, in a folder of its own"""
+    path = str(tmp_path_factory.mktemp('data') / 'superstore.csv')
+    shutil.copy(SOURCE_CSV, path)
+    return path
+
+
+@pytest.fixture
+def dataset(csv_path):
+    """A freshly loaded shared Dataset, with nothing derived yet"""
+    return load_dataset(csv_path)
+
+
+@pytest.fixture
+def plain_frame(csv_path):
+    """The loaded rows as a frame no Dataset owns"""
+    df = an.load_data(csv_path).copy()
+    df.attrs = {}
+    return df
+
+
+def engine_names():
+    """Every engine, those not installed marked as skipped"""
+    return [
+        pytest.param(name, marks=pytest.mark.skipif(not engine.is_available(name), reason=f"{name} is not installed"))
+        for name in engine.ENGINES
+    ]
@@ -0,0 +1,59 @@
+"""
+Tests that the cached layers (cube, sketches, entity tables, ranked
+prefixes, engine tables and stores) give the same results as the plain
+pandas path, and still do after rows are appended to the CSV
+"""
+
+import pandas as pd
+import pytest
+
+import analysis as an
+import batch
+import engine
+from conftest import FILTER_SETS, FIRST_ROWS, SOURCE_CSV, SPECS, assert_results_equal, engine_names, write_rows
+from dataset import load_dataset, refresh_dataset
+
+
+def uncached(df, filters):
+    """run_batch() on a frame no Dataset owns, without engines or caches"""
+    return batch.run_batch(df, SPECS, an._filter_selection(df, filters))
+
+
+def test_dataset_results_match_uncached(dataset, plain_frame):
+    for filters in FILTER_SETS:
+        assert_results_equal(uncached(plain_frame, filters), an.run_batch(dataset.df, SPECS, filters))
+
+
+def test_approx_distinct_counts_are_close(dataset, monkeypatch):
+    exact = an.run_batch(dataset.df, {'region': an.SALES_BY_REGION_SPEC})['region']
+    monkeypatch.setattr(an, 'DISTINCT_MODE', 'approx')
+    approx = an.run_batch(dataset.df, {'region': an.SALES_BY_REGION_SPEC})['region']
+
+    pd.testing.assert_series_equal(exact['Sales'], approx['Sales'])
+    for column in ['Orders', 'Customers']:
+        # HyperLogLog's standard error is about 1.6%
+        assert (abs(approx[column] - exact[column]) <= 0.05 * exact[column]).all()
+
+
+@pytest.mark.parametrize('name', engine_names())
+def test_appended_rows_match_a_fresh_load(name, tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, 'ENGINE', name)
+    path = str(tmp_path / 'superstore.csv')
+    write_rows(SOURCE_CSV, path, FIRST_ROWS)
+    dataset = load_dataset(path)
+    assert len(dataset) == FIRST_ROWS
+
+    # Fill every cache the append has to carry over
+    for filters in FILTER_SETS:
+        an.run_batch(dataset.df, SPECS, filters)
+        an.get_top_products(dataset.df, filters=filters)
+
+    write_rows(SOURCE_CSV, path, FIRST_ROWS, append=True)
+    grown = refresh_dataset(dataset, path)
+    assert grown is not dataset
+
+    plain = an.load_data(SOURCE_CSV, use_cache=False)
+    assert len(grown) == len(plain)
+    for filters in FILTER_SETS:
+        assert_results_equal(uncached(plain, filters), an.run_batch(grown.df, SPECS, filters),
+                             rtol=engine.PARITY_RTOL)
@@ -0,0 +1,52 @@
+"""
+Tests that every engine returns what the pandas path returns, top-N
+row labels included, and converts each frame only once
+"""
+
+import pandas as pd
+import pytest
+
+import analysis as an
+import engine
+from conftest import FILTER_SETS, SPECS, engine_names
+
+
+@pytest.mark.parametrize('name', engine_names()[1:])
+def test_engine_matches_pandas(name, plain_frame):
+    assert engine.check_parity(plain_frame, SPECS, FILTER_SETS, [name]) == []
+
+
+@pytest.mark.parametrize('name', engine_names()[1:])
+def test_engine_matches_pandas_per_spec(name, plain_frame):
+    # Alone, every ranked spec has its top-N cut pushed into the engine
+    for spec_name, spec in SPECS.items():
+        assert engine.check_parity(plain_frame, {spec_name: spec}, [None, {'Region': 'West'}], [name]) == []
+
+
+@pytest.mark.parametrize('name', engine_names()[1:])
+def test_top_n_rows_are_labelled_like_pandas(name, plain_frame, monkeypatch):
+    expected = an.get_sales_by_state(plain_frame, 5, {'Category': 'Furniture'})
+    monkeypatch.setattr(engine, 'ENGINE', name)
+    actual = an.get_sales_by_state(plain_frame, 5, {'Category': 'Furniture'})
+    pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=engine.PARITY_RTOL)
+
+
+@pytest.mark.parametrize('name', engine_names())
+def test_dataset_results_match_pandas(name, dataset, monkeypatch):
+    expected = {str(filters): an.run_batch(dataset.df, SPECS, filters) for filters in FILTER_SETS}
+    monkeypatch.setattr(engine, 'ENGINE', name)
+    for filters in FILTER_SETS:
+        actual = an.run_batch(dataset.df, SPECS, filters)
+        for spec_name, result in expected[str(filters)].items():
+            if isinstance(result, pd.DataFrame):
+                pd.testing.assert_frame_equal(result, actual[spec_name], check_exact=False,
+                                              rtol=engine.PARITY_RTOL, atol=engine.PARITY_ATOL)
+            else:
+                assert result == pytest.approx(actual[spec_name], abs=engine.PARITY_ATOL)
+
+
+@pytest.mark.parametrize('name', engine_names()[1:])
+def test_table_is_built_once_per_frame(name, plain_frame):
+    backend = engine.get_engine(name)
+    assert backend.table(plain_frame) is backend.table(plain_frame)
+    assert backend.table(plain_frame.copy()) is not backend.table(plain_frame)
@@ -0,0 +1,88 @@
+"""
+Tests for precomputed snapshots: served only for the data version,
+TOP_N_MAX and distinct-count mode they were built with
+"""
+
+import pandas as pd
+import pytest
+
+import analysis as an
+import precompute as pc
+from conftest import SPECS, assert_results_equal
+from dataset import load_dataset
+
+
+# Snapshot result replaced by a marker, to tell served results from computed ones
+MARKED_KEY = ('batch', 'SALES_BY_REGION_SPEC', ())
+MARKER = pd.DataFrame({'Region': ['from the snapshot']})
+
+
+@pytest.fixture(scope='module')
+def snapshot(csv_path):
+    """A snapshot built in exact mode, with one result marked"""
+    snapshot = pc.build_snapshot(load_dataset(csv_path))
+    snapshot['results'][MARKED_KEY] = MARKER
+    return snapshot
+
+
+@pytest.fixture
+def snapshot_file(snapshot, tmp_path):
+    path = str(tmp_path / 'superstore.snapshot.pkl')
+    pc.write_snapshot(snapshot, path)
+    return path
+
+
+def region_sales(dataset):
+    return an.run_batch(dataset.df, {'region': an.SALES_BY_REGION_SPEC})['region']
+
+
+def test_snapshot_is_served_for_its_version(dataset, snapshot_file):
+    results = pc.read_snapshot(snapshot_file, dataset.version)
+    assert results is not None
+    dataset.derived(('snapshot', an.DISTINCT_MODE), lambda: results)
+    pd.testing.assert_frame_equal(region_sales(dataset), MARKER)
+
+
+def test_snapshot_matches_computed_results(dataset, snapshot):
+    expected = an.run_batch(dataset.df, SPECS)
+    served = {name: snapshot['results'][('batch', name, ())] for name in SPECS if name != MARKED_KEY[1]}
+    assert_results_equal({name: expected[name] for name in served}, served)
+
+
+def test_snapshot_rejects_other_data_version(snapshot_file):
+    assert pc.read_snapshot(snapshot_file, 'another version') is None
+
+
+def test_snapshot_rejects_other_snapshot_version(snapshot, dataset, tmp_path):
+    path = str(tmp_path / 'old.snapshot.pkl')
+    pc.write_snapshot({**snapshot, 'snapshot_version': 'snapshot-0'}, path)
+    assert pc.read_snapshot(path, dataset.version) is None
+
+
+def test_snapshot_rejects_other_top_n_max(dataset, snapshot_file, monkeypatch):
+    monkeypatch.setattr(an, 'TOP_N_MAX', an.TOP_N_MAX + 1)
+    assert pc.read_snapshot(snapshot_file, dataset.version) is None
+
+
+def test_snapshot_rejects_other_distinct_mode(dataset, snapshot_file, monkeypatch):
+    monkeypatch.setattr(an, 'DISTINCT_MODE', 'approx')
+    assert pc.read_snapshot(snapshot_file, dataset.version) is None
+
+
+def test_switching_distinct_mode_stops_serving(dataset, snapshot_file, csv_path, monkeypatch):
+    results = pc.read_snapshot(snapshot_file, dataset.version)
+    dataset.derived(('snapshot', an.DISTINCT_MODE), lambda: results)
+
+    monkeypatch.setattr(an, 'DISTINCT_MODE', 'approx')
+    expected = region_sales(load_dataset(csv_path))
+    pd.testing.assert_frame_equal(region_sales(dataset), expected)
+
+
+def test_appended_dataset_is_not_served(dataset, snapshot_file):
+    results = pc.read_snapshot(snapshot_file, dataset.version)
+    dataset.derived(('snapshot', an.DISTINCT_MODE), lambda: results)
+
+    grown = pd.concat([dataset.df, dataset.df.iloc[:10]], ignore_index=True)
+    grown.attrs = {'source': {**dataset.df.attrs['source'], 'version': 'grown'}}
+    appended = dataset.append(grown)
+    assert region_sales(appended)['Region'].tolist() != MARKER['Region'].tolist()
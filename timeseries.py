@@ -0,0 +1,204 @@
+"""
+Daily Time Series
+Prefix sums of daily totals, for constant-time date-range totals and rolling windows
+"""
+
+import numpy as np
+import pandas as pd
+
+import batch
+import loader
+from dimension_index import DateRange
+
+
+DAY_NS = 86_400 * 10 ** 9
+
+PREFIX_MEASURES = ['Sales', 'Profit', 'Quantity']
+
+# Trailing windows (in days) offered by the rolling totals
+ROLLING_WINDOWS = (7, 30, 90)
+
+
+class DailyTotals:
+    """
+    Cumulative daily totals of the sales measures
+
+    prefix[measure][..., i] holds the total of the first i days, so the
+    total of any run of days is two lookups and a subtraction.
+    Optionally kept per value of one dimension column.
+
+    Orders are included when they are additive over days, i.e. no order
+    has rows on two different order dates. Otherwise 'Orders' is left
+    out and callers must count them from the rows.
+
+    Attributes:
+        first_day: Day number (days since 1970-01-01) of the first day
+        n_days: Number of days covered, first to last
+        prefix: Dictionary of measure -> array of shape (n_days + 1,), or (groups, n_days + 1)
+        groups: Index of the group values (None when not grouped)
+    """
+
+    def __init__(self, first_day, n_days, prefix, groups=None):
+        self.first_day = first_day
+        self.n_days = n_days
+        self.prefix = prefix
+        self.groups = groups
+
+    @classmethod
+    def build(cls, df, by=None, measures=PREFIX_MEASURES, factorize=batch.factorize):
+        """
+        Build the prefix sums of a sales frame
+
+        Parameters:
+            df: Sales DataFrame
+            by: Dimension column to keep totals per value of (None for overall)
+            measures: Columns to sum
+            factorize: Function (df, column) -> (codes, uniques)
+
+        Returns:
+            DailyTotals
+        """
+        valid = df['Order Date'].notna().to_numpy()
+        if 'Order Day' in df.columns:
+            days = df['Order Day'].to_numpy().astype(np.int64)
+        else:
+            days = loader.time_buckets(df['Order Date'])['Order Day'].to_numpy().astype(np.int64)
+
+        if by is None:
+            codes, groups, n_groups = np.zeros(len(df), dtype=np.int64), None, 1
+        else:
+            codes, groups = factorize(df, by)
+            n_groups = len(groups)
+            valid = valid & (codes >= 0)
+
+        if valid.any():
+            first_day, last_day = days[valid].min(), days[valid].max()
+        else:
+            first_day, last_day = 0, -1
+        n_days = int(last_day - first_day + 1)
+
+        # One slot per (group, day)
+        slots = codes[valid] * n_days + (days[valid] - first_day)
+        size = n_groups * n_days
+        daily = {}
+        for measure in measures:
+            values = df[measure].to_numpy()[valid]
+            sums = np.bincount(slots, weights=values.astype(np.float64), minlength=size)
+            daily[measure] = sums.astype(np.int64) if np.issubdtype(values.dtype, np.integer) else sums
+
+        # Orders add up over days only if every order falls on a single day
+        order_codes, order_uniques = factorize(df, 'Order ID')
+        order_codes = order_codes[valid]
+        present = order_codes >= 0
+        day_orders = np.unique(slots[present] * len(order_uniques) + order_codes[present])
+        group_orders = np.unique(codes[valid][present] * len(order_uniques) + order_codes[present])
+        if len(day_orders) == len(group_orders):
+            daily['Orders'] = np.bincount(day_orders // len(order_uniques), minlength=size)
+
+        prefix = {}
+        for measure, values in daily.items():
+            values = values.reshape(n_groups, n_days)
+            cumulative = np.zeros((n_groups, n_days + 1), dtype=values.dtype)
+            np.cumsum(values, axis=1, out=cumulative[:, 1:])
+            prefix[measure] = cumulative[0] if by is None else cumulative
+
+        return cls(int(first_day), n_days, prefix, groups)
+
+    def merge(self, other):
+        """
+        Add the totals of other rows, e.g. rows appended to the data
+
+        Only measures kept by both are kept. Orders stay additive only if
+        no order appears in both sets of rows; the caller must drop them
+        otherwise.
+
+        Parameters:
+            other: DailyTotals over the same dimension column
+
+        Returns:
+            DailyTotals covering the days and groups of both
+        """
+        parts = [part for part in (self, other) if part.n_days > 0]
+        if len(parts) < 2:
+            return parts[0] if parts else self
+
+        first_day = min(part.first_day for part in parts)
+        n_days = max(part.first_day + part.n_days for part in parts) - first_day
+        groups = None if self.groups is None else self.groups.union(other.groups)
+
+        prefix = {}
+        for measure in [measure for measure in self.prefix if measure in other.prefix]:
+            dtype = np.result_type(self.prefix[measure], other.prefix[measure])
+            daily = np.zeros((1 if groups is None else len(groups), n_days), dtype=dtype)
+            for part in parts:
+                values = np.diff(part.prefix[measure], axis=-1).reshape(-1, part.n_days)
+                rows = slice(None) if groups is None else groups.get_indexer(part.groups)
+                offset = part.first_day - first_day
+                daily[rows, offset:offset + part.n_days] += values
+            cumulative = np.zeros((daily.shape[0], n_days + 1), dtype=dtype)
+            np.cumsum(daily, axis=1, out=cumulative[:, 1:])
+            prefix[measure] = cumulative[0] if groups is None else cumulative
+
+        return DailyTotals(first_day, n_days, prefix, groups)
+
+    def day_bounds(self, date_range):
+        """
+        Get the prefix positions [i, j) covering a DateRange
+
+        Parameters:
+            date_range: DateRange
+
+        Returns:
+            (i, j) with 0 <= i <= j <= n_days
+        """
+        # Both bounds are midnights, so they divide into whole days
+        low, high = date_range.bounds()
+        i = low // DAY_NS - self.first_day
+        j = high // DAY_NS - self.first_day
+        i = min(max(i, 0), self.n_days)
+        j = min(max(j, i), self.n_days)
+        return int(i), int(j)
+
+    def totals(self, start=None, end=None):
+        """
+        Get the totals of the days from start to end, both included
+
+        Parameters:
+            start: First day (date, datetime or string; None for the first day)
+            end: Last day (None for the last day)
+
+        Returns:
+            Dictionary of measure -> total (or array of totals per group)
+        """
+        i, j = self.day_bounds(DateRange(start, end))
+        return {measure: prefix[..., j] - prefix[..., i] for measure, prefix in self.prefix.items()}
+
+    def rolling(self, window, group=None):
+        """
+        Get trailing totals over the last `window` days for every day
+
+        Days before the first day count as zero, so the first window - 1
+        days have partial windows.
+
+        Parameters:
+            window: Window length in days
+            group: Group value, required for grouped totals
+
+        Returns:
+            DataFrame with a Date column and one column per measure
+        """
+        if window < 1:
+            raise ValueError("window must be at least one day")
+        if self.groups is not None and group is None:
+            raise ValueError("grouped totals need a group")
+        end = np.arange(1, self.n_days + 1)
+        start = np.maximum(end - window, 0)
+
+        columns = {}
+        for measure, prefix in self.prefix.items():
+            if self.groups is not None:
+                prefix = prefix[self.groups.get_loc(group)]
+            columns[measure] = prefix[end] - prefix[start]
+
+        dates = pd.to_datetime(np.arange(self.first_day, self.first_day + self.n_days), unit='D')
+        return pd.DataFrame({'Date': dates, **columns})
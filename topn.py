@@ -0,0 +1,56 @@
+"""
+Top-N Selection
+Partial selection of the largest/smallest rows instead of a full sort
+"""
+
+import numpy as np
+
+
+def top_n_positions(values, n, ascending=False):
+    """
+    Get the positions of the n largest (or smallest) values, in rank order
+
+    Uses argpartition, so only the selected prefix (and the values tied
+    with its last one) is sorted. Ties are broken by position, like a
+    stable sort, so the result does not depend on the partition.
+
+    Parameters:
+        values: 1-D numeric array
+        n: Number of positions to return
+        ascending: Select the smallest values instead of the largest
+
+    Returns:
+        Integer array of at most n positions
+    """
+    values = np.asarray(values, dtype=np.float64)
+    keys = values if ascending else -values
+    n = max(0, min(n, len(keys)))
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    positions = np.arange(len(keys))
+    if n < len(keys):
+        kth = keys[np.argpartition(keys, n - 1)[n - 1]]
+        if not np.isnan(kth):
+            # Every value tied with the n-th, so the cut below does not depend on the partition
+            positions = np.flatnonzero(keys <= kth)
+    return positions[np.lexsort((positions, keys[positions]))][:n]
+
+
+def top_n(frame, column, n, ascending=False):
+    """
+    Get the n rows of a frame with the largest (or smallest) column values
+
+    Equivalent to frame.sort_values(column, ascending=ascending).head(n)
+    without sorting the whole frame.
+
+    Parameters:
+        frame: DataFrame
+        column: Column to rank by
+        n: Number of rows
+        ascending: Select the smallest values instead of the largest
+
+    Returns:
+        DataFrame with at most n rows in rank order
+    """
+    return frame.iloc[top_n_positions(frame[column].to_numpy(), n, ascending)]
@@ -1,130 +1,529 @@
 """
 Data Validation Script
 Run this to verify your dataset is correctly loaded
+
+Checks the CSV in one streaming pass over bounded chunks, so files of any
+size validate in the same memory:
+    python validate_data.py [data/superstore.csv] [--json report.json] [--memory-budget-mb 256]
+
+Exit codes: 0 valid, 1 unreadable, 2 failed checks (3 with --strict when there are only warnings)
 """
 
-import pandas as pd
+import argparse
+import json
 import sys
+import time
 
-def validate_data():
-    """Validate that the CSV file is loaded correctly"""
-    
+import numpy as np
+import pandas as pd
+
+import loader
+import streaming
+from schema import SUPERSTORE_SCHEMA, make_schema
+from sketches import HyperLogLog
+
+
+EXIT_OK = 0
+EXIT_UNREADABLE = 1
+EXIT_INVALID = 2
+EXIT_WARNINGS = 3
+
+# Distinct values are counted exactly up to this many, then estimated with a HyperLogLog sketch
+EXACT_DISTINCT_LIMIT = 100_000
+
+# Set-entry overhead assumed when sizing chunks around exact distinct counts
+BYTES_PER_DISTINCT_VALUE = 100
+
+# Share of the memory budget the Row ID bitmap may grow to (a 256 MB budget covers IDs up to about 537M)
+ROW_ID_BITMAP_SHARE = 0.25
+
+DISTINCT_COLUMNS = ['Order ID', 'Customer ID', 'Segment', 'Region', 'State', 'City',
+                    'Category', 'Sub-Category', 'Product Name']
+
+# Failing rows listed per check in the report
+EXAMPLE_ROWS = 5
+
+# Check name -> description; any failing row makes the file invalid
+CHECKS = {
+    'ship_before_order': "Ship Date before Order Date",
+    'negative_quantity': "Negative Quantity",
+    'duplicate_row_id': "Duplicate Row ID",
+    'discount_out_of_range': "Discount outside [0, 1]"
+}
+
+
+# ==================== ACCUMULATORS ====================
+
+class DistinctCounter:
+    """
+    Distinct count of one column across chunks
+
+    Values are kept in a set up to EXACT_DISTINCT_LIMIT, then folded
+    into a HyperLogLog sketch (about 1.6% standard error), so memory
+    stays bounded however many values the column has.
+    """
+
+    def __init__(self, limit=EXACT_DISTINCT_LIMIT):
+        self.limit = limit
+        self.values = set()
+        self.sketch = None
+
+    def add(self, values):
+        """Add the values of a chunk (Series)"""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Chunks are parsed with their own categories, which are exactly the values seen
+            observed = values.cat.categories
+        else:
+            observed = values.dropna().unique()
+        if self.sketch is not None:
+            self.sketch.add(np.asarray(observed, dtype=object))
+            return
+        self.values.update(observed.tolist())
+        if len(self.values) > self.limit:
+            self.sketch = HyperLogLog().add(np.array(list(self.values), dtype=object))
+            self.values = set()
+
+    @property
+    def exact(self):
+        return self.sketch is None
+
+    def count(self):
+        """Get the (estimated) number of distinct values"""
+        return len(self.values) if self.sketch is None else self.sketch.count()
+
+    def memory_usage(self):
+        """Approximate bytes held"""
+        return len(self.values) * BYTES_PER_DISTINCT_VALUE + (0 if self.sketch is None else self.sketch.registers.nbytes)
+
+
+class RowIdBitmap:
+    """
+    Row IDs seen so far, one bit per ID
+
+    Uses max Row ID / 8 bytes (12.5 MB for 100M rows), up to max_bytes.
+    IDs past the bitmap are kept in a sorted array instead (8 bytes per
+    distinct ID), so a stray huge ID costs 8 bytes rather than a bitmap
+    sized to its value.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max(1, int(max_bytes))
+        self.bits = np.zeros(min(1 << 16, self.max_bytes), dtype=np.uint8)
+        self.overflow = np.empty(0, dtype=np.int64)
+
+    def _grow(self, ids):
+        """Widen the bitmap to cover ids, as far as max_bytes allows"""
+        needed = min(int(ids.max()) // 8 + 1, self.max_bytes)
+        if needed > len(self.bits):
+            grown = np.zeros(min(max(needed, 2 * len(self.bits)), self.max_bytes), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+
+    def add(self, ids):
+        """
+        Mark Row IDs as seen
+
+        Parameters:
+            ids: Non-negative int64 array
+
+        Returns:
+            Boolean array telling which ids repeat an earlier one
+        """
+        if len(ids) == 0:
+            return np.zeros(0, dtype=bool)
+        self._grow(ids)
+
+        # Repeats within the chunk: every occurrence after the first
+        order = np.argsort(ids, kind='stable')
+        repeated = np.zeros(len(ids), dtype=bool)
+        repeated[order[1:]] = ids[order[1:]] == ids[order[:-1]]
+
+        seen = np.zeros(len(ids), dtype=bool)
+        inside = ids < len(self.bits) * 8
+        byte, bit = ids[inside] >> 3, (ids[inside] & 7).astype(np.uint8)
+        seen[inside] = ((self.bits[byte] >> bit) & 1).astype(bool)
+        np.bitwise_or.at(self.bits, byte, np.left_shift(np.uint8(1), bit))
+
+        if not inside.all():
+            outside = ids[~inside]
+            positions = np.searchsorted(self.overflow, outside)
+            found = positions < len(self.overflow)
+            found[found] = self.overflow[positions[found]] == outside[found]
+            seen[~inside] = found
+            new = np.unique(outside[~found])
+            self.overflow = np.insert(self.overflow, np.searchsorted(self.overflow, new), new)
+        return seen | repeated
+
+    def memory_usage(self):
+        return self.bits.nbytes + self.overflow.nbytes
+
+
+# ==================== VALIDATION ====================
+
+def _raw_schema(schema):
+    """Get the schema that reads numbers and dates as text, so bad values are counted instead of failing the read"""
+    typed = {column: dtype for column, dtype in schema['dtypes'].items() if dtype != 'category'}
+    return make_schema(dtypes={column: 'str' for column in [*typed, *schema['dates']]},
+                       dates={column: None for column in schema['dates']}, base=schema)
+
+
+class Validator:
+    """
+    Statistics and checks of a sales CSV, accumulated chunk by chunk
+
+    Attributes:
+        rows: Rows seen
+        columns: Columns of the file
+        nulls: Column -> empty values
+        invalid: Column -> values that do not parse as the schema's type
+        distinct: Column -> DistinctCounter
+        failures: Check name -> failing rows
+        examples: Check name -> Row IDs of the first failing rows
+    """
+
+    def __init__(self, schema=None, memory_budget=None):
+        self.schema = schema if schema is not None else SUPERSTORE_SCHEMA
+        memory_budget = memory_budget if memory_budget is not None else streaming.MEMORY_BUDGET
+        self.rows = 0
+        self.columns = None
+        self.nulls = {}
+        self.invalid = {}
+        self.distinct = {column: DistinctCounter() for column in DISTINCT_COLUMNS}
+        self.date_bounds = {}
+        self.totals = {'Sales': 0.0, 'Profit': 0.0}
+        self.failures = dict.fromkeys(CHECKS, 0)
+        self.examples = {check: [] for check in CHECKS}
+        self.row_ids = RowIdBitmap(memory_budget * ROW_ID_BITMAP_SHARE)
+        self.sample = None
+
+    def _typed(self, chunk):
+        """Convert the text-read columns, counting values that do not parse"""
+        typed = {}
+        for column, dtype in self.schema['dtypes'].items():
+            if dtype == 'category' or column not in chunk.columns:
+                continue
+            raw = chunk[column]
+            try:
+                values = raw.astype(np.float64)
+            except (TypeError, ValueError):
+                # Only chunks holding a bad value pay for the slower, tolerant parse
+                values = pd.to_numeric(raw, errors='coerce')
+            bad = values.isna() & raw.notna()
+            if np.dtype(dtype).kind in 'iu':
+                # Whole numbers within the declared type, which the loader would otherwise wrap around
+                limits = np.iinfo(dtype)
+                bad |= values.notna() & ((values % 1 != 0) | (values < limits.min) | (values > limits.max))
+            self.invalid[column] = self.invalid.get(column, 0) + int(bad.sum())
+            typed[column] = values.where(~bad)
+        for column, date_format in self.schema['dates'].items():
+            if column not in chunk.columns:
+                continue
+            raw = chunk[column]
+            values = pd.to_datetime(raw, format=date_format, errors='coerce')
+            self.invalid[column] = self.invalid.get(column, 0) + int((values.isna() & raw.notna()).sum())
+            typed[column] = values
+            if values.notna().any():
+                low, high = values.min(), values.max()
+                bounds = self.date_bounds.get(column)
+                self.date_bounds[column] = (low, high) if bounds is None else (min(bounds[0], low), max(bounds[1], high))
+        return typed
+
+    def _fail(self, check, mask, row_ids):
+        """Count the rows failing a check and keep the first few Row IDs"""
+        count = int(np.count_nonzero(mask))
+        if count == 0:
+            return
+        self.failures[check] += count
+        room = EXAMPLE_ROWS - len(self.examples[check])
+        if room > 0:
+            ids = row_ids[np.flatnonzero(mask)[:room]]
+            self.examples[check].extend(None if pd.isna(i) else int(i) for i in ids)
+
+    def add(self, chunk):
+        """Fold one chunk (read with the raw schema) into the statistics"""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        self.rows += len(chunk)
+
+        for column, count in chunk.isna().sum().items():
+            self.nulls[column] = self.nulls.get(column, 0) + int(count)
+        for column, counter in self.distinct.items():
+            if column in chunk.columns:
+                counter.add(chunk[column])
+
+        typed = self._typed(chunk)
+        row_ids = typed['Row ID'].to_numpy() if 'Row ID' in typed else np.full(len(chunk), np.nan)
+        for column in self.totals:
+            if column in typed:
+                self.totals[column] += float(typed[column].sum())
+
+        if 'Order Date' in typed and 'Ship Date' in typed:
+            self._fail('ship_before_order', (typed['Ship Date'] < typed['Order Date']).to_numpy(), row_ids)
+        if 'Quantity' in typed:
+            self._fail('negative_quantity', (typed['Quantity'] < 0).to_numpy(), row_ids)
+        if 'Discount' in typed:
+            discount = typed['Discount']
+            self._fail('discount_out_of_range', ((discount < 0) | (discount > 1)).to_numpy(), row_ids)
+        if 'Row ID' in typed:
+            valid = ~np.isnan(row_ids) & (row_ids >= 0)
+            duplicates = np.zeros(len(chunk), dtype=bool)
+            duplicates[valid] = self.row_ids.add(row_ids[valid].astype(np.int64))
+            self._fail('duplicate_row_id', duplicates, row_ids)
+
+        if self.sample is None:
+            self.sample = chunk.head(3).assign(**{column: values.head(3) for column, values in typed.items()})
+
+    def memory_usage(self):
+        """Approximate bytes held between chunks"""
+        return (self.row_ids.memory_usage()
+                + sum(counter.memory_usage() for counter in self.distinct.values()))
+
+    def report(self):
+        """
+        Build the report of everything seen so far
+
+        Returns:
+            JSON-serializable dictionary; 'status' is 'ok', 'warning'
+            (empty values only) or 'error'
+        """
+        expected = list(self.schema['dtypes']) + list(self.schema['dates'])
+        missing_columns = [column for column in expected if column not in (self.columns or [])]
+        invalid = {column: count for column, count in self.invalid.items() if count}
+        nulls = {column: count for column, count in self.nulls.items() if count}
+        failed = {check: count for check, count in self.failures.items() if count}
+
+        if missing_columns or invalid or failed or self.rows == 0:
+            status = 'error'
+        elif nulls:
+            status = 'warning'
+        else:
+            status = 'ok'
+
+        return {
+            'status': status,
+            'rows': self.rows,
+            'columns': self.columns or [],
+            'missing_columns': missing_columns,
+            'nulls': nulls,
+            'invalid_values': invalid,
+            'distinct': {
+                column: {'count': counter.count(), 'exact': counter.exact}
+                for column, counter in self.distinct.items() if column in (self.columns or [])
+            },
+            'segments': sorted(self.distinct['Segment'].values) if self.distinct['Segment'].exact else None,
+            'date_ranges': {
+                column: {'min': low.isoformat(), 'max': high.isoformat()}
+                for column, (low, high) in self.date_bounds.items()
+            },
+            'totals': {column: round(total, 2) for column, total in self.totals.items()},
+            'checks': {
+                check: {'description': description, 'failed_rows': self.failures[check],
+                        'example_row_ids': self.examples[check]}
+                for check, description in CHECKS.items()
+            }
+        }
+
+
+def validate_file(path, memory_budget=None, schema=None):
+    """
+    Validate a sales CSV in one streaming pass
+
+    Chunks are sized so a chunk, its working memory and the statistics
+    gathered so far fit in the memory budget. The encoding is detected
+    from samples; if a byte outside them does not decode, the pass is
+    redone once with cp1252 and replacement characters.
+
+    Parameters:
+        path: Path of the CSV file
+        memory_budget: Bytes to stay within (defaults to streaming.MEMORY_BUDGET)
+        schema: Column types and date formats (defaults to schema.SUPERSTORE_SCHEMA)
+
+    Returns:
+        (report dictionary, first rows of the file as a DataFrame or None)
+
+    Raises:
+        FileNotFoundError: The file does not exist
+    """
+    schema = schema if schema is not None else SUPERSTORE_SCHEMA
+    memory_budget = memory_budget if memory_budget is not None else streaming.MEMORY_BUDGET
+    raw_schema = _raw_schema(schema)
+    start = time.perf_counter()
+
+    def run(encoding, encoding_errors):
+        validator = Validator(schema, memory_budget)
+        per_row = streaming.row_bytes(path, None, raw_schema, encoding, encoding_errors) * streaming.CHUNK_OVERHEAD
+
+        def chunk_rows():
+            return max(streaming.MIN_CHUNK_ROWS, (memory_budget - validator.memory_usage()) // per_row)
+
+        for chunk in loader.read_sales_chunks(path, chunk_rows, raw_schema, None, encoding, encoding_errors):
+            validator.add(chunk)
+        return validator
+
+    encoding, encoding_errors = loader.detect_encoding(path), 'strict'
+    try:
+        validator = run(encoding, encoding_errors)
+    except UnicodeDecodeError:
+        encoding, encoding_errors = 'cp1252', 'replace'
+        validator = run(encoding, encoding_errors)
+
+    report = {'path': path, 'encoding': encoding, 'encoding_errors': encoding_errors}
+    report.update(validator.report())
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return report, validator.sample
+
+
+# ==================== OUTPUT ====================
+
+def print_report(report, sample=None):
+    """Print a validation report for people"""
     print("=" * 60)
     print("Superstore Sales Data Validation")
     print("=" * 60)
     print()
-    
-    # Try to load data
-    try:
-        # Try UTF-8 encoding first
-        try:
-            df = pd.read_csv('data/superstore.csv', encoding='utf-8')
-        except UnicodeDecodeError:
-            try:
-                # Try latin-1 encoding
-                df = pd.read_csv('data/superstore.csv', encoding='latin-1')
-            except UnicodeDecodeError:
-                try:
-                    # Try Windows-1252 encoding
-                    df = pd.read_csv('data/superstore.csv', encoding='cp1252')
-                except:
-                    # Last resort - ignore errors
-                    df = pd.read_csv('data/superstore.csv', encoding='utf-8', errors='ignore')
-                    
-         # Convert date columns to datetime
-        df['Order Date'] = pd.to_datetime(df['Order Date'])
-        df['Ship Date'] = pd.to_datetime(df['Ship Date'])
-        
-        print("✅ superstore.csv loaded successfully!")
-        print(f"   - Rows: {len(df):,}")
-        print(f"   - Columns: {len(df.columns)}")
-        print()
-    except FileNotFoundError:
-        print("❌ ERROR: data/superstore.csv not found!")
-        print("   Please place your Superstore CSV file in the data/ folder")
-        print()
-        sys.exit(1)
-    except Exception as e:
-        print(f"❌ ERROR loading superstore.csv: {e}")
-        print()
-        sys.exit(1)
-    
-    # Display column names
+
+    print(f"✅ {report['path']} read successfully!")
+    print(f"   - Rows: {report['rows']:,}")
+    print(f"   - Columns: {len(report['columns'])}")
+    print(f"   - Encoding: {report['encoding']}")
+    print(f"   - Time: {report['seconds']:.1f}s")
+    print()
+
     print("📋 Column Names:")
-    for i, col in enumerate(df.columns, 1):
+    for i, col in enumerate(report['columns'], 1):
         print(f"   {i}. {col}")
     print()
-    
-    # Data Statistics
+
+    def distinct(column):
+        entry = report['distinct'].get(column)
+        if entry is None:
+            return "n/a"
+        return f"{entry['count']:,}" if entry['exact'] else f"~{entry['count']:,}"
+
     print("=" * 60)
     print("Data Statistics")
     print("=" * 60)
     print()
-    
+
     print("📊 SALES METRICS:")
-    print(f"   - Total Sales: ${df['Sales'].sum():,.2f}")
-    print(f"   - Total Profit: ${df['Profit'].sum():,.2f}")
-    print(f"   - Total Orders: {df['Order ID'].nunique():,}")
-    print(f"   - Total Customers: {df['Customer ID'].nunique():,}")
+    print(f"   - Total Sales: ${report['totals']['Sales']:,.2f}")
+    print(f"   - Total Profit: ${report['totals']['Profit']:,.2f}")
+    print(f"   - Total Orders: {distinct('Order ID')}")
+    print(f"   - Total Customers: {distinct('Customer ID')}")
+    order_dates = report['date_ranges'].get('Order Date')
+    if order_dates:
+        print(f"   - Date Range: {order_dates['min'][:10]} to {order_dates['max'][:10]}")
     print()
-    
+
     print("📦 PRODUCTS:")
-    print(f"   - Categories: {df['Category'].nunique()}")
-    print(f"   - Sub-Categories: {df['Sub-Category'].nunique()}")
-    print(f"   - Unique Products: {df['Product Name'].nunique():,}")
+    print(f"   - Categories: {distinct('Category')}")
+    print(f"   - Sub-Categories: {distinct('Sub-Category')}")
+    print(f"   - Unique Products: {distinct('Product Name')}")
     print()
-    
+
     print("📍 GEOGRAPHIC:")
-    print(f"   - Regions: {df['Region'].nunique()}")
-    print(f"   - States: {df['State'].nunique()}")
-    print(f"   - Cities: {df['City'].nunique()}")
+    print(f"   - Regions: {distinct('Region')}")
+    print(f"   - States: {distinct('State')}")
+    print(f"   - Cities: {distinct('City')}")
     print()
-    
+
     print("👥 CUSTOMERS:")
-    print(f"   - Customer Segments: {df['Segment'].nunique()}")
-    print(f"   - Segments: {', '.join(df['Segment'].unique())}")
+    print(f"   - Customer Segments: {distinct('Segment')}")
+    if report['segments'] is not None:
+        print(f"   - Segments: {', '.join(report['segments'])}")
     print()
-    
-    # Check for missing values
+
     print("=" * 60)
     print("Data Quality Check")
     print("=" * 60)
     print()
-    
-    missing = df.isnull().sum()
-    if missing.sum() > 0:
+
+    if report['missing_columns']:
+        print(f"❌ Missing columns: {', '.join(report['missing_columns'])}")
+    if report['nulls']:
         print("⚠️ Missing values found:")
-        for col, count in missing[missing > 0].items():
-            print(f"   - {col}: {count} missing")
+        for col, count in report['nulls'].items():
+            print(f"   - {col}: {count:,} missing")
     else:
         print("✅ No missing values found!")
+    if report['invalid_values']:
+        print("❌ Values that do not parse:")
+        for col, count in report['invalid_values'].items():
+            print(f"   - {col}: {count:,} invalid")
+    for check in report['checks'].values():
+        if check['failed_rows']:
+            examples = ', '.join(str(row_id) for row_id in check['example_row_ids'])
+            print(f"❌ {check['description']}: {check['failed_rows']:,} rows (Row IDs {examples}, ...)")
+        else:
+            print(f"✅ {check['description']}: none")
     print()
-    
-    # Sample data
-    print("=" * 60)
-    print("Sample Data Preview")
-    print("=" * 60)
-    print()
-    print(df[['Order Date', 'Category', 'Sub-Category', 'Sales', 'Profit']].head(3).to_string(index=False))
-    print()
-    
+
+    if sample is not None:
+        print("=" * 60)
+        print("Sample Data Preview")
+        print("=" * 60)
+        print()
+        columns = [col for col in ['Order Date', 'Category', 'Sub-Category', 'Sales', 'Profit'] if col in sample.columns]
+        print(sample[columns].to_string(index=False))
+        print()
+
     print("=" * 60)
-    print("✅ Dataset validation complete! Your data looks good.")
+    if report['status'] == 'error':
+        print("❌ Dataset validation failed. Fix the problems above.")
+    elif report['status'] == 'warning':
+        print("⚠️ Dataset validation complete, with warnings.")
+    else:
+        print("✅ Dataset validation complete! Your data looks good.")
     print("=" * 60)
     print()
-    print("You can now run the app with: streamlit run app.py")
-    print()
+    if report['status'] != 'error':
+        print("You can now run the app with: streamlit run app.py")
+        print()
 
-    print("📊 SALES METRICS:")
-    print(f"   - Total Sales: ${df['Sales'].sum():,.2f}")
-    print(f"   - Total Profit: ${df['Profit'].sum():,.2f}")
-    print(f"   - Date Range: {df['Order Date'].min().year} - {df['Order Date'].max().year}")
-    print()
 
-    print("📍 GEOGRAPHIC:")
-    print(f"   - States: {df['State'].nunique()}")
-    print(f"   - Cities: {df['City'].nunique()}")
-    print(f"   - Regions: {df['Region'].nunique()}")
+def validate_data():
+    """Validate the sales CSV, print the results and exit with the status code"""
+    parser = argparse.ArgumentParser(description="Validate a sales CSV in one streaming pass")
+    parser.add_argument('csv', nargs='?', default=loader.DATA_PATH, help="CSV to validate")
+    parser.add_argument('--json', metavar='PATH', help="Write the report as JSON ('-' for stdout only)")
+    parser.add_argument('--memory-budget-mb', type=int, help="Memory to stay within")
+    parser.add_argument('--strict', action='store_true', help="Exit non-zero on warnings too")
+    args = parser.parse_args()
+
+    quiet = args.json == '-'
+    memory_budget = args.memory_budget_mb * 2 ** 20 if args.memory_budget_mb else None
+    try:
+        report, sample = validate_file(args.csv, memory_budget)
+    except FileNotFoundError:
+        report, sample = {'path': args.csv, 'status': 'unreadable', 'error': "file not found"}, None
+        if not quiet:
+            print(f"❌ ERROR: {args.csv} not found!")
+            print("   Please place your Superstore CSV file in the data/ folder")
+            print()
+    except Exception as e:
+        report, sample = {'path': args.csv, 'status': 'unreadable', 'error': str(e)}, None
+        if not quiet:
+            print(f"❌ ERROR reading {args.csv}: {e}")
+            print()
+    else:
+        if not quiet:
+            print_report(report, sample)
+
+    if args.json == '-':
+        print(json.dumps(report, indent=1))
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+
+    status = report['status']
+    if status == 'unreadable':
+        sys.exit(EXIT_UNREADABLE)
+    if status == 'error':
+        sys.exit(EXIT_INVALID)
+    if status == 'warning' and args.strict:
+        sys.exit(EXIT_WARNINGS)
+    sys.exit(EXIT_OK)
+
 
 if __name__ == "__main__":
-    validate_data()
\ No newline at end of file
+    validate_data()